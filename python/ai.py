@@ -7,13 +7,40 @@ def safe_print(*args, **kwargs):
 
 import chess
 import time
-import chess.polyglot
 from threading import Thread
 from queue import Queue
-from searcher import Searcher  
+from book import default_book
+from engine import EngineSession
+from searcher import MAX_DEPTH
+from timeman import TimeManager
+
 class AI:
-    def __init__(self):
+    def __init__(self, time_left=300, increment=3, max_depth=MAX_DEPTH, threads=1, session=None,
+                 ponder=False, book=None):
         self.move = None
+        # Đồng hồ của AI (giây): trừ thời gian suy nghĩ, cộng increment mỗi nước
+        self.time_left = time_left
+        self.increment = increment
+        self.max_depth = max_depth
+        # Phiên engine giữ bảng TT, history và killer giữa các nước đi.
+        # threads > 1: Lazy SMP, các tiến trình phụ được tạo một lần và dùng lại
+        self.session = session or EngineSession(threads=threads)
+        # ponder=True: tiếp tục tìm kiếm trong lúc đối thủ suy nghĩ (nước đáp dự đoán)
+        self.ponder = ponder
+        # Sách khai cuộc được map vào bộ nhớ một lần và dùng chung (None nếu không có file)
+        self.book = book if book is not None else default_book()
+
+    def book_move(self, board_state):
+        if self.book is None:
+            return None
+        move = self.book.move(board_state)
+        if move is not None:
+            self.session.stop_ponder()
+            safe_print(f"[AI] Sử dụng sách khai cuộc: {move}")
+        return move
+
+    def new_game(self):
+        self.session.new_game()
 
     def run_search_process(self, board_state, return_queue):
             def search_and_update():
@@ -21,23 +48,20 @@ class AI:
                     start = time.time()
 
                     # ⚡ Ưu tiên tìm trong sách khai cuộc trước
-                    move = None
-                    try:
-                        with chess.polyglot.open_reader("baron30.bin") as reader:
-                            try:
-                                entry = reader.find(board_state)
-                                move = entry.move
-                                safe_print(f"[AI] Sử dụng sách khai cuộc: {move}")
-                            except IndexError:
-                                pass
-                    except FileNotFoundError:
-                        safe_print("[Lỗi] Không tìm thấy baron30.bin")
+                    move = self.book_move(board_state)
                     if move is None:
-                        searcher = Searcher()
-                        move = searcher.iterative_deepening(board_state, max_depth=7, time_limit=9)
+                        time_manager = TimeManager(time_left=self.time_left, increment=self.increment)
+                        move = self.session.search(board_state, time_manager=time_manager,
+                                                   max_depth=self.max_depth)
                         safe_print("Current turn:", "White" if board_state.turn == chess.WHITE else "Black")
                         safe_print(f"[AI] Đã chọn nước đi: {move} trong {time.time() - start:.2f} giây")
 
+                    self.time_left = max(0, self.time_left - (time.time() - start)) + self.increment
+
+                    if self.ponder and move is not None:
+                        self.session.start_ponder(board_state, move,
+                                                  TimeManager(time_left=self.time_left, increment=self.increment))
+
                     self.move = move
                     if return_queue:
                         return_queue.put(move)
@@ -54,27 +78,18 @@ class AI:
         self.move = None
         return_queue = Queue()
 
-        try:
-            with chess.polyglot.open_reader("baron30.bin") as reader:
-                try:
-                    entry = reader.find(board_state)
-                    self.move = entry.move
-                    safe_print(f"[AI] Sử dụng sách khai cuộc: {self.move}")
-                    game.board.push(self.move)
-                    game.history_index = len(game.board.move_stack)
-                    game.view_board = game.board.copy()
-                    game.last_move_from = self.move.from_square 
-                    game.last_move_to = self.move.to_square 
-                    game.check_game_end()
-                    if hasattr(game, 'root'):
-                        game.root.title("Cờ vua - Đã xong")
-                    return
-                except IndexError:
-                    safe_print("[AI] Không tìm thấy nước đi trong sách khai cuộc. Dùng Searcher.")
-        except FileNotFoundError:
-            safe_print("[Lỗi] Không tìm thấy tệp baron30.bin. Dùng Searcher.")
-        except Exception as e:
-            safe_print("[Lỗi] Lỗi khi mở sách khai cuộc:", e)
+        self.move = self.book_move(board_state)
+        if self.move is not None:
+            game.board.push(self.move)
+            game.history_index = len(game.board.move_stack)
+            game.view_board = game.board.copy()
+            game.last_move_from = self.move.from_square 
+            game.last_move_to = self.move.to_square 
+            game.check_game_end()
+            if hasattr(game, 'root'):
+                game.root.title("Cờ vua - Đã xong")
+            return
+        safe_print("[AI] Không tìm thấy nước đi trong sách khai cuộc. Dùng Searcher.")
 
         self.run_search_process(board_state, return_queue)
 
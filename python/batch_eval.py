@@ -0,0 +1,79 @@
+"""Vectorized evaluation of many positions at once with NumPy.
+
+Positions are unpacked into an (N, 12, 64) array of piece planes, white
+pawn..king then black pawn..king, and material, phase and the tapered
+piece-square sums are computed for all of them with array operations. The
+integer arithmetic is the same as ``evaluate.evaluate_terms``, so every
+score is identical to ``evaluate_board``:
+
+    scores = evaluate_boards(boards)
+"""
+import chess
+import numpy as np
+
+from evaluate import piece_terms, MATERIAL, PHASE, PST_MG, PST_EG, PHASE_TOTAL
+
+PLANES = 12
+CHUNK = 1 << 14  # positions unpacked at a time: ~60 MB of planes and float32 copies
+
+# TERM_TABLE[plane * 64 + square]: what a piece there adds to its side's
+# (material, phase, midgame PST, endgame PST), like evaluate.piece_terms.
+# Both colours share the rows of their piece type. The sums are small
+# integers, exact in float32, which lets the product run through BLAS.
+TERM_TABLE = np.array([piece_terms[pt][sq] for pt in chess.PIECE_TYPES for sq in chess.SQUARES],
+                      dtype=np.float32)
+
+
+def board_masks(boards):
+    """(N, 12) uint64 piece bitboards, ``board.pieces_mask`` for every plane,
+    and (N,) side to move of ``boards``."""
+    raw = np.array([(board.pawns, board.knights, board.bishops, board.rooks, board.queens,
+                     board.kings, board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK])
+                    for board in boards], dtype=np.uint64).reshape(-1, 8)
+    masks = np.concatenate((raw[:, :6] & raw[:, 6:7], raw[:, :6] & raw[:, 7:8]), axis=1)
+    turns = np.array([board.turn for board in boards], dtype=bool)
+    return masks, turns
+
+
+def unpack_planes(masks):
+    """(N, 12) bitboards to an (N, 12, 64) 0/1 array, bit i is square i."""
+    masks = np.ascontiguousarray(masks, dtype="<u8")
+    bits = np.unpackbits(masks.view(np.uint8), bitorder="little")
+    return bits.reshape(len(masks), PLANES, 64)
+
+
+def evaluate_planes(planes, turns):
+    """Scores from the side to move's view, like ``evaluate_board``, for
+    positions that are not checkmate."""
+    n = len(planes)
+    # terms[n, side] = (material, phase, mg, eg)
+    terms = planes.reshape(n * 2, 6 * 64).astype(np.float32) @ TERM_TABLE
+    terms = terms.astype(np.int64).reshape(n, 2, 4)
+    material, phase = terms[..., MATERIAL], terms[..., PHASE]
+    mg, eg = terms[..., PST_MG], terms[..., PST_EG]
+
+    # Same integer arithmetic as evaluate.scaled_side_score
+    phase = np.minimum(phase, PHASE_TOTAL)
+    side = PHASE_TOTAL * material + mg * phase + eg * (PHASE_TOTAL - phase)
+    score = (side[:, 0] - side[:, 1]) / PHASE_TOTAL
+    return np.where(turns, score, -score)
+
+
+def evaluate_masks(masks, turns):
+    scores = np.empty(len(masks), dtype=np.float64)
+    for start in range(0, len(masks), CHUNK):
+        stop = start + CHUNK
+        scores[start:stop] = evaluate_planes(unpack_planes(masks[start:stop]), turns[start:stop])
+    return scores
+
+
+def evaluate_boards(boards):
+    """``evaluate_board`` for every board, as a float64 array."""
+    boards = list(boards)
+    masks, turns = board_masks(boards)
+    scores = evaluate_masks(masks, turns)
+    # Only positions in check can be mate; is_check is cheap, is_checkmate is not.
+    for i, board in enumerate(boards):
+        if board.is_check() and board.is_checkmate():
+            scores[i] = -999999 if board.turn == chess.WHITE else 999999
+    return scores
@@ -0,0 +1,158 @@
+"""Speed and behaviour yardsticks: ``bench`` and ``perft``.
+
+``bench`` searches a fixed suite of positions to a fixed depth, each with
+a fresh single-threaded Searcher and no time limit. The total node count
+is a deterministic signature of the search: it changes only when the
+search or evaluation behaves differently, never because of the machine.
+Time and NPS measure speed.
+
+``perft`` counts the leaf nodes of the legal move tree through
+SearchBoard's push/pop, or ``position.Position``'s with ``--native``, with
+per-move ``divide`` output.
+
+    python bench.py bench [--depth 5] [--stats] [--json bench.json]
+    python bench.py perft 4 [--fen FEN] [--native] [--json perft.json]
+"""
+import argparse
+import json
+import platform
+import time
+
+import chess
+
+from position import Position
+from searchboard import SearchBoard
+from searcher import Searcher
+from timeman import TimeManager
+
+BENCH_DEPTH = 5
+BENCH_HASH_MB = 16
+BENCH_FENS = [
+    chess.STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w KQ - 0 8",
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",
+    "8/8/4k3/8/2p5/8/B2P4/5K2 w - - 0 1",
+]
+
+
+def bench(depth=BENCH_DEPTH, fens=None, hash_mb=BENCH_HASH_MB, listener=None, stats=False):
+    """Search every position of the suite to ``depth``; ``listener`` gets
+    the result of each position as it finishes. With ``stats`` each result
+    carries the search statistics of its position."""
+    positions = []
+    start = time.time()
+    for fen in fens or BENCH_FENS:
+        searcher = Searcher(hash_mb=hash_mb, verbose=False, stats=stats)
+        position_start = time.time()
+        move = searcher.iterative_deepening(chess.Board(fen), max_depth=depth, time_manager=TimeManager())
+        result = {
+            "fen": fen,
+            "nodes": searcher.nodes,
+            "bestmove": move.uci() if move else None,
+            "score": searcher.best_eval,
+            "time": round(time.time() - position_start, 3),
+        }
+        if stats:
+            result["stats"] = searcher.stats.to_dict()
+        positions.append(result)
+        if listener:
+            listener(result)
+    elapsed = time.time() - start
+    nodes = sum(position["nodes"] for position in positions)
+    return {
+        "command": "bench",
+        "depth": depth,
+        "nodes": nodes,
+        "time": round(elapsed, 3),
+        "nps": int(nodes / elapsed) if elapsed > 0 else 0,
+        "python": platform.python_version(),
+        "positions": positions,
+    }
+
+
+def perft(board, depth):
+    """Leaf nodes of the legal move tree ``depth`` plies deep."""
+    if depth <= 1:
+        return board.legal_moves.count() if depth == 1 else 1
+    nodes = 0
+    for move in board.generate_legal_moves():
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def divide(board, depth):
+    """{move: perft(depth - 1) after the move} over the legal moves."""
+    counts = {}
+    for move in board.generate_legal_moves():
+        board.push(move)
+        counts[move.uci()] = perft(board, depth - 1)
+        board.pop()
+    return counts
+
+
+def perft_report(fen, depth, native=False):
+    start = time.time()
+    if depth <= 0:
+        counts = {}
+    elif native:
+        counts = Position(fen).divide(depth)
+    else:
+        counts = divide(SearchBoard(fen), depth)
+    elapsed = time.time() - start
+    nodes = sum(counts.values()) if depth > 0 else 1
+    return {
+        "command": "perft",
+        "fen": fen,
+        "depth": depth,
+        "native": native,
+        "nodes": nodes,
+        "time": round(elapsed, 3),
+        "nps": int(nodes / elapsed) if elapsed > 0 else 0,
+        "divide": counts,
+    }
+
+
+def write_json(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine bench and perft")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench_parser = commands.add_parser("bench", help="fixed-depth search of the bench suite")
+    bench_parser.add_argument("--depth", type=int, default=BENCH_DEPTH)
+    bench_parser.add_argument("--hash", type=int, default=BENCH_HASH_MB, help="MB per position")
+    bench_parser.add_argument("--stats", action="store_true", help="add search statistics per position")
+    bench_parser.add_argument("--json", help="write the report to this file")
+    perft_parser = commands.add_parser("perft", help="count move generation leaf nodes")
+    perft_parser.add_argument("depth", type=int)
+    perft_parser.add_argument("--fen", default=chess.STARTING_FEN)
+    perft_parser.add_argument("--native", action="store_true", help="use the integer bitboard Position")
+    perft_parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        report = bench(args.depth, hash_mb=args.hash, stats=args.stats, listener=lambda result: print(
+            f"[Bench] {result['nodes']:>9,} nodes {result['time']:7.2f}s  {result['bestmove']}  {result['fen']}"))
+        print(f"[Bench] Total: {report['nodes']} nodes in {report['time']:.2f}s - {report['nps']:,} NPS")
+    else:
+        report = perft_report(args.fen, args.depth, native=args.native)
+        for move, count in report["divide"].items():
+            print(f"{move}: {count}")
+        print(f"[Perft] Depth {args.depth}: {report['nodes']} nodes in {report['time']:.2f}s "
+              f"- {report['nps']:,} NPS")
+    if args.json:
+        write_json(report, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import random
+import struct
+from array import array
+from bisect import bisect_left
+
+import chess.polyglot
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BOOK = "baron30.bin"
+BOOK_ENV = "CHESS_BOOK"  # overrides the default book path
+KEY_STRUCT = struct.Struct(">Q8x")  # key of a 16-byte polyglot entry, rest skipped
+
+
+def resolve_path(path=None):
+    """``path``, else $CHESS_BOOK, else the bundled book. Relative paths
+    that do not exist from the working directory are taken relative to
+    this package, so the engine can be started from anywhere."""
+    path = path or os.environ.get(BOOK_ENV) or DEFAULT_BOOK
+    if not os.path.isabs(path) and not os.path.exists(path):
+        path = os.path.join(PACKAGE_DIR, path)
+    return os.path.abspath(path)
+
+
+class OpeningBook(chess.polyglot.MemoryMappedReader):
+    """Polyglot book mapped into memory once, with the keys copied into an
+    in-memory index.
+
+    Lookups bisect the index in C and only touch the mapped file for the
+    matching entries, never reopening it. ``find``, ``find_all`` and
+    ``weighted_choice`` come from ``MemoryMappedReader``. Pickling sends
+    the path and the index; the receiving process maps the same file
+    read-only, so the pages are shared by the OS.
+    """
+
+    def __init__(self, path=None):
+        self.path = resolve_path(path)
+        super().__init__(self.path)
+        # One sequential pass over the file; lookups then read only matching entries
+        self.keys = array("Q", (key for key, in KEY_STRUCT.iter_unpack(self.mmap[:])))
+
+    def bisect_key_left(self, key):
+        return bisect_left(self.keys, key)
+
+    def move(self, board, weighted=False, rng=random):
+        """Book move for ``board`` or None: the highest weighted entry, or
+        a random one in proportion to the weights."""
+        try:
+            entry = self.weighted_choice(board, random=rng) if weighted else self.find(board)
+        except IndexError:
+            return None
+        return entry.move
+
+    def __getstate__(self):
+        return {"path": self.path, "keys": self.keys}
+
+    def __setstate__(self, state):
+        chess.polyglot.MemoryMappedReader.__init__(self, state["path"])
+        self.path = state["path"]
+        self.keys = state["keys"]
+
+
+_default_book = None
+_MISSING = object()  # the book file was looked for and not found
+
+
+def default_book():
+    """The book shared by every AI of this process, opened on first use;
+    None if there is no book file. A missing file is reported once."""
+    global _default_book
+    if _default_book is None:
+        try:
+            _default_book = OpeningBook()
+        except FileNotFoundError:
+            print(f"[Book] Không tìm thấy sách khai cuộc {resolve_path()}")
+            _default_book = _MISSING
+    return None if _default_book is _MISSING else _default_book
@@ -0,0 +1,255 @@
+"""Compile PGN games into a Polyglot opening book.
+
+The PGN files are split into chunks of game text by the main process and
+parsed in a process pool; only a few chunks are in flight at a time.
+Each worker replays the first ``max_ply`` moves of every finished game
+and scores them for the side that played them: 2 for a win, 1 for a
+draw, 0 for a loss. The main process adds the chunk totals up and spills
+them to sorted run files whenever too many (position, move) pairs are in
+memory, so the archive size only costs disk. The runs are merged with
+cutoffs on the number of games, and the result is written as a sorted
+``.bin`` that ``book.OpeningBook`` and ``chess.polyglot`` read as is.
+
+    python bookgen.py games.pgn more.pgn --output mybook.bin \\
+        --max-ply 24 --min-games 3 --workers 8
+"""
+import argparse
+import heapq
+import io
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+from collections import deque
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+RESULT_POINTS = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}  # (white, black)
+RUN_STRUCT = struct.Struct(">QHII")  # key, raw move, weight sum, games
+MAX_WEIGHT = 0xFFFF  # polyglot weights are 16 bit
+GAMES_PER_CHUNK = 1000
+SPILL_ENTRIES = 1 << 22
+
+
+def polyglot_move(board, move):
+    """Raw 16-bit Polyglot encoding of ``move``. Castling is stored as the
+    king taking its own rook."""
+    to_square = move.to_square
+    if board.is_castling(move):
+        to_square = chess.square(7 if board.is_kingside_castling(move) else 0,
+                                 chess.square_rank(move.from_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | move.from_square << 6 | promotion << 12
+
+
+class OpeningVisitor(chess.pgn.BaseVisitor):
+    """Collects the first ``max_ply`` mainline moves of a finished game
+    from the standard starting position; later moves are not parsed."""
+
+    def __init__(self, max_ply):
+        self.max_ply = max_ply
+
+    def begin_game(self):
+        self.moves = []
+        self.points = None
+        self.skip = False
+
+    def visit_header(self, tagname, tagvalue):
+        if tagname == "Result":
+            self.points = RESULT_POINTS.get(tagvalue)
+        elif tagname == "FEN" and tagvalue != chess.STARTING_FEN:
+            self.skip = True
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def begin_parse_san(self, board, san):
+        if self.skip or self.points is None or len(self.moves) >= self.max_ply:
+            return chess.pgn.SKIP
+
+    def visit_move(self, board, move):
+        self.moves.append(move)
+
+    def handle_error(self, error):
+        self.skip = True
+
+    def result(self):
+        return None if self.skip or self.points is None else (self.moves, self.points)
+
+
+def count_chunk(text, max_ply):
+    """{(key, raw move): [weight, games]} over the games in ``text``."""
+    counts = {}
+    handle = io.StringIO(text)
+    visitor = OpeningVisitor(max_ply)
+    while True:
+        game = chess.pgn.read_game(handle, Visitor=lambda: visitor)
+        if game is None:
+            if handle.tell() >= len(text):
+                break
+            continue
+        moves, points = game
+        board = chess.Board()
+        for move in moves:
+            entry = (chess.polyglot.zobrist_hash(board), polyglot_move(board, move))
+            counted = counts.get(entry)
+            if counted is None:
+                counts[entry] = [points[not board.turn], 1]
+            else:
+                counted[0] += points[not board.turn]
+                counted[1] += 1
+            board.push(move)
+    return counts
+
+
+def read_chunks(paths, games_per_chunk=GAMES_PER_CHUNK):
+    """Text of ``games_per_chunk`` games at a time. A game starts at a tag
+    line that follows movetext, so no PGN parsing happens here."""
+    for path in paths:
+        lines = []
+        games = 0
+        in_moves = False
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if line.startswith("["):
+                    if in_moves:
+                        in_moves = False
+                        games += 1
+                        if games >= games_per_chunk:
+                            yield "".join(lines)
+                            lines = []
+                            games = 0
+                elif line.strip():
+                    in_moves = True
+                lines.append(line)
+        if lines:
+            yield "".join(lines)
+
+
+def write_run(counts, directory):
+    """Spill ``counts`` sorted by (key, move) to a run file."""
+    handle = tempfile.NamedTemporaryFile(dir=directory, suffix=".run", delete=False)
+    with handle:
+        pack = RUN_STRUCT.pack
+        for (key, raw), (weight, games) in sorted(counts.items()):
+            handle.write(pack(key, raw, weight, games))
+    return handle.name
+
+
+def read_run(path, records=1 << 14):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(RUN_STRUCT.size * records)
+            if not data:
+                return
+            yield from RUN_STRUCT.iter_unpack(data)
+
+
+def merge_runs(paths):
+    """Merged (key, raw move, weight, games) over all runs, one record per
+    distinct (key, move)."""
+    current = None
+    for key, raw, weight, games in heapq.merge(*(read_run(path) for path in paths)):
+        if current is not None and current[0] == key and current[1] == raw:
+            current[2] += weight
+            current[3] += games
+            continue
+        if current is not None:
+            yield current
+        current = [key, raw, weight, games]
+    if current is not None:
+        yield current
+
+
+def write_book(records, output, min_games=1, min_weight=1):
+    """Write the Polyglot book from records sorted by key. Weights of a
+    position are scaled down together when one would overflow 16 bits.
+    Returns the number of entries written."""
+    entries = 0
+
+    def flush(moves, out):
+        if not moves:
+            return 0
+        top = max(weight for _, _, weight in moves)
+        scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1
+        moves.sort(key=lambda move: move[2], reverse=True)
+        written = 0
+        for key, raw, weight in moves:
+            weight = max(1, int(weight * scale))
+            out.write(chess.polyglot.ENTRY_STRUCT.pack(key, raw, weight, 0))
+            written += 1
+        return written
+
+    with open(output, "wb") as out:
+        moves = []
+        for key, raw, weight, games in records:
+            if moves and moves[0][0] != key:
+                entries += flush(moves, out)
+                moves = []
+            if games >= min_games and weight >= min_weight:
+                moves.append((key, raw, weight))
+        entries += flush(moves, out)
+    return entries
+
+
+def build_book(paths, output, max_ply=24, min_games=2, min_weight=1, workers=None,
+               games_per_chunk=GAMES_PER_CHUNK, spill_entries=SPILL_ENTRIES):
+    workers = workers or multiprocessing.cpu_count()
+    start_time = time.time()
+    counts = {}
+    runs = []
+    # Spawned, not forked: a fork while another thread of the caller holds
+    # a lock (a search thread printing, say) can deadlock the workers.
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory, ctx.Pool(workers) as pool:
+
+        def merge(chunk_counts):
+            nonlocal counts
+            for entry, (weight, games) in chunk_counts.items():
+                counted = counts.get(entry)
+                if counted is None:
+                    counts[entry] = [weight, games]
+                else:
+                    counted[0] += weight
+                    counted[1] += games
+            if len(counts) >= spill_entries:
+                runs.append(write_run(counts, directory))
+                counts = {}
+
+        # At most two chunks per worker are in flight, so memory does not
+        # grow with the size of the archive.
+        pending = deque()
+        for chunk in read_chunks(paths, games_per_chunk):
+            pending.append(pool.apply_async(count_chunk, (chunk, max_ply)))
+            if len(pending) >= 2 * workers:
+                merge(pending.popleft().get())
+        while pending:
+            merge(pending.popleft().get())
+        runs.append(write_run(counts, directory))
+        counts = {}
+
+        entries = write_book(merge_runs(runs), output, min_games=min_games, min_weight=min_weight)
+    print(f"[Book] Wrote {entries:,} entries to {output} in {time.time() - start_time:.1f}s")
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile PGN games into a Polyglot opening book")
+    parser.add_argument("pgn", nargs="+", help="PGN files")
+    parser.add_argument("--output", default="book.bin")
+    parser.add_argument("--max-ply", type=int, default=24, help="plies of each game that enter the book")
+    parser.add_argument("--min-games", type=int, default=2, help="games a move needs to be kept")
+    parser.add_argument("--min-weight", type=int, default=1,
+                        help="points (win 2, draw 1) a move needs to be kept; 1 drops moves that only lost")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--games-per-chunk", type=int, default=GAMES_PER_CHUNK)
+    args = parser.parse_args()
+    build_book(args.pgn, args.output, max_ply=args.max_ply, min_games=args.min_games,
+               min_weight=args.min_weight, workers=args.workers, games_per_chunk=args.games_per_chunk)
+
+
+if __name__ == "__main__":
+    main()
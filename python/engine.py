@@ -0,0 +1,133 @@
+from threading import Event, Thread
+
+import chess.polyglot
+
+from searcher import Searcher, MAX_DEPTH
+from smp import ParallelSearcher
+from timeman import TimeManager
+
+
+class EngineSession:
+    """Search state that outlives a single move.
+
+    One session keeps its searcher, and with it the transposition table,
+    history scores and killer moves, for the whole game: the next root is
+    usually a subtree of the previous search, so the first iterations mostly
+    hit the table. Call ``new_game`` before an unrelated position to start
+    from a clean slate, and ``close`` when done (stops SMP helpers).
+
+    ``start_ponder`` searches the position after the expected reply in a
+    background thread. The next ``search`` either continues that search
+    (ponderhit) or stops it and starts over, keeping what it stored in the
+    transposition table. The ponder search prints nothing until ponderhit.
+    """
+
+    def __init__(self, hash_mb=32, threads=1, params=None, tablebase=None, verbose=True):
+        self.hash_mb = hash_mb
+        self.threads = threads
+        self.params = params
+        self.tablebase = tablebase
+        self.verbose = verbose
+        self.searcher = self.create_searcher()
+        self.ponder_board = None
+        self.ponder_thread = None
+        self.ponder_time_manager = None
+        self.ponder_result = None
+
+    def create_searcher(self):
+        if self.threads > 1:
+            return ParallelSearcher(threads=self.threads, hash_mb=self.hash_mb, params=self.params,
+                                    tablebase=self.tablebase, verbose=self.verbose)
+        return Searcher(hash_mb=self.hash_mb, params=self.params, tablebase=self.tablebase,
+                        verbose=self.verbose)
+
+    def set_verbose(self, verbose):
+        self.searcher.verbose = verbose
+        if isinstance(self.searcher, ParallelSearcher):
+            self.searcher.searcher.verbose = verbose
+
+    def subscribe(self, listener):
+        """Forward per-iteration SearchInfo events, see Searcher.subscribe."""
+        self.searcher.subscribe(listener)
+
+    def new_game(self):
+        self.stop_ponder()
+        self.searcher.new_game()
+
+    def search(self, board, time_manager=None, max_depth=MAX_DEPTH):
+        if self.ponder_thread is not None and board == self.ponder_board:
+            move = self.ponderhit(time_manager)
+            if move is not None:
+                return move
+        self.stop_ponder()
+        self.searcher.new_move(board)
+        return self.searcher.iterative_deepening(board, max_depth=max_depth,
+                                                 time_manager=time_manager)
+
+    def expected_reply(self, board, move):
+        """The opponent's reply to ``move`` predicted by the last search:
+        the second move of its PV, else the TT move after ``move``."""
+        pv = self.searcher.principal_variation
+        if len(pv) > 1 and pv[0] == move:
+            return pv[1]
+        board = board.copy(stack=False)
+        board.push(move)
+        entry = self.searcher.tt.get(chess.polyglot.zobrist_hash(board))
+        if entry and entry.move and board.is_legal(entry.move):
+            return entry.move
+        return None
+
+    def start_ponder(self, board, move, time_manager=None, max_depth=MAX_DEPTH):
+        """Search the position after ``move`` and the expected reply until
+        the opponent moves. Returns the expected reply, or None if there is
+        nothing to ponder on."""
+        self.stop_ponder()
+        reply = self.expected_reply(board, move)
+        if reply is None:
+            return None
+        board = board.copy()
+        board.push(move)
+        board.push(reply)
+        if board.is_game_over():
+            return None
+
+        time_manager = time_manager or TimeManager(movetime=9.5)
+        time_manager.pondering = True
+        time_manager.stop_event = time_manager.stop_event or Event()
+        self.ponder_board = board
+        self.ponder_time_manager = time_manager
+        self.ponder_result = None
+        self.searcher.new_move(board)
+        self.set_verbose(False)
+
+        def ponder_search():
+            self.ponder_result = self.searcher.iterative_deepening(
+                board, max_depth=max_depth, time_manager=time_manager)
+
+        self.ponder_thread = Thread(target=ponder_search, daemon=True)
+        self.ponder_thread.start()
+        return reply
+
+    def ponderhit(self, time_manager=None):
+        """The expected reply was played: let the ponder search finish on
+        the real clock and return its move."""
+        self.set_verbose(self.verbose)
+        self.ponder_time_manager.ponderhit(time_manager)
+        self.ponder_thread.join()
+        move = self.ponder_result
+        self.ponder_board = self.ponder_thread = self.ponder_time_manager = None
+        return move
+
+    def stop_ponder(self):
+        if self.ponder_thread is None:
+            return
+        self.ponder_time_manager.stop_event.set()
+        self.ponder_thread.join()
+        self.set_verbose(self.verbose)
+        self.ponder_board = self.ponder_thread = self.ponder_time_manager = None
+        self.ponder_result = None
+
+    def close(self):
+        self.stop_ponder()
+        if isinstance(self.searcher, ParallelSearcher):
+            self.searcher.close()
@@ -0,0 +1,46 @@
+from array import array
+
+ENTRY_BYTES = 16  # 64-bit key + double score
+
+
+class EvalCache:
+    """Direct-mapped cache of static evaluations keyed by Zobrist hash.
+
+    Each key owns exactly one slot (``key & mask``); a store simply
+    overwrites it. Probes and hits are counted so the size can be tuned
+    from ``hit_rate``.
+    """
+
+    def __init__(self, size_mb=4):
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        entries = 1
+        while entries * 2 * ENTRY_BYTES <= size_mb * 1024 * 1024:
+            entries *= 2
+        self.size_mb = size_mb
+        self.mask = entries - 1
+        self.clear()
+
+    def clear(self):
+        entries = self.mask + 1
+        self.keys = array("Q", bytes(entries * 8))
+        self.values = array("d", bytes(entries * 8))
+        self.probes = 0
+        self.hits = 0
+
+    def get(self, key):
+        self.probes += 1
+        index = key & self.mask
+        if self.keys[index] == key and key:
+            self.hits += 1
+            return self.values[index]
+        return None
+
+    def store(self, key, value):
+        index = key & self.mask
+        self.keys[index] = key
+        self.values[index] = value
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
@@ -1,5 +1,4 @@
 import chess
-import chess
 
 PAWN_TABLE = [
     0, 0, 0, 0, 0, 0, 0, 0,
@@ -107,6 +106,44 @@ piece_values = {
     chess.KING: 0
 }
 
+# Phase weight of each piece type; a side with PHASE_TOTAL or more is in
+# the middlegame, a bare king is in the endgame.
+phase_weights = {
+    chess.PAWN: 0,
+    chess.KNIGHT: 10,
+    chess.BISHOP: 10,
+    chess.ROOK: 20,
+    chess.QUEEN: 45,
+    chess.KING: 0
+}
+PHASE_TOTAL = 152
+
+# Terms of one side's score, kept as integers so that they can be updated
+# incrementally: material, phase, midgame PST sum, endgame PST sum.
+MATERIAL, PHASE, PST_MG, PST_EG = range(4)
+
+# piece_terms[piece_type][square]: what one piece adds to its side's terms
+piece_terms = {
+    pt: [(piece_values[pt], phase_weights[pt], t_early[sq], t_end[sq]) for sq in chess.SQUARES]
+    for pt, (t_early, t_end) in piece_square_tables.items()
+}
+
+
+# blended_tables[phase][piece_type][square]: PHASE_TOTAL times what one
+# piece adds to the score of a side with that phase, material included.
+# Pre-blending per phase keeps the whole evaluation in integers.
+blended_tables = [
+    {pt: [PHASE_TOTAL * piece_values[pt] + t_early[sq] * phase + t_end[sq] * (PHASE_TOTAL - phase)
+          for sq in chess.SQUARES]
+     for pt, (t_early, t_end) in piece_square_tables.items()}
+    for phase in range(PHASE_TOTAL + 1)
+]
+
+
+def endgame_weight(phase):
+    return max(0, 1 - phase / PHASE_TOTAL)
+
+
 def get_material_info(board, color):
     pieces = board.piece_map()
     value = 0
@@ -115,35 +152,75 @@ def get_material_info(board, color):
         if pc.color == color:
             num[pc.piece_type] += 1
             value += piece_values[pc.piece_type]
-    endgame_score = (
-        num[chess.QUEEN] * 45 + num[chess.ROOK] * 20 +
-        num[chess.BISHOP] * 10 + num[chess.KNIGHT] * 10
-    )
-    endgame_weight = max(0, 1 - endgame_score / 152)
-    return value, endgame_weight, num
+    endgame_score = sum(num[pt] * phase_weights[pt] for pt in num)
+    return value, endgame_weight(endgame_score), num
+
+def piece_square_sums(board, color):
+    """Midgame and endgame piece-square totals of one side."""
+    mg = eg = 0
+    for sq in chess.scan_forward(board.occupied_co[color]):
+        t_early, t_end = piece_square_tables[board.piece_type_at(sq)]
+        mg += t_early[sq]
+        eg += t_end[sq]
+    return mg, eg
+
+def blend(mg, eg, endgame_t):
+    return mg * (1 - endgame_t) + eg * endgame_t
 
 def evaluate_piece_square(board, color, endgame_t):
-    value = 0
-    for sq in chess.SQUARES:
-        pc = board.piece_at(sq)
-        if pc and pc.color == color:
-            t_early, t_end = piece_square_tables[pc.piece_type]
-            table_val = t_early[sq] * (1 - endgame_t) + t_end[sq] * endgame_t
-            value += table_val
-    return value
+    return blend(*piece_square_sums(board, color), endgame_t)
+
+def side_terms(board, color):
+    """Integer terms of one side, see MATERIAL .. PST_EG."""
+    material = phase = 0
+    for sq in chess.scan_forward(board.occupied_co[color]):
+        piece_type = board.piece_type_at(sq)
+        material += piece_values[piece_type]
+        phase += phase_weights[piece_type]
+    return [material, phase, *piece_square_sums(board, color)]
+
+def scaled_side_score(terms):
+    """PHASE_TOTAL times a side's score, as an exact integer.
+
+    With the endgame weight t = 1 - phase / PHASE_TOTAL (clamped at 0),
+    material + mg * (1 - t) + eg * t scaled by PHASE_TOTAL is
+    PHASE_TOTAL * material + mg * phase + eg * (PHASE_TOTAL - phase).
+    """
+    phase = min(terms[PHASE], PHASE_TOTAL)
+    return PHASE_TOTAL * terms[MATERIAL] + terms[PST_MG] * phase + terms[PST_EG] * (PHASE_TOTAL - phase)
+
+def evaluate_terms(white, black, turn):
+    """Score from the side to move's view given both sides' terms."""
+    eval_score = (scaled_side_score(white) - scaled_side_score(black)) / PHASE_TOTAL
+    return eval_score if turn == chess.WHITE else -eval_score
+
+def scaled_side_score_bitboard(board, color):
+    occupied = board.occupied_co[color]
+    knights = board.knights & occupied
+    bishops = board.bishops & occupied
+    rooks = board.rooks & occupied
+    queens = board.queens & occupied
+    phase = (chess.popcount(knights) * phase_weights[chess.KNIGHT]
+             + chess.popcount(bishops) * phase_weights[chess.BISHOP]
+             + chess.popcount(rooks) * phase_weights[chess.ROOK]
+             + chess.popcount(queens) * phase_weights[chess.QUEEN])
+    tables = blended_tables[min(phase, PHASE_TOTAL)]
+    score = 0
+    for piece_type, mask in ((chess.PAWN, board.pawns & occupied), (chess.KNIGHT, knights),
+                             (chess.BISHOP, bishops), (chess.ROOK, rooks), (chess.QUEEN, queens),
+                             (chess.KING, board.kings & occupied)):
+        table = tables[piece_type]
+        for sq in chess.scan_forward(mask):
+            score += table[sq]
+    return score
 
 def evaluate_board(board):
+    """Walks the set bits of each piece bitboard, takes the phase from
+    popcounts and sums integer tables pre-blended for that phase. Equal to
+    ``evaluate_terms`` over ``side_terms`` of both sides."""
     if board.is_checkmate():
         return -999999 if board.turn == chess.WHITE else 999999
 
-    white_mat, white_end, white_count = get_material_info(board, chess.WHITE)
-    black_mat, black_end, black_count = get_material_info(board, chess.BLACK)
-
-    white_score = white_mat
-    black_score = black_mat
-
-    white_score += evaluate_piece_square(board, chess.WHITE, white_end)
-    black_score += evaluate_piece_square(board, chess.BLACK, black_end)
-
-    eval_score = white_score - black_score
+    eval_score = (scaled_side_score_bitboard(board, chess.WHITE)
+                  - scaled_side_score_bitboard(board, chess.BLACK)) / PHASE_TOTAL
     return eval_score if board.turn == chess.WHITE else -eval_score
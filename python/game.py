@@ -13,7 +13,7 @@ from ui import get_promotion_choice
 
 
 class Game:
-    def __init__(self, ai_color=chess.BLACK, flip=False):
+    def __init__(self, ai_color=chess.BLACK, flip=False, session=None, ponder=False):
         self.board = chess.Board()
         self.view_board = self.board.copy()
         self.history_index = 0
@@ -23,7 +23,10 @@ class Game:
         self.ai_move_time = 0
         self.clock = pygame.time.Clock()
         self.running = True
-        self.ai = AI()
+        # Một phiên engine có thể dùng lại qua nhiều ván; bắt đầu ván mới thì xoá trạng thái cũ
+        self.ai = AI(session=session, ponder=ponder)
+        if session is not None:
+            self.ai.new_game()
         self.flip = flip
         self.last_move_from = None
         self.last_move_to = None
@@ -1,10 +1,19 @@
 import pygame
 from ui import draw_board, draw_pieces, highlight_moves
 from game import Game
+from engine import EngineSession
+from tablebase import Tablebase
 from ui import draw_promotion_choices, draw_game_over
+import argparse
 import chess
+import os
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cờ vua với AI")
+    parser.add_argument("--no-ponder", dest="ponder", action="store_false",
+                        help="không cho AI suy nghĩ trong lượt của người chơi")
+    args = parser.parse_args()
+
     WIDTH, HEIGHT = 630, 630 
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
@@ -22,6 +31,10 @@ if __name__ == "__main__":
     white_rect = pygame.Rect((WIDTH - button_width) // 2, HEIGHT // 2 - 80, button_width, button_height)
     black_rect = pygame.Rect((WIDTH - button_width) // 2, HEIGHT // 2 + 20, button_width, button_height)
 
+    # Syzygy tablebases are used when a "syzygy" folder of .rtbw/.rtbz files exists
+    tablebase = Tablebase("syzygy") if os.path.isdir("syzygy") else None
+    session = EngineSession(tablebase=tablebase)
+
     while True:
         waiting = True
         ai_color = None
@@ -54,7 +67,7 @@ if __name__ == "__main__":
                         waiting = False
 
         flip = ai_color == chess.WHITE
-        game = Game(ai_color=ai_color, flip=flip)
+        game = Game(ai_color=ai_color, flip=flip, session=session, ponder=args.ponder)
         if game.board.turn == game.ai_color:
             game.ai_thinking = True
             game.ai_move_time = pygame.time.get_ticks()
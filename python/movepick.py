@@ -0,0 +1,135 @@
+import chess
+
+piece_values = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 300,
+    chess.BISHOP: 320,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0
+}
+
+BB_PROMOTION_RANKS = chess.BB_RANK_1 | chess.BB_RANK_8
+
+
+def history_key(move):
+    return move.from_square << 6 | move.to_square
+
+
+def _has_fast_legality():
+    """Whether this python-chess has the private helpers it uses to test its
+    own pseudo-legal moves, with the signatures used below."""
+    try:
+        board = chess.Board()
+        king = board.king(board.turn)
+        return board._is_safe(king, board._slider_blockers(king), chess.Move.from_uci("e2e4"))
+    except (AttributeError, TypeError):
+        return False
+
+
+FAST_LEGALITY = _has_fast_legality()
+
+
+def legality_test(board):
+    """Legality test for pseudo-legal moves of ``board``, which must not be
+    in check. Uses python-chess's private ``_slider_blockers``/``_is_safe``
+    when available, the public ``board.is_legal`` otherwise."""
+    if not FAST_LEGALITY:
+        return board.is_legal
+    king = board.king(board.turn)
+    blockers = board._slider_blockers(king)
+    is_safe = board._is_safe
+    return lambda move: is_safe(king, blockers, move)
+
+
+class MovePicker:
+    """Staged, lazily generated move ordering for one node.
+
+    Stages: TT move (no generation at all), captures and promotions by
+    MVV-LVA, killers, then quiet moves by history score. Each stage is only
+    generated once the previous one is exhausted, so a cutoff on the TT move
+    or a capture skips quiet move generation entirely. Pseudo-legal moves are
+    checked for legality just before they are handed out; in check the
+    evasions are generated up front and need no further test.
+
+    With ``captures_only`` (quiescence) the picker stops after the capture
+    stage, unless the side to move is in check and every evasion is needed.
+    """
+    TT_MOVE, CAPTURES, KILLERS, QUIETS = range(4)
+
+    def __init__(self, board, tt_move=None, killers=(), history=None, captures_only=False):
+        self.board = board
+        self.tt_move = tt_move
+        self.killers = killers
+        self.history = history if history is not None else {}
+        self.captures_only = captures_only
+        self.stage = self.TT_MOVE
+
+    def capture_score(self, move):
+        board = self.board
+        score = 0
+        if board.is_capture(move):
+            victim = board.piece_type_at(move.to_square) or chess.PAWN  # en passant
+            score += piece_values[victim] * 10 - piece_values[board.piece_type_at(move.from_square)]
+        if move.promotion:
+            score += piece_values[move.promotion]
+        return score
+
+    def __iter__(self):
+        board = self.board
+        tt_move = self.tt_move
+
+        if board.is_check():
+            evasions = list(board.generate_legal_moves())
+            is_legal = None
+        else:
+            evasions = None
+            is_legal = legality_test(board)
+
+        if self.captures_only and evasions is None and tt_move and not (
+                tt_move.promotion or board.is_capture(tt_move)):
+            tt_move = None
+
+        self.stage = self.TT_MOVE
+        if tt_move and (tt_move in evasions if evasions is not None
+                        else board.is_pseudo_legal(tt_move) and is_legal(tt_move)):
+            yield tt_move
+
+        self.stage = self.CAPTURES
+        if evasions is not None:
+            tactical = [m for m in evasions if m.promotion or board.is_capture(m)]
+        else:
+            us = board.occupied_co[board.turn]
+            tactical = list(board.generate_pseudo_legal_captures())
+            tactical += [m for m in board.generate_pseudo_legal_moves(
+                             board.pawns & us, BB_PROMOTION_RANKS & ~board.occupied)]
+        tactical.sort(key=self.capture_score, reverse=True)
+        for move in tactical:
+            if move != tt_move and (is_legal is None or is_legal(move)):
+                yield move
+
+        if self.captures_only and evasions is None:
+            return
+
+        self.stage = self.KILLERS
+        played_killers = []
+        for move in self.killers:
+            if (move != tt_move and move not in played_killers
+                    and not move.promotion and not board.is_capture(move)
+                    and (move in evasions if evasions is not None
+                         else board.is_pseudo_legal(move) and is_legal(move))):
+                played_killers.append(move)
+                yield move
+
+        self.stage = self.QUIETS
+        if evasions is not None:
+            quiets = [m for m in evasions if not m.promotion and not board.is_capture(m)]
+        else:
+            quiets = [m for m in board.generate_pseudo_legal_moves(to_mask=~board.occupied_co[not board.turn])
+                      if not m.promotion and not board.is_en_passant(m)]
+        history = self.history
+        quiets.sort(key=lambda m: history.get(history_key(m), 0), reverse=True)
+        for move in quiets:
+            if (move != tt_move and move not in played_killers
+                    and (is_legal is None or is_legal(move))):
+                yield move
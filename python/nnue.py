@@ -0,0 +1,273 @@
+"""NNUE-style evaluation: a HalfKP network run on the CPU with NumPy.
+
+Architecture: 40960 HalfKP inputs -> 2 x H feature transformer (one half
+per perspective, side to move first) -> 32 -> 32 -> 1, with clipped ReLU
+in between. Weights are stored quantized in an ``.npz`` file:
+
+    ft_weight   (40960, H) int16    ft_bias   (H,) int16
+    l1_weight   (32, 2H)   int8     l1_bias   (32,) int32
+    l2_weight   (32, 32)   int8     l2_bias   (32,) int32
+    out_weight  (1, 32)    int8     out_bias  (1,) int32
+
+Locally trained float32 weights with the same names are quantized on load:
+activations map [0, 1] to [0, 127] and hidden weights are scaled by 64.
+The float network's output is in pawns.
+
+The first layer is kept incrementally: ``Accumulator`` holds its output
+for both perspectives and is updated by ``SearchBoard`` from the squares a
+move touched, so a quiet move costs two row additions and two
+subtractions per perspective. Only a king move refreshes its own side.
+
+    python nnue.py --bench [--weights net.npz] [--nodes 20000]
+"""
+import argparse
+import time
+
+import chess
+import numpy as np
+
+FORMAT = "halfkp-1"
+FEATURES = 64 * 640  # king square x (10 non-king pieces x 64 squares)
+L2_SIZE = 32
+L3_SIZE = 32
+ACTIVATION_MAX = 127  # clipped ReLU range after quantization
+WEIGHT_SHIFT = 6  # hidden weights are scaled by 2 ** WEIGHT_SHIFT
+CP_PER_PAWN = 100
+
+SHAPES = {
+    "ft_weight": lambda h: (FEATURES, h),
+    "ft_bias": lambda h: (h,),
+    "l1_weight": lambda h: (L2_SIZE, 2 * h),
+    "l1_bias": lambda h: (L2_SIZE,),
+    "l2_weight": lambda h: (L3_SIZE, L2_SIZE),
+    "l2_bias": lambda h: (L3_SIZE,),
+    "out_weight": lambda h: (1, L3_SIZE),
+    "out_bias": lambda h: (1,),
+}
+DTYPES = {
+    "ft_weight": np.int16, "ft_bias": np.int16,
+    "l1_weight": np.int8, "l1_bias": np.int32,
+    "l2_weight": np.int8, "l2_bias": np.int32,
+    "out_weight": np.int8, "out_bias": np.int32,
+}
+# Float -> integer scale of each array, see the module docstring.
+SCALES = {
+    "ft_weight": ACTIVATION_MAX, "ft_bias": ACTIVATION_MAX,
+    "l1_weight": 1 << WEIGHT_SHIFT, "l1_bias": ACTIVATION_MAX << WEIGHT_SHIFT,
+    "l2_weight": 1 << WEIGHT_SHIFT, "l2_bias": ACTIVATION_MAX << WEIGHT_SHIFT,
+    "out_weight": 1 << WEIGHT_SHIFT, "out_bias": ACTIVATION_MAX << WEIGHT_SHIFT,
+}
+
+
+def orient(perspective, square):
+    return square if perspective == chess.WHITE else square ^ 56
+
+
+def feature_index(perspective, king_square, color, piece_type, square):
+    """HalfKP feature of a non-king piece seen from ``perspective`` whose
+    own king stands on ``king_square``. Black sees the board flipped."""
+    piece = (piece_type - 1) * 2 + (color != perspective)
+    return orient(perspective, king_square) * 640 + piece * 64 + orient(perspective, square)
+
+
+def active_features(board, perspective):
+    king = board.king(perspective)
+    features = []
+    for square in chess.scan_forward(board.occupied & ~board.kings):
+        color = bool(board.occupied_co[chess.WHITE] & chess.BB_SQUARES[square])
+        features.append(feature_index(perspective, king, color, board.piece_type_at(square), square))
+    return features
+
+
+def quantize(name, array):
+    info = np.iinfo(DTYPES[name])
+    scaled = np.round(np.asarray(array, dtype=np.float64) * SCALES[name])
+    return np.clip(scaled, info.min, info.max).astype(DTYPES[name])
+
+
+class NNUE:
+    """Quantized HalfKP weights and the integer forward pass."""
+
+    def __init__(self, weights):
+        weights = dict(weights)  # quantized arrays must not leak into the caller's dict
+        hidden = len(weights["ft_bias"])
+        for name, shape in SHAPES.items():
+            if name not in weights:
+                raise ValueError(f"NNUE weights are missing '{name}'")
+            array = weights[name]
+            if array.shape != shape(hidden):
+                raise ValueError(f"NNUE '{name}' has shape {array.shape}, expected {shape(hidden)}")
+            if np.issubdtype(array.dtype, np.floating):
+                array = quantize(name, array)
+            elif array.dtype != DTYPES[name]:
+                raise ValueError(f"NNUE '{name}' has dtype {array.dtype}, expected {np.dtype(DTYPES[name])}")
+            weights[name] = array
+        self.hidden = hidden
+        self.weights = weights
+        # Accumulators are int32 sums of int16 rows. The small dense layers
+        # run as float64 BLAS products: every value is an integer far below
+        # 2 ** 53, so the results are exactly those of integer arithmetic.
+        self.ft_weight = weights["ft_weight"]
+        self.ft_bias = weights["ft_bias"].astype(np.int32)
+        self.l1_weight = weights["l1_weight"].astype(np.float64)
+        self.l1_bias = weights["l1_bias"].astype(np.float64)
+        self.l2_weight = weights["l2_weight"].astype(np.float64)
+        self.l2_bias = weights["l2_bias"].astype(np.float64)
+        self.out_weight = weights["out_weight"][0].astype(np.float64)
+        self.out_bias = float(weights["out_bias"][0])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if "format" in data.files and str(data["format"]) != FORMAT:
+                raise ValueError(f"Unsupported NNUE format {data['format']!s}, expected {FORMAT}")
+            return cls({name: data[name] for name in data.files if name in SHAPES})
+
+    def save(self, path):
+        np.savez(path, format=FORMAT, **self.weights)
+
+    @classmethod
+    def random(cls, hidden=256, seed=0):
+        """Untrained float weights, quantized like a local training run."""
+        rng = np.random.default_rng(seed)
+        weights = {}
+        for name, shape in SHAPES.items():
+            fan_in = 32 if name.startswith("ft") else shape(hidden)[-1]
+            weights[name] = rng.normal(0, 1 / np.sqrt(fan_in), shape(hidden)).astype(np.float32)
+        return cls(weights)
+
+    def refresh(self, board, perspective):
+        """First layer output of one perspective computed from scratch."""
+        return self.ft_bias + self.ft_weight[active_features(board, perspective)].sum(axis=0, dtype=np.int32)
+
+    def forward(self, us, them):
+        x = np.concatenate((us, them))
+        np.minimum(np.maximum(x, 0, out=x), ACTIVATION_MAX, out=x)
+        # floor(v / 2 ** WEIGHT_SHIFT) is the arithmetic shift v >> WEIGHT_SHIFT
+        x = np.floor((self.l1_weight @ x + self.l1_bias) * (1 / (1 << WEIGHT_SHIFT)))
+        np.minimum(np.maximum(x, 0, out=x), ACTIVATION_MAX, out=x)
+        x = np.floor((self.l2_weight @ x + self.l2_bias) * (1 / (1 << WEIGHT_SHIFT)))
+        np.minimum(np.maximum(x, 0, out=x), ACTIVATION_MAX, out=x)
+        out = int(self.out_weight @ x + self.out_bias)
+        return out * CP_PER_PAWN // (ACTIVATION_MAX << WEIGHT_SHIFT)
+
+    def evaluate(self, board):
+        """Same interface as ``evaluate.evaluate_board``."""
+        if board.is_checkmate():
+            return -999999 if board.turn == chess.WHITE else 999999
+        return self.forward(self.refresh(board, board.turn), self.refresh(board, not board.turn))
+
+    __call__ = evaluate
+
+
+class Accumulator:
+    """Stack of first layer outputs, ``(black, white)`` per position."""
+
+    def __init__(self, net, board):
+        self.net = net
+        self.reset(board)
+
+    def reset(self, board):
+        self.stack = [(self.net.refresh(board, chess.BLACK), self.net.refresh(board, chess.WHITE))]
+
+    @staticmethod
+    def pieces_on(board, squares):
+        """(piece_type, color) or None for each of ``squares``."""
+        white = board.occupied_co[chess.WHITE]
+        pieces = []
+        for square in squares:
+            piece_type = board.piece_type_at(square)
+            pieces.append((piece_type, bool(white & chess.BB_SQUARES[square])) if piece_type else None)
+        return pieces
+
+    def push(self, board, before, squares):
+        """``board`` has just played a move touching ``squares``, whose
+        pieces before the move were ``before`` (see ``pieces_on``)."""
+        net = self.net
+        weights = net.ft_weight
+        after = self.pieces_on(board, squares)
+
+        king_moved = [False, False]
+        for pieces in (before, after):
+            for piece in pieces:
+                if piece and piece[0] == chess.KING:
+                    king_moved[piece[1]] = True
+
+        accumulators = []
+        for perspective in (chess.BLACK, chess.WHITE):
+            if king_moved[perspective]:
+                accumulators.append(net.refresh(board, perspective))
+                continue
+            king = board.king(perspective)
+            removed = [feature_index(perspective, king, piece[1], piece[0], square)
+                       for square, piece in zip(squares, before) if piece and piece[0] != chess.KING]
+            added = [feature_index(perspective, king, piece[1], piece[0], square)
+                     for square, piece in zip(squares, after) if piece and piece[0] != chess.KING]
+            accumulator = self.stack[-1][perspective].copy()
+            for index in added:
+                accumulator += weights[index]
+            for index in removed:
+                accumulator -= weights[index]
+            accumulators.append(accumulator)
+        self.stack.append(tuple(accumulators))
+
+    def push_null(self):
+        self.stack.append(self.stack[-1])
+
+    def pop(self):
+        self.stack.pop()
+
+    def evaluate(self, turn):
+        accumulators = self.stack[-1]
+        return self.net.forward(accumulators[turn], accumulators[not turn])
+
+
+def benchmark(net, nodes=20000, fens=None):
+    """Searches of ``nodes`` nodes per position with the PST and the NNUE
+    evaluator; returns {name: (nodes, seconds, nps)}. A node budget rather
+    than a depth keeps the comparison fair for untrained nets, whose flat
+    scores barely prune."""
+    from searcher import Searcher, MAX_DEPTH
+    from timeman import TimeManager
+
+    fens = fens or [
+        chess.STARTING_FEN,
+        "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    ]
+    results = {}
+    for name, evaluator in (("pst", None), ("nnue", net)):
+        searched = 0
+        start = time.time()
+        for fen in fens:
+            searcher = Searcher(hash_mb=16, verbose=False, nnue=evaluator)
+            searcher.iterative_deepening(chess.Board(fen), max_depth=MAX_DEPTH,
+                                         time_manager=TimeManager(nodes=nodes))
+            searched += searcher.nodes
+        elapsed = time.time() - start
+        results[name] = (searched, elapsed, int(searched / elapsed) if elapsed > 0 else 0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NNUE evaluator tools")
+    parser.add_argument("--weights", help="quantized or float .npz weights (default: random net)")
+    parser.add_argument("--hidden", type=int, default=256, help="feature transformer size of a random net")
+    parser.add_argument("--bench", action="store_true", help="compare search NPS with the PST evaluator")
+    parser.add_argument("--nodes", type=int, default=20000, help="node budget per benchmark position")
+    args = parser.parse_args()
+
+    net = NNUE.load(args.weights) if args.weights else NNUE.random(args.hidden)
+    if args.bench:
+        results = benchmark(net, nodes=args.nodes)
+        for name, (nodes, elapsed, nps) in results.items():
+            print(f"[NNUE] {name:5s} {nodes:>9,} nodes {elapsed:7.2f}s {nps:>8,} NPS")
+        print(f"[NNUE] NNUE speed: {results['nnue'][2] / max(1, results['pst'][2]):.0%} of PST")
+    else:
+        print(f"[NNUE] {net.hidden}x2-{L2_SIZE}-{L3_SIZE}-1, start position: "
+              f"{net.evaluate(chess.Board())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+"""Search-only position with integer bitboards and integer moves.
+
+``Position`` is a lean alternative to ``chess.Board`` for the inner loop:
+moves are ints, legal moves come straight from precomputed attack tables
+(no ``chess.Move`` objects), and ``push``/``pop`` only touch the squares of
+the move and an undo stack. It converts to and from ``chess.Board`` at
+the root. Standard chess only.
+
+Sliding attacks are looked up in occupancy-indexed line tables: for every
+square and line (rank, file, both diagonals together) a dict maps the
+blockers on that line, edges excluded, to the attacked squares. In Python
+one dict lookup on a masked int is cheaper than the multiply-and-shift of
+magic bitboards, which needs 64-bit wrapping on unbounded ints.
+
+A move is ``from | to << 6 | promotion << 12 | flag << 15``; 0 is the
+null move.
+"""
+import chess
+import chess.polyglot
+
+from searchboard import CASTLING_KEYS, PIECE_KEYS, RANDOM, TURN_KEY
+
+NORMAL, DOUBLE_PUSH, EN_PASSANT, CASTLING = range(4)
+NULL_MOVE = 0
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = chess.PIECE_TYPES
+BB_ALL = chess.BB_ALL
+BB_SQUARES = [1 << square for square in range(64)]
+EP_KEYS = [RANDOM[772 + file] for file in range(8)]
+CASTLING_CORNERS = chess.BB_A1 | chess.BB_H1 | chess.BB_A8 | chess.BB_H8
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+
+def _ray_attacks(square, occupied, directions):
+    """Squares reached from ``square`` along ``directions`` (file, rank
+    steps), each ray stopping at the first occupied square."""
+    attacks = 0
+    file, rank = square & 7, square >> 3
+    for df, dr in directions:
+        f, r = file + df, rank + dr
+        while 0 <= f < 8 and 0 <= r < 8:
+            attacks |= BB_SQUARES[r * 8 + f]
+            if occupied & BB_SQUARES[r * 8 + f]:
+                break
+            f, r = f + df, r + dr
+    return attacks
+
+
+def _step_attacks(square, steps):
+    return _ray_attacks(square, BB_ALL, steps)
+
+
+def _line_table(directions):
+    """(masks, attacks): the relevant blockers of each square and a dict
+    from every subset of them to the attacked squares."""
+    masks, tables = [], []
+    for square in range(64):
+        file, rank = square & 7, square >> 3
+        edges = ((chess.BB_RANK_1 | chess.BB_RANK_8) & ~chess.BB_RANKS[rank]) | \
+                ((chess.BB_FILE_A | chess.BB_FILE_H) & ~chess.BB_FILES[file])
+        mask = _ray_attacks(square, 0, directions) & ~edges
+        table = {}
+        subset = 0
+        while True:  # carry-rippler: every subset of mask
+            table[subset] = _ray_attacks(square, subset, directions)
+            subset = (subset - mask) & mask
+            if not subset:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+KNIGHT_ATTACKS = [_step_attacks(sq, ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)))
+                  for sq in range(64)]
+KING_ATTACKS = [_step_attacks(sq, ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)))
+                for sq in range(64)]
+# PAWN_ATTACKS[color][square]: squares a pawn of ``color`` on ``square`` attacks
+PAWN_ATTACKS = [[_step_attacks(sq, steps) for sq in range(64)]
+                for steps in (((-1, -1), (1, -1)), ((-1, 1), (1, 1)))]
+
+RANK_MASKS, RANK_ATTACKS = _line_table(((1, 0), (-1, 0)))
+FILE_MASKS, FILE_ATTACKS = _line_table(((0, 1), (0, -1)))
+DIAG_MASKS, DIAG_ATTACKS = _line_table(((1, 1), (-1, -1), (1, -1), (-1, 1)))
+
+
+def bishop_attacks(square, occupied):
+    return DIAG_ATTACKS[square][DIAG_MASKS[square] & occupied]
+
+
+def rook_attacks(square, occupied):
+    return RANK_ATTACKS[square][RANK_MASKS[square] & occupied] | FILE_ATTACKS[square][FILE_MASKS[square] & occupied]
+
+
+ROOK_RAYS = [rook_attacks(sq, 0) for sq in range(64)]
+BISHOP_RAYS = [bishop_attacks(sq, 0) for sq in range(64)]
+
+# BETWEEN[a][b]: squares strictly between two aligned squares;
+# LINE[a][b]: the whole line through them. Both 0 when not aligned.
+BETWEEN = [[0] * 64 for _ in range(64)]
+LINE = [[0] * 64 for _ in range(64)]
+for _a in range(64):
+    for _b in range(64):
+        for _rays, _attacks in ((ROOK_RAYS, rook_attacks), (BISHOP_RAYS, bishop_attacks)):
+            if _a != _b and _rays[_a] & BB_SQUARES[_b]:
+                BETWEEN[_a][_b] = _attacks(_a, BB_SQUARES[_b]) & _attacks(_b, BB_SQUARES[_a])
+                LINE[_a][_b] = (_rays[_a] & _rays[_b]) | BB_SQUARES[_a] | BB_SQUARES[_b]
+
+# Castling: king destination -> (rook from, rook to, squares that must be
+# empty, squares the king crosses that must not be attacked)
+CASTLING_ROOKS = {
+    chess.G1: (chess.H1, chess.F1, chess.BB_F1 | chess.BB_G1, (chess.F1, chess.G1)),
+    chess.C1: (chess.A1, chess.D1, chess.BB_B1 | chess.BB_C1 | chess.BB_D1, (chess.D1, chess.C1)),
+    chess.G8: (chess.H8, chess.F8, chess.BB_F8 | chess.BB_G8, (chess.F8, chess.G8)),
+    chess.C8: (chess.A8, chess.D8, chess.BB_B8 | chess.BB_C8 | chess.BB_D8, (chess.D8, chess.C8)),
+}
+# (rook corner, king from, king to) per color, kingside first
+CASTLING_MOVES = [
+    ((chess.BB_H8, chess.E8, chess.G8), (chess.BB_A8, chess.E8, chess.C8)),
+    ((chess.BB_H1, chess.E1, chess.G1), (chess.BB_A1, chess.E1, chess.C1)),
+]
+# Castling rights lost when a move leaves from or arrives on a square
+CASTLING_LOST = [0] * 64
+for _corner in (chess.A1, chess.H1, chess.A8, chess.H8):
+    CASTLING_LOST[_corner] = BB_SQUARES[_corner]
+CASTLING_LOST[chess.E1] = chess.BB_A1 | chess.BB_H1
+CASTLING_LOST[chess.E8] = chess.BB_A8 | chess.BB_H8
+
+
+def to_chess_move(move):
+    if not move:
+        return chess.Move.null()
+    return chess.Move(move & 63, move >> 6 & 63, move >> 12 & 7 or None)
+
+
+def move_uci(move):
+    return to_chess_move(move).uci()
+
+
+class Position:
+    """Integer bitboard position with make/unmake through an undo stack.
+
+    ``pieces[piece_type]`` and ``occupied_co[color]`` are bitboards laid
+    out like ``chess.Board``'s; ``types[square]`` is the piece type on a
+    square (0 when empty). ``castling`` holds the rook corners that may
+    still castle and ``ep_square`` is only set when a pawn can capture en
+    passant, which is also when the polyglot ``key`` includes it, so the
+    key always equals ``chess.polyglot.zobrist_hash`` of the position.
+    """
+
+    def __init__(self, fen=chess.STARTING_FEN):
+        self.load(chess.Board(fen))
+
+    @classmethod
+    def from_board(cls, board):
+        """Position of ``board`` with its move history replayed, so the
+        undo stack also covers the game before the search root."""
+        position = cls(board.root().fen())
+        for move in board.move_stack:
+            position.push(position.from_chess_move(move))
+        return position
+
+    def load(self, board):
+        if board.chess960:
+            raise ValueError("Position supports standard chess only")
+        self.pieces = [0] + [board.pieces_mask(piece_type, chess.WHITE) | board.pieces_mask(piece_type, chess.BLACK)
+                             for piece_type in chess.PIECE_TYPES]
+        self.occupied_co = [board.occupied_co[chess.BLACK], board.occupied_co[chess.WHITE]]
+        self.occupied = board.occupied
+        self.types = [board.piece_type_at(square) or 0 for square in range(64)]
+        self.turn = board.turn
+        self.castling = board.clean_castling_rights() & CASTLING_CORNERS
+        self.ep_square = None
+        if (board.ep_square is not None
+                and PAWN_ATTACKS[not board.turn][board.ep_square] & self.pieces[PAWN] & self.occupied_co[board.turn]):
+            self.ep_square = board.ep_square
+        self.halfmove_clock = board.halfmove_clock
+        self.fullmove_number = board.fullmove_number
+        self.key = chess.polyglot.zobrist_hash(board)
+        self.stack = []
+
+    def to_board(self):
+        return chess.Board(self.fen())
+
+    def fen(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = "", 0
+            for file in range(8):
+                square = rank * 8 + file
+                piece_type = self.types[square]
+                if not piece_type:
+                    empty += 1
+                    continue
+                if empty:
+                    row, empty = row + str(empty), 0
+                symbol = chess.PIECE_SYMBOLS[piece_type]
+                row += symbol.upper() if self.occupied_co[chess.WHITE] & BB_SQUARES[square] else symbol
+            rows.append(row + (str(empty) if empty else ""))
+        castling = "".join(symbol for symbol, corner in (("K", chess.BB_H1), ("Q", chess.BB_A1),
+                                                         ("k", chess.BB_H8), ("q", chess.BB_A8))
+                           if self.castling & corner) or "-"
+        ep = chess.SQUARE_NAMES[self.ep_square] if self.ep_square is not None else "-"
+        return (f"{'/'.join(rows)} {'w' if self.turn else 'b'} {castling} {ep} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    def from_chess_move(self, move):
+        """Integer encoding of a ``chess.Move`` in this position."""
+        if not move:
+            return NULL_MOVE
+        from_square, to_square = move.from_square, move.to_square
+        piece_type = self.types[from_square]
+        flag = NORMAL
+        if piece_type == PAWN:
+            if abs(to_square - from_square) == 16:
+                flag = DOUBLE_PUSH
+            elif to_square == self.ep_square:
+                flag = EN_PASSANT
+        elif piece_type == KING and abs(to_square - from_square) == 2:
+            flag = CASTLING
+        return from_square | to_square << 6 | (move.promotion or 0) << 12 | flag << 15
+
+    def attackers(self, color, square, occupied):
+        """Pieces of ``color`` attacking ``square`` given ``occupied``."""
+        pieces = self.pieces
+        queens = pieces[QUEEN]
+        return self.occupied_co[color] & (
+            (PAWN_ATTACKS[not color][square] & pieces[PAWN])
+            | (KNIGHT_ATTACKS[square] & pieces[KNIGHT])
+            | (KING_ATTACKS[square] & pieces[KING])
+            | (DIAG_ATTACKS[square][DIAG_MASKS[square] & occupied] & (pieces[BISHOP] | queens))
+            | ((RANK_ATTACKS[square][RANK_MASKS[square] & occupied]
+                | FILE_ATTACKS[square][FILE_MASKS[square] & occupied]) & (pieces[ROOK] | queens)))
+
+    def king(self, color):
+        return (self.pieces[KING] & self.occupied_co[color]).bit_length() - 1
+
+    def is_check(self):
+        return bool(self.attackers(not self.turn, self.king(self.turn), self.occupied))
+
+    def is_capture(self, move):
+        return bool(self.occupied & BB_SQUARES[move >> 6 & 63]) or move >> 15 == EN_PASSANT
+
+    def gives_check(self, move):
+        self.push(move)
+        check = self.is_check()
+        self.pop()
+        return check
+
+    def pinned(self, color, king):
+        """Pieces of ``color`` pinned to the king on ``king``."""
+        pieces = self.pieces
+        them = self.occupied_co[not color]
+        snipers = them & ((ROOK_RAYS[king] & (pieces[ROOK] | pieces[QUEEN]))
+                          | (BISHOP_RAYS[king] & (pieces[BISHOP] | pieces[QUEEN])))
+        pinned = 0
+        occupied = self.occupied
+        between = BETWEEN[king]
+        while snipers:
+            sniper = snipers & -snipers
+            snipers ^= sniper
+            blockers = between[sniper.bit_length() - 1] & occupied
+            if blockers and not blockers & (blockers - 1):
+                pinned |= blockers
+        return pinned & self.occupied_co[color]
+
+    def legal_moves(self):
+        """All legal moves as a list of ints."""
+        us = self.turn
+        them = not us
+        pieces = self.pieces
+        ours = self.occupied_co[us]
+        theirs = self.occupied_co[them]
+        occupied = self.occupied
+        king = (pieces[KING] & ours).bit_length() - 1
+        checkers = self.attackers(them, king, occupied)
+        moves = []
+        append = moves.append
+
+        # King moves: test the destination with the king off the board so
+        # it cannot hide behind itself from a slider.
+        without_king = occupied ^ BB_SQUARES[king]
+        targets = KING_ATTACKS[king] & ~ours
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            to_square = bit.bit_length() - 1
+            if not self.attackers(them, to_square, without_king):
+                append(king | to_square << 6)
+        if checkers & (checkers - 1):
+            return moves  # double check: only the king moves
+
+        if checkers:
+            target = BETWEEN[king][checkers.bit_length() - 1] | checkers
+        else:
+            target = ~ours & BB_ALL
+            for corner, king_from, king_to in CASTLING_MOVES[us]:
+                if self.castling & corner and king == king_from:
+                    _, _, empty, crossed = CASTLING_ROOKS[king_to]
+                    if not occupied & empty and not any(self.attackers(them, square, occupied)
+                                                        for square in crossed):
+                        append(king | king_to << 6 | CASTLING << 15)
+
+        pinned = self.pinned(us, king)
+        line = LINE[king]
+
+        knights = pieces[KNIGHT] & ours & ~pinned
+        while knights:
+            bit = knights & -knights
+            knights ^= bit
+            from_square = bit.bit_length() - 1
+            targets = KNIGHT_ATTACKS[from_square] & target
+            while targets:
+                to_bit = targets & -targets
+                targets ^= to_bit
+                append(from_square | (to_bit.bit_length() - 1) << 6)
+
+        queens = pieces[QUEEN]
+        diagonal = (pieces[BISHOP] | queens) & ours
+        while diagonal:
+            bit = diagonal & -diagonal
+            diagonal ^= bit
+            from_square = bit.bit_length() - 1
+            targets = DIAG_ATTACKS[from_square][DIAG_MASKS[from_square] & occupied] & target
+            if bit & pinned:
+                targets &= line[from_square]
+            while targets:
+                to_bit = targets & -targets
+                targets ^= to_bit
+                append(from_square | (to_bit.bit_length() - 1) << 6)
+
+        straight = (pieces[ROOK] | queens) & ours
+        while straight:
+            bit = straight & -straight
+            straight ^= bit
+            from_square = bit.bit_length() - 1
+            targets = (RANK_ATTACKS[from_square][RANK_MASKS[from_square] & occupied]
+                       | FILE_ATTACKS[from_square][FILE_MASKS[from_square] & occupied]) & target
+            if bit & pinned:
+                targets &= line[from_square]
+            while targets:
+                to_bit = targets & -targets
+                targets ^= to_bit
+                append(from_square | (to_bit.bit_length() - 1) << 6)
+
+        # Pawns set-wise: (targets, from = to - delta, flag)
+        pawns = pieces[PAWN] & ours
+        empty = ~occupied & BB_ALL
+        if us:
+            single = (pawns << 8) & empty
+            double = ((single & chess.BB_RANK_3) << 8) & empty & target
+            groups = ((single & target, 8, NORMAL), (double, 16, DOUBLE_PUSH),
+                      (((pawns & ~chess.BB_FILE_A) << 7) & theirs & target, 7, NORMAL),
+                      (((pawns & ~chess.BB_FILE_H) << 9) & theirs & target, 9, NORMAL))
+            last_rank = chess.BB_RANK_8
+        else:
+            single = pawns >> 8 & empty
+            double = ((single & chess.BB_RANK_6) >> 8) & empty & target
+            groups = ((single & target, -8, NORMAL), (double, -16, DOUBLE_PUSH),
+                      (((pawns & ~chess.BB_FILE_H) >> 7) & theirs & target, -7, NORMAL),
+                      (((pawns & ~chess.BB_FILE_A) >> 9) & theirs & target, -9, NORMAL))
+            last_rank = chess.BB_RANK_1
+        pinned_pawns = pawns & pinned
+        for targets, delta, flag in groups:
+            while targets:
+                to_bit = targets & -targets
+                targets ^= to_bit
+                to_square = to_bit.bit_length() - 1
+                from_square = to_square - delta
+                if pinned_pawns & BB_SQUARES[from_square] and not line[from_square] & to_bit:
+                    continue
+                move = from_square | to_square << 6 | flag << 15
+                if to_bit & last_rank:
+                    for promotion in PROMOTIONS:
+                        append(move | promotion << 12)
+                else:
+                    append(move)
+
+        ep_square = self.ep_square
+        if ep_square is not None:
+            captured = ep_square ^ 8
+            capturers = PAWN_ATTACKS[them][ep_square] & pawns
+            while capturers:
+                bit = capturers & -capturers
+                capturers ^= bit
+                # Both pawns leave their rank at once, so test the king directly
+                after = (occupied ^ bit ^ BB_SQUARES[captured]) | BB_SQUARES[ep_square]
+                attackers = self.attackers(them, king, after) & ~BB_SQUARES[captured]
+                if not attackers:
+                    append((bit.bit_length() - 1) | ep_square << 6 | EN_PASSANT << 15)
+        return moves
+
+    def push(self, move):
+        us = self.turn
+        them = not us
+        captured = self.types[move >> 6 & 63] if move else 0
+        self.stack.append((move, self.castling, self.ep_square, self.halfmove_clock, self.key, captured))
+        key = self.key ^ TURN_KEY
+        if self.ep_square is not None:
+            key ^= EP_KEYS[self.ep_square & 7]
+            self.ep_square = None
+        self.turn = them
+        if not us:
+            self.fullmove_number += 1
+        if not move:
+            self.halfmove_clock += 1
+            self.key = key
+            return
+
+        from_square = move & 63
+        to_square = move >> 6 & 63
+        flag = move >> 15
+        pieces = self.pieces
+        types = self.types
+        occupied_co = self.occupied_co
+        piece_type = types[from_square]
+        from_bit = BB_SQUARES[from_square]
+        to_bit = BB_SQUARES[to_square]
+        us_keys = PIECE_KEYS[us]
+
+        if captured:
+            pieces[captured] ^= to_bit
+            occupied_co[them] ^= to_bit
+            key ^= PIECE_KEYS[them][captured][to_square]
+        pieces[piece_type] ^= from_bit | to_bit
+        occupied_co[us] ^= from_bit | to_bit
+        types[from_square] = 0
+        types[to_square] = piece_type
+        key ^= us_keys[piece_type][from_square] ^ us_keys[piece_type][to_square]
+
+        if flag == DOUBLE_PUSH:
+            ep_square = (from_square + to_square) >> 1
+            if PAWN_ATTACKS[us][ep_square] & pieces[PAWN] & occupied_co[them]:
+                self.ep_square = ep_square
+                key ^= EP_KEYS[ep_square & 7]
+        elif flag == EN_PASSANT:
+            captured_square = to_square ^ 8
+            captured_bit = BB_SQUARES[captured_square]
+            pieces[PAWN] ^= captured_bit
+            occupied_co[them] ^= captured_bit
+            types[captured_square] = 0
+            key ^= PIECE_KEYS[them][PAWN][captured_square]
+        elif flag == CASTLING:
+            rook_from, rook_to = CASTLING_ROOKS[to_square][:2]
+            rook_bits = BB_SQUARES[rook_from] | BB_SQUARES[rook_to]
+            pieces[ROOK] ^= rook_bits
+            occupied_co[us] ^= rook_bits
+            types[rook_from] = 0
+            types[rook_to] = ROOK
+            key ^= us_keys[ROOK][rook_from] ^ us_keys[ROOK][rook_to]
+        promotion = move >> 12 & 7
+        if promotion:
+            pieces[PAWN] ^= to_bit
+            pieces[promotion] |= to_bit
+            types[to_square] = promotion
+            key ^= us_keys[PAWN][to_square] ^ us_keys[promotion][to_square]
+
+        castling = self.castling
+        if castling and (CASTLING_LOST[from_square] | CASTLING_LOST[to_square]) & castling:
+            key ^= CASTLING_KEYS[castling]
+            castling &= ~(CASTLING_LOST[from_square] | CASTLING_LOST[to_square])
+            key ^= CASTLING_KEYS[castling]
+            self.castling = castling
+
+        self.halfmove_clock = 0 if piece_type == PAWN or captured else self.halfmove_clock + 1
+        self.occupied = occupied_co[0] | occupied_co[1]
+        self.key = key
+
+    def pop(self):
+        move, self.castling, self.ep_square, self.halfmove_clock, self.key, captured = self.stack.pop()
+        them = self.turn
+        us = not them
+        self.turn = us
+        if not us:
+            self.fullmove_number -= 1
+        if not move:
+            return move
+
+        from_square = move & 63
+        to_square = move >> 6 & 63
+        flag = move >> 15
+        pieces = self.pieces
+        types = self.types
+        occupied_co = self.occupied_co
+        from_bit = BB_SQUARES[from_square]
+        to_bit = BB_SQUARES[to_square]
+
+        promotion = move >> 12 & 7
+        if promotion:
+            pieces[promotion] ^= to_bit
+            pieces[PAWN] |= to_bit
+            types[to_square] = PAWN
+        piece_type = types[to_square]
+        pieces[piece_type] ^= from_bit | to_bit
+        occupied_co[us] ^= from_bit | to_bit
+        types[from_square] = piece_type
+        types[to_square] = captured
+        if captured:
+            pieces[captured] |= to_bit
+            occupied_co[them] |= to_bit
+
+        if flag == EN_PASSANT:
+            captured_square = to_square ^ 8
+            captured_bit = BB_SQUARES[captured_square]
+            pieces[PAWN] |= captured_bit
+            occupied_co[them] |= captured_bit
+            types[captured_square] = PAWN
+        elif flag == CASTLING:
+            rook_from, rook_to = CASTLING_ROOKS[to_square][:2]
+            rook_bits = BB_SQUARES[rook_from] | BB_SQUARES[rook_to]
+            pieces[ROOK] ^= rook_bits
+            occupied_co[us] ^= rook_bits
+            types[rook_to] = 0
+            types[rook_from] = ROOK
+        self.occupied = occupied_co[0] | occupied_co[1]
+        return move
+
+    def perft(self, depth):
+        if depth <= 0:
+            return 1
+        moves = self.legal_moves()
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            self.push(move)
+            nodes += self.perft(depth - 1)
+            self.pop()
+        return nodes
+
+    def divide(self, depth):
+        """{uci: perft(depth - 1) after the move} over the legal moves."""
+        counts = {}
+        for move in self.legal_moves():
+            self.push(move)
+            counts[move_uci(move)] = self.perft(depth - 1)
+            self.pop()
+        return counts
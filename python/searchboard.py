@@ -0,0 +1,191 @@
+import chess
+import chess.polyglot
+
+from evaluate import evaluate_terms, piece_terms, side_terms
+
+RANDOM = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+TURN_KEY = RANDOM[780]
+
+# PIECE_KEYS[color][piece_type][square], following the polyglot layout.
+PIECE_KEYS = [
+    [None] + [[RANDOM[64 * ((pt - 1) * 2 + color) + sq] for sq in chess.SQUARES]
+              for pt in chess.PIECE_TYPES]
+    for color in (chess.BLACK, chess.WHITE)
+]
+
+CASTLING_CORNERS = chess.BB_A1 | chess.BB_H1 | chess.BB_A8 | chess.BB_H8
+CASTLING_KEYS = {}
+for _mask in range(16):
+    _rights, _key = 0, 0
+    for _bit, (_corner, _index) in enumerate(((chess.BB_H1, 768), (chess.BB_A1, 769),
+                                              (chess.BB_H8, 770), (chess.BB_A8, 771))):
+        if _mask >> _bit & 1:
+            _rights |= _corner
+            _key ^= RANDOM[_index]
+    CASTLING_KEYS[_rights] = _key
+
+_hasher = chess.polyglot.ZobristHasher(RANDOM)
+
+
+class SearchBoard(chess.Board):
+    """chess.Board that keeps its polyglot Zobrist key up to date on push/pop.
+
+    Only the squares touched by a move are rehashed, plus the castling, en
+    passant and side-to-move terms, so ``zobrist_key`` is always equal to
+    ``chess.polyglot.zobrist_hash(board)`` without walking the board.
+
+    The material, phase and piece-square sums of both sides are updated
+    from the same touched squares, which makes ``evaluate`` O(1). With an
+    NNUE accumulator attached (``use_nnue``) the network's first layer is
+    updated from those squares too and ``evaluate`` runs the network.
+    """
+    accumulator = None
+
+    @classmethod
+    def from_board(cls, board):
+        """Rebuild ``board`` including its move history, so the key stack
+        also covers the game played before the search root."""
+        search_board = cls(board.root().fen(), chess960=board.chess960)
+        for move in board.move_stack:
+            search_board.push(move)
+        return search_board
+
+    @property
+    def zobrist_key(self):
+        return self.keys[-1]
+
+    def use_nnue(self, net):
+        from nnue import Accumulator
+        self.accumulator = Accumulator(net, self)
+
+    def evaluate(self):
+        """Same score as ``evaluate.evaluate_board`` unless the side to move
+        is checkmated, which is left to the search."""
+        if self.accumulator is not None:
+            return self.accumulator.evaluate(self.turn)
+        black, white = self.terms[-1]
+        return evaluate_terms(white, black, self.turn)
+
+    def clear_stack(self):
+        super().clear_stack()
+        self.keys = [chess.polyglot.zobrist_hash(self)]
+        # terms[i][color]: evaluation terms of each side, indexed like colors
+        self.terms = [(side_terms(self, chess.BLACK), side_terms(self, chess.WHITE))]
+        if self.accumulator is not None:
+            self.accumulator.reset(self)
+        # How far back each position may look for a repetition: bounded by
+        # the halfmove clock and reset by null moves.
+        self.reversible = [0]
+
+    def root(self):
+        board = super().root()
+        board.keys = self.keys[:1]
+        board.terms = self.terms[:1]
+        board.reversible = [0]
+        return board
+
+    def copy(self, *, stack=True):
+        board = super().copy(stack=stack)
+        board.keys = self.keys[-(len(board.move_stack) + 1):]
+        board.terms = self.terms[-(len(board.move_stack) + 1):]
+        board.reversible = self.reversible[-(len(board.move_stack) + 1):]
+        return board
+
+    def is_repetition_draw(self, ply):
+        """Detect a draw by repetition ``ply`` half-moves below the search root.
+
+        Only positions with the same side to move since the last irreversible
+        move are compared. A single repetition of a position reached inside
+        the search tree counts as a draw; positions from the game history
+        before the root must have occurred twice.
+        """
+        keys = self.keys
+        key = keys[-1]
+        last = len(keys) - 1
+        limit = min(self.reversible[-1], last)
+        seen = 0
+        for distance in range(4, limit + 1, 2):
+            if keys[last - distance] == key:
+                if distance < ply:
+                    return True
+                seen += 1
+                if seen == 2:
+                    return True
+        return False
+
+    def push(self, move):
+        key = self.keys[-1] ^ TURN_KEY ^ _hasher.hash_ep_square(self)
+
+        if not move:
+            super().push(move)
+            self.keys.append(key)
+            self.terms.append(self.terms[-1])
+            self.reversible.append(0)
+            if self.accumulator is not None:
+                self.accumulator.push_null()
+            return
+
+        if self.castling_rights:
+            key ^= CASTLING_KEYS[self.clean_castling_rights() & CASTLING_CORNERS]
+
+        touched = [move.from_square, move.to_square]
+        if self.is_castling(move):
+            # The king's target may coincide with a rook square depending on
+            # how the move is written, so collect the squares as a set.
+            rank = chess.square_rank(move.from_square) * 8
+            if chess.square_file(move.to_square) < chess.square_file(move.from_square):
+                touched = {move.from_square, rank, rank + 2, rank + 3}
+            else:
+                touched = {move.from_square, rank + 7, rank + 6, rank + 5}
+        elif (move.to_square == self.ep_square
+              and self.pawns & chess.BB_SQUARES[move.from_square]):
+            touched.append(move.to_square + (-8 if self.turn == chess.WHITE else 8))
+
+        accumulator = self.accumulator
+        if accumulator is not None:
+            touched = list(touched)
+            before = accumulator.pieces_on(self, touched)
+
+        sides = [list(side) for side in self.terms[-1]]
+        white = self.occupied_co[chess.WHITE]
+        for square in touched:
+            piece_type = self.piece_type_at(square)
+            if piece_type:
+                color = bool(white & chess.BB_SQUARES[square])
+                key ^= PIECE_KEYS[color][piece_type][square]
+                side = sides[color]
+                material, phase, mg, eg = piece_terms[piece_type][square]
+                side[0] -= material
+                side[1] -= phase
+                side[2] -= mg
+                side[3] -= eg
+        super().push(move)
+        white = self.occupied_co[chess.WHITE]
+        for square in touched:
+            piece_type = self.piece_type_at(square)
+            if piece_type:
+                color = bool(white & chess.BB_SQUARES[square])
+                key ^= PIECE_KEYS[color][piece_type][square]
+                side = sides[color]
+                material, phase, mg, eg = piece_terms[piece_type][square]
+                side[0] += material
+                side[1] += phase
+                side[2] += mg
+                side[3] += eg
+        self.terms.append(sides)
+        if accumulator is not None:
+            accumulator.push(self, before, touched)
+
+        if self.castling_rights:
+            key ^= CASTLING_KEYS[self.castling_rights & CASTLING_CORNERS]
+        self.keys.append(key ^ _hasher.hash_ep_square(self))
+        self.reversible.append(min(self.halfmove_clock, self.reversible[-1] + 1))
+
+    def pop(self):
+        move = super().pop()
+        self.keys.pop()
+        self.terms.pop()
+        self.reversible.pop()
+        if self.accumulator is not None:
+            self.accumulator.pop()
+        return move
@@ -1,234 +1,433 @@
+import json
 import math
 
 import chess
-import time
-from evaluate import evaluate_board
+from movepick import MovePicker, history_key, piece_values
+from searchboard import SearchBoard
+from searchstats import SearchStats
+from evalcache import EvalCache
+from timeman import TimeManager, CHECK_MASK
+from transposition import TranspositionTable, TranspositionEntry
 
 IMMEDIATE_MATE_SCORE = 100000
 POS_INF = 9999999
 NEG_INF = -POS_INF
 MAX_DEPTH = 64
-
-piece_values = {
-    chess.PAWN: 100,
-    chess.KNIGHT: 300,
-    chess.BISHOP: 320,
-    chess.ROOK: 500,
-    chess.QUEEN: 900,
-    chess.KING: 0
-}
-
-class TranspositionEntry:
-    def __init__(self, zobrist, value, depth, flag, move):
-        self.zobrist = zobrist
-        self.value = value
+MAX_MOVES = 64
+QS_DEPTH = 0  # depth recorded for quiescence entries in the transposition table
+ASPIRATION_MIN_DEPTH = 4
+MAX_ASPIRATION_DELTA = 1000
+DELTA_MARGIN = 200
+
+
+class SearchParams:
+    """Named, tunable search constants.
+
+    Attribute names match the keys of the JSON config written by the SPSA
+    tuner, so a tuned set can be loaded with ``SearchParams.load(path)``.
+    """
+    DEFAULTS = {
+        # LMR: reduction = lmr_base + log(depth) * log(move_count) / lmr_divisor
+        "lmr_base": 0.75,
+        "lmr_divisor": 2.25,
+        "lmr_refutation": 2,
+        "lmr_history_divisor": 4000,
+        # Null move: R = null_move_deep_r from null_move_deep_depth, else null_move_r
+        "null_move_r": 2,
+        "null_move_deep_r": 3,
+        "null_move_deep_depth": 6,
+        # History bonus on a beta cutoff: history_bonus * depth * depth
+        "history_bonus": 1,
+        # Initial half-width of the aspiration window around the last score
+        "aspiration_delta": 50,
+    }
+
+    def __init__(self, **values):
+        unknown = set(values) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown search parameters: {sorted(unknown)}")
+        for name, default in self.DEFAULTS.items():
+            setattr(self, name, type(default)(values.get(name, default)))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.DEFAULTS}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def lmr_table(self):
+        table = [[0] * MAX_MOVES for _ in range(MAX_DEPTH)]
+        for depth in range(3, MAX_DEPTH):
+            for move_count in range(4, MAX_MOVES):
+                table[depth][move_count] = int(
+                    self.lmr_base + math.log(depth) * math.log(move_count) / self.lmr_divisor)
+        return table
+
+class SearchInfo:
+    """Summary of one completed iteration, handed to every subscriber."""
+    __slots__ = ("depth", "seldepth", "score", "nodes", "nps", "hashfull", "time", "pv", "tbhits")
+
+    def __init__(self, depth, seldepth, score, nodes, nps, hashfull, time, pv, tbhits=0):
         self.depth = depth
-        self.flag = flag
-        self.move = move
-
-class TranspositionTable:
-    EXACT, LOWER, UPPER = 0, 1, 2
-
-    def __init__(self, size=2**20):
-        self.table = {}
-        self.size = size
+        self.seldepth = seldepth
+        self.score = score
+        self.nodes = nodes
+        self.nps = nps
+        self.hashfull = hashfull
+        self.time = time
+        self.pv = pv
+        self.tbhits = tbhits
 
-    def get(self, key):
-        return self.table.get(key)
+    def to_dict(self):
+        info = {name: getattr(self, name) for name in self.__slots__}
+        info["pv"] = [move.uci() for move in self.pv]
+        return info
 
-    def store(self, key, value, depth, flag, move):
-        if len(self.table) >= self.size:
-            self.table.clear()
-        self.table[key] = TranspositionEntry(key, value, depth, flag, move)
 
 class Searcher:
-    def __init__(self):
+    def __init__(self, hash_mb=32, tt=None, params=None, verbose=True, eval_mb=4, nnue=None,
+                 tablebase=None, stats=False):
+        self.params = params or SearchParams()
+        # Optional nnue.NNUE network used instead of the piece-square evaluation
+        self.nnue = nnue
+        # Optional tablebase.Tablebase probed at the root and in search
+        self.tablebase = tablebase
+        self.tb_hits = 0
+        # With stats on, every search fills a fresh searchstats.SearchStats;
+        # otherwise self.stats stays None and the counters are skipped
+        self.collect_stats = stats
+        self.stats = None
+        self.lmr = self.params.lmr_table()
+        self.verbose = verbose
         self.best_move = None
         self.best_eval = 0
         self.stop_search = False
-        self.tt = TranspositionTable()
-        self.killer_moves = {ply: [] for ply in range(64)}
+        self.completed_depth = 0
+        self.tt = tt if tt is not None else TranspositionTable(hash_mb)
+        self.eval_cache = EvalCache(eval_mb)
+        self.killer_moves = {ply: [] for ply in range(MAX_DEPTH)}
         self.history = {}
-        self.repetition_table = []
-
-        self.start_time = 0
-        self.time_limit = 9.5
+        self.root_moves = []
+        self.root_scores = {}
+        self.root_nodes = {}
+        self.root_ply = None
+        # Triangular PV table: pv[ply] is the best line found from ply onward
+        self.pv = [[] for _ in range(MAX_DEPTH + 1)]
+        self.principal_variation = []
+        self.seldepth = 0
+        self.listeners = []
+
+        self.time_manager = TimeManager(movetime=9.5)
         self.nodes = 0
 
+    def subscribe(self, listener):
+        """Receive a SearchInfo after every completed iteration. ``listener``
+        is a callable or anything with a ``put`` method, such as a queue."""
+        self.listeners.append(getattr(listener, "put", listener))
+
+    def new_game(self):
+        """Forget everything learned in the previous game."""
+        self.tt.clear()
+        self.eval_cache.clear()
+        self.killer_moves = {ply: [] for ply in range(MAX_DEPTH)}
+        self.history = {}
+        self.root_ply = None
+
+    def new_move(self, board):
+        """Carry the search state over to the next root of the same game.
+
+        History scores are halved so that old cutoffs fade instead of
+        dominating the new position, and killers are shifted by the number
+        of plies played since the last root: the killers of ply ``p + n``
+        in the old tree are the killers of ply ``p`` now. The transposition
+        table is kept as is and ages through its generation counter.
+        """
+        self.history = {key: score >> 1 for key, score in self.history.items() if score > 1}
+        shift = board.ply() - self.root_ply if self.root_ply is not None else 0
+        if shift < 0 or shift >= MAX_DEPTH:
+            self.killer_moves = {ply: [] for ply in range(MAX_DEPTH)}
+        elif shift:
+            killers = self.killer_moves
+            self.killer_moves = {ply: killers.get(ply + shift, []) for ply in range(MAX_DEPTH)}
+        self.root_ply = board.ply()
+
     def is_mate_score(self, score):
         return abs(score) > IMMEDIATE_MATE_SCORE - 1000
 
     def score_to_ply(self, score):
         return IMMEDIATE_MATE_SCORE - abs(score)
 
+    def static_eval(self, board, entry=None):
+        """Static evaluation of ``board``, from its TT entry or the eval
+        cache when the position has been evaluated before."""
+        if entry is not None and entry.static_eval is not None:
+            return entry.static_eval
+        key = board.zobrist_key
+        value = self.eval_cache.get(key)
+        if value is None:
+            value = board.evaluate()
+            self.eval_cache.store(key, value)
+        return value
+
     def has_non_pawn_material(self, board):
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if piece and piece.piece_type != chess.PAWN:
-                return True
-        return False
+        """Whether the side to move has a piece other than pawns and king."""
+        return bool(board.occupied_co[board.turn] & ~(board.pawns | board.kings))
 
-    def iterative_deepening(self, board, max_depth=5, time_limit=9.5):
+    def iterative_deepening(self, board, max_depth=5, time_limit=9.5, time_manager=None,
+                            start_depth=1, age_table=True):
+        """Best move for ``board``. ``age_table=False`` leaves the TT
+        generation alone for a caller that has already advanced it."""
         self.stop_search = False
         self.best_eval = 0
         self.best_move = None
-        self.start_time = time.time()
-        self.time_limit = time_limit
+        self.completed_depth = 0
+        self.nodes = 0
+        self.seldepth = 0
+        self.tb_hits = 0
+        self.principal_variation = []
+        self.stats = SearchStats() if self.collect_stats else None
+        self.time_manager = time_manager or TimeManager(movetime=time_limit)
+        self.time_manager.start()
+        if age_table:
+            self.tt.new_search()
+        if not isinstance(board, SearchBoard):
+            board = SearchBoard.from_board(board)
+        if self.nnue is not None and board.accumulator is None:
+            board.use_nnue(self.nnue)
+
+        # A tablebase position needs no search: play the DTZ-optimal move
+        if self.tablebase is not None:
+            ranked = self.tablebase.root_moves(board)
+            if ranked:
+                self.best_move, wdl = ranked[0]
+                self.best_eval = self.tablebase.score(wdl, 0)
+                self.principal_variation = [self.best_move]
+                self.tb_hits = 1
+                if self.verbose:
+                    print(f"[Search] Tablebase move {self.best_move.uci()} (WDL {wdl})")
+                self.report(1, self.best_eval)
+                return self.finish(self.best_move)
 
         last_completed_best_move = None
-        legal_moves = list(board.legal_moves)
-        if len(legal_moves) == 1:
-            return legal_moves[0]  
-        for depth in range(1, max_depth + 1):
-            if time.time() - self.start_time > self.time_limit:
+        entry = self.tt.get(board.zobrist_key)
+        self.root_moves = list(MovePicker(board, entry.move if entry else None,
+                                          self.killer_moves[0], self.history))
+        self.root_scores = {}
+        self.root_nodes = {}
+        if len(self.root_moves) == 1:
+            self.principal_variation = list(self.root_moves)
+            return self.finish(self.root_moves[0])
+        for depth in range(start_depth, max_depth + 1):
+            if self.time_manager.should_stop(self.nodes):
                 break
+            iteration_start = self.nodes
 
-            depth_start_time = time.time()
             self.current_depth = depth
-            eval = self.search(board, depth, 0, NEG_INF, POS_INF)
+            if depth >= ASPIRATION_MIN_DEPTH and self.completed_depth and not self.is_mate_score(self.best_eval):
+                eval = self.aspiration_search(board, depth, self.best_eval)
+            else:
+                eval = self.search(board, depth, 0, NEG_INF, POS_INF)
 
-            if self.stop_search or (time.time() - self.start_time > self.time_limit):
-                print(f"[Search] Depth {depth} incomplete (timeout) - best eval: {self.best_eval}")
+            if self.stop_search:
+                if self.verbose:
+                    print(f"[Search] Depth {depth} incomplete (timeout) - best eval: {self.best_eval}")
                 break
 
-            elapsed = time.time() - depth_start_time
             self.best_eval = eval
+            self.completed_depth = depth
+            if self.stats is not None:
+                self.stats.iteration_nodes.append(self.nodes - iteration_start)
             last_completed_best_move = self.best_move
+            self.time_manager.update(depth, self.best_move, eval)
+            self.order_root_moves()
 
-            # Calculate nodes per second
-            total_nodes = self.nodes
-            nps = total_nodes / elapsed if elapsed > 0 else 0
-
-            # Print progress information with node counts
-            if self.is_mate_score(eval):
-                mate_in = self.score_to_ply(eval)
-                print(f"[Search] Depth {depth} completed in {elapsed:.2f}s - "
-                      f"Score: Mate in {mate_in} - Move: {self.best_move} - "
-                      f"Nodes: {self.nodes:,} "
-                      f"({int(nps):,} NPS)")
-            else:
-                print(f"[Search] Depth {depth} completed in {elapsed:.2f}s - "
-                      f"Score: {eval} - Move: {self.best_move} - "
-                      f"Nodes: {self.nodes:,}  "
-                      f"({int(nps):,} NPS)")
+            pv = self.pv[0]
+            self.principal_variation = pv if pv and pv[0] == self.best_move else [self.best_move] if self.best_move else []
+            self.report(depth, eval, verbose=self.verbose)
 
             if self.is_mate_score(eval) and self.score_to_ply(eval) <= depth:
-                print(f"[Search] Found checkmate sequence, stopping search")
+                if self.verbose:
+                    print(f"[Search] Found checkmate sequence, stopping search")
                 break
 
-        return last_completed_best_move if last_completed_best_move else self.best_move
+        return self.finish(last_completed_best_move if last_completed_best_move else self.best_move)
+
+    def finish(self, move):
+        """Record the outcome of the search in its statistics."""
+        if self.stats is not None:
+            self.stats.result = {
+                "bestmove": move.uci() if move else None,
+                "score": self.best_eval,
+                "depth": self.completed_depth,
+                "seldepth": self.seldepth,
+                "total_nodes": self.nodes,
+                "time": round(self.time_manager.elapsed(), 3),
+                "pv": [m.uci() for m in self.principal_variation],
+            }
+        return move
+
+    def report(self, depth, score, verbose=False):
+        """Hand a SearchInfo for the current state to every listener."""
+        if not self.listeners and not verbose:
+            return
+        elapsed = self.time_manager.elapsed()
+        info = SearchInfo(depth, self.seldepth, score, self.nodes,
+                          int(self.nodes / elapsed) if elapsed > 0 else 0,
+                          self.tt.hashfull(), elapsed, list(self.principal_variation), self.tb_hits)
+        for listener in self.listeners:
+            listener(info)
+        if verbose:
+            self.print_info(info)
+
+    def print_info(self, info):
+        if self.is_mate_score(info.score):
+            score = f"Mate in {self.score_to_ply(info.score)}"
+        else:
+            score = info.score
+        print(f"[Search] Depth {info.depth}/{info.seldepth} completed in {info.time:.2f}s - "
+              f"Score: {score} - PV: {' '.join(m.uci() for m in info.pv)} - "
+              f"Nodes: {info.nodes:,} ({info.nps:,} NPS) - Hash: {info.hashfull / 10:.1f}% - "
+              f"Eval cache hits: {self.eval_cache.hit_rate():.0%}"
+              + (f" - TB hits: {info.tbhits:,}" if self.tablebase is not None else ""))
+
+    def aspiration_search(self, board, depth, previous):
+        """Search the root with a window centred on the previous iteration's
+        score, widening it on the failing side until the score fits."""
+        delta = self.params.aspiration_delta
+        alpha = max(previous - delta, NEG_INF)
+        beta = min(previous + delta, POS_INF)
+        while True:
+            score = self.search(board, depth, 0, alpha, beta)
+            if self.stop_search:
+                return score
+            if score <= alpha:
+                alpha = max(score - delta, NEG_INF)
+            elif score >= beta:
+                beta = min(score + delta, POS_INF)
+            else:
+                return score
+            delta *= 2
+            if delta > MAX_ASPIRATION_DELTA:
+                alpha, beta = NEG_INF, POS_INF
+
+    def order_root_moves(self):
+        """Best move first, then by last score and by subtree size."""
+        best = self.best_move
+        scores = self.root_scores
+        nodes = self.root_nodes
+        self.root_moves.sort(key=lambda m: (m == best, scores.get(m, NEG_INF), nodes.get(m, 0)),
+                             reverse=True)
 
     def search(self, board, depth, ply, alpha, beta):
-        if time.time() - self.start_time > self.time_limit:
+        if self.stop_search or self.time_manager.check(self.nodes):
             self.stop_search = True
             return 0
         self.nodes+=1
-        zobrist = chess.polyglot.zobrist_hash(board)
-
-        if zobrist in self.repetition_table or board.is_repetition(3):
+        stats = self.stats
+        # Horizon nodes go on to quiescence and are counted there
+        if stats is not None and depth > 0:
+            stats.nodes += 1
+        zobrist = board.zobrist_key
+        self.pv[ply] = []
+
+        if ply > 0 and board.is_repetition_draw(ply):
             return 0
 
-        # Transposition table lookup
+        # Transposition table lookup (no cutoff at the root, which must set best_move)
         entry = self.tt.get(zobrist)
-        if entry and entry.depth >= depth:
-            if entry.flag == self.tt.EXACT:
-                return entry.value
-            elif entry.flag == self.tt.LOWER and entry.value >= beta:
-                return entry.value
-            elif entry.flag == self.tt.UPPER and entry.value <= alpha:
+        if stats is not None:
+            stats.tt_probes += 1
+            stats.tt_hits += entry is not None
+        if entry and entry.depth >= depth and ply > 0:
+            if (entry.flag == self.tt.EXACT
+                    or (entry.flag == self.tt.LOWER and entry.value >= beta)
+                    or (entry.flag == self.tt.UPPER and entry.value <= alpha)):
+                if stats is not None:
+                    stats.tt_cutoffs += 1
                 return entry.value
 
-        if board.is_checkmate():
-            return -IMMEDIATE_MATE_SCORE + ply
-        if board.is_stalemate() or board.is_insufficient_material():
+        if board.is_insufficient_material():
             return 0
-        if depth == 0:
-            return self.quiescence(board, alpha, beta)
+
+        # Tablebase cutoff. WDL assumes a fresh 50-move counter, so only
+        # positions right after a capture or pawn move are probed.
+        tablebase = self.tablebase
+        if (tablebase is not None and ply > 0 and board.halfmove_clock == 0
+                and chess.popcount(board.occupied) <= tablebase.max_pieces):
+            wdl = tablebase.probe_wdl(board, zobrist)
+            if wdl is not None:
+                self.tb_hits += 1
+                value = tablebase.score(wdl, ply)
+                self.tt.store(zobrist, value, min(depth + 6, MAX_DEPTH), self.tt.EXACT, None)
+                return value
+
+        in_check = board.is_check()
+        if depth <= 0:
+            return self.quiescence(board, alpha, beta, ply)
+        static_eval = None if in_check else self.static_eval(board, entry)
 
         # Null Move Pruning
-        # Don't do null move in endgame or when in check
-        if depth >= 3 and not board.is_check() and self.has_non_pawn_material(board):
-            R = 3 if depth >= 6 else 2  # Dynamic reduction
+        # Don't do null move in endgame, when in check or when already below beta
+        if (depth >= 3 and not in_check and static_eval >= beta
+                and self.has_non_pawn_material(board)):
+            params = self.params
+            # Dynamic reduction
+            R = params.null_move_deep_r if depth >= params.null_move_deep_depth else params.null_move_r
             board.push(chess.Move.null())
             value = -self.search(board, depth - 1 - R, ply + 1, -beta, -beta + 1)
             board.pop()
             
             # Fail-high indicates a likely cut-off
             if value >= beta and not self.is_mate_score(value):
+                if stats is not None:
+                    stats.null_tries += 1
+                    stats.null_cutoffs += 1
                 return beta
+            if stats is not None:
+                stats.null_tries += 1
 
-        legal_moves = list(board.legal_moves)
         best_val = NEG_INF
         best_move = None
         move_count = 0
         is_pv  = int((beta-alpha) > 1)
-        # Create a simple LMR table (can be precomputed)
-        def get_lmr_reduction(depth, move_count):
-            if depth < 3 or move_count < 4:
-                return 0
-            return int(0.75 + math.log(depth) * math.log(move_count) / 2.25)
-
-        self.repetition_table.append(zobrist)
-
-        tt_move = self.tt.get(zobrist).move if self.tt.get(zobrist) else None
-
-        def move_order_key(move):
-            score = 0
-            move_uci = move.uci()
-
-            # 1. Hash move
-            if tt_move == move:
-                return 10_000_000
-
-            # 2. MVV-LVA
-            if board.is_capture(move):
-                captured = board.piece_at(move.to_square)
-                attacker = board.piece_at(move.from_square)
-                if captured and attacker:
-                    score += 10_000 + piece_values[captured.piece_type]*10 - piece_values[attacker.piece_type]
-
-            # 3. Promotion
-            if move.promotion:
-                score += 2000 if move.promotion == chess.QUEEN else 6_000
-
-            # 4. Killer move
-            if move in self.killer_moves.get(ply, []):
-                score += 4_000
-
-            # 5. History heuristic
-            score += self.history.get(move_uci, 0)
-
-            return score
-
-        ordered_moves = sorted(legal_moves, key=move_order_key, reverse=True)
-
-
-        for move in ordered_moves:
-            if time.time() - self.start_time > self.time_limit:
-                self.stop_search = True
-                break
-
-            gives_check = board.gives_check(move)
+        tt_move = entry.move if entry else None
+        killers = self.killer_moves[ply]
+
+        # Moves are generated stage by stage, so a cutoff on the TT move or a
+        # capture never pays for quiet move generation and sorting. The root
+        # keeps its own list, ordered between iterations.
+        if ply == 0:
+            moves = self.root_moves
+        else:
+            moves = MovePicker(board, tt_move, killers, self.history)
+        for move in moves:
+            nodes_before = self.nodes
             is_capture = board.is_capture(move)
             board.push(move)
             move_count += 1
-            is_quiet = not is_capture and not move.promotion
-            refutation_move = move == tt_move or move in self.killer_moves.get(ply, [])
-            history_score = self.history.get(move.uci(), 0)
+            gives_check = board.is_check()
+            refutation_move = move == tt_move or move in killers
+            history_score = self.history.get(history_key(move), 0)
 
             # LMR conditions
             do_full_search = True
             val =0
             if (depth >= 3 and move_count > (2 + 2 * is_pv) and
-                    not board.is_check() and not is_capture and not move.promotion):
+                    not gives_check and not is_capture and not move.promotion):
                 # Calculate reduction
-                reduction = get_lmr_reduction(depth, move_count)
+                reduction = self.lmr[min(depth, MAX_DEPTH - 1)][min(move_count, MAX_MOVES - 1)]
 
                 # Adjust reduction based on conditions
                 reduction += 0 if is_pv else 1
                 reduction += 0 if gives_check else 1
-                reduction -= 2 if refutation_move else 0
-                reduction -= history_score // 4000
+                reduction -= self.params.lmr_refutation if refutation_move else 0
+                reduction -= history_score // self.params.lmr_history_divisor
 
                 # Ensure we don't reduce too much
                 reduction = min(depth - 1, max(1, reduction))
@@ -238,6 +437,9 @@ class Searcher:
 
                 # If reduced search beat alpha but we're not at minimal reduction, do full search
                 do_full_search = val > alpha and reduction > 1
+                if stats is not None:
+                    stats.lmr_searches += 1
+                    stats.lmr_researches += do_full_search
 
             # Normal search if LMR wasn't done or the reduced search was promising
             if do_full_search:
@@ -258,23 +460,40 @@ class Searcher:
             if self.stop_search:
                 break
 
+            if ply == 0:
+                self.root_scores[move] = val
+                self.root_nodes[move] = self.nodes - nodes_before
+
             if val > best_val:
                 best_val = val
                 best_move = move
                 if ply == 0:
                     self.best_move = move
 
+            if val > alpha:
+                self.pv[ply] = [move] + self.pv[ply + 1]
+
             alpha = max(alpha, val)
             if alpha >= beta:
-                if not board.is_capture(move):
-                    if move not in self.killer_moves[ply]:
-                        self.killer_moves[ply].append(move)
-                        if len(self.killer_moves[ply]) > 2:
-                            self.killer_moves[ply] = self.killer_moves[ply][-2:]
-                self.history[move.uci()] = self.history.get(move.uci(), 0) + depth * depth
+                if stats is not None:
+                    stats.beta_cutoffs += 1
+                    stats.first_move_cutoffs += move_count == 1
+                if not is_capture:
+                    if move not in killers:
+                        killers.append(move)
+                        if len(killers) > 2:
+                            del killers[0]
+                key = history_key(move)
+                self.history[key] = self.history.get(key, 0) + self.params.history_bonus * depth * depth
                 break
 
-        self.repetition_table.pop()
+        # An aborted node has no trustworthy value; keep it out of the table
+        if self.stop_search:
+            return 0
+
+        # No legal move: checkmate or stalemate
+        if move_count == 0:
+            return -IMMEDIATE_MATE_SCORE + ply if in_check else 0
 
         flag = self.tt.EXACT
         original_alpha = alpha
@@ -284,64 +503,73 @@ class Searcher:
             flag = self.tt.LOWER
         else:
             flag = self.tt.EXACT    
-        self.tt.store(zobrist, best_val, depth, flag, best_move)
+        self.tt.store(zobrist, best_val, depth, flag, best_move, static_eval)
 
         return best_val
 
-    def quiescence(self, board, alpha, beta):
-        if time.time() - self.start_time > self.time_limit:
-            return evaluate_board(board)
+    def quiescence(self, board, alpha, beta, ply=0):
+        if self.stop_search or self.time_manager.check(self.nodes):
+            self.stop_search = True
+            return 0
         self.nodes+=1
+        if ply > self.seldepth:
+            self.seldepth = ply
+
+        zobrist = board.zobrist_key
+        entry = self.tt.get(zobrist)
+        stats = self.stats
+        if stats is not None:
+            stats.qnodes += 1
+            stats.tt_probes += 1
+            stats.tt_hits += entry is not None
+        if entry and entry.depth >= QS_DEPTH:
+            if (entry.flag == self.tt.EXACT
+                    or (entry.flag == self.tt.LOWER and entry.value >= beta)
+                    or (entry.flag == self.tt.UPPER and entry.value <= alpha)):
+                if stats is not None:
+                    stats.tt_cutoffs += 1
+                return entry.value
 
-        stand_pat = evaluate_board(board)
-        if stand_pat >= beta:
-            return beta
+        # In check there is no standing pat: every evasion is searched
+        in_check = board.is_check()
+        if in_check:
+            stand_pat = NEG_INF
+            static_eval = None
+        else:
+            stand_pat = static_eval = self.static_eval(board, entry)
+            if stand_pat >= beta:
+                return beta
+        original_alpha = alpha
         if alpha < stand_pat:
             alpha = stand_pat
 
-        for move in board.legal_moves:
-            if time.time() - self.start_time > self.time_limit:
-                return stand_pat
-
-            if board.is_capture(move) or move.promotion:
-                board.push(move)
-                score = -self.quiescence(board, -beta, -alpha)
-                board.pop()
-
-                if score >= beta:
-                    return beta
-                if score > alpha:
-                    alpha = score
-
-        return alpha
-
-    def move_score(self, board, move, ply):
-        score = 0
-        move_uci = move.uci()
-
-        # Transposition Table Move Boost
-        tt_entry = self.tt.get(chess.polyglot.zobrist_hash(board))
-        if tt_entry and tt_entry.move == move:
-            return 10_000_000
+        best_move = None
+        move_count = 0
+        for move in MovePicker(board, entry.move if entry else None, captures_only=True):
+            move_count += 1
+            # Delta pruning: skip captures that cannot lift the score to alpha
+            if not in_check and not move.promotion:
+                victim = board.piece_type_at(move.to_square) or chess.PAWN  # en passant
+                if stand_pat + piece_values[victim] + DELTA_MARGIN <= alpha:
+                    continue
 
-        # Capture Heuristics (MVV-LVA)
-        if board.is_capture(move):
-            captured_piece = board.piece_at(move.to_square)
-            capturing_piece = board.piece_at(move.from_square)
-            if captured_piece and capturing_piece:
-                captured_value = piece_values[captured_piece.piece_type]
-                attacker_value = piece_values[capturing_piece.piece_type]
-                score += 10_000 + captured_value * 10 - attacker_value
+            board.push(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            board.pop()
 
-        # Promotion Bonus
-        if move.promotion:
-            score += 8000 if move.promotion == chess.QUEEN else 6000
+            if self.stop_search:
+                return 0
 
-        # Killer Move Bonus
-        if move in self.killer_moves.get(ply, []):
-            score += 4000
+            if score >= beta:
+                self.tt.store(zobrist, beta, QS_DEPTH, self.tt.LOWER, move, static_eval)
+                return beta
+            if score > alpha:
+                alpha = score
+                best_move = move
 
-        # History Heuristic
-        score += self.history.get(move_uci, 0)
+        if in_check and move_count == 0:
+            return -IMMEDIATE_MATE_SCORE + ply
 
-        return score
\ No newline at end of file
+        flag = self.tt.EXACT if alpha > original_alpha else self.tt.UPPER
+        self.tt.store(zobrist, alpha, QS_DEPTH, flag, best_move, static_eval)
+        return alpha
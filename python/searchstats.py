@@ -0,0 +1,111 @@
+"""Opt-in search statistics and profiling.
+
+``Searcher(stats=True)`` gives every ``iterative_deepening`` call a fresh
+``SearchStats`` in ``searcher.stats``; with stats off the attribute is None
+and the search only pays an ``is not None`` test where a counter would be
+bumped. ``to_dict`` turns the counters into the rates that matter when
+comparing two versions of move ordering or LMR: TT hit rate, share of beta
+cutoffs on the first move, null move success, LMR re-search rate and the
+effective branching factor of every iteration.
+
+    python searchstats.py --depth 6 --json stats.json --profile search.prof
+"""
+import argparse
+import cProfile
+import io
+import json
+import pstats
+import time
+
+import chess
+
+
+class SearchStats:
+    """Counters of one search.
+
+    ``nodes`` are main search nodes with depth left and ``qnodes``
+    quiescence nodes, horizon nodes included, so no node is in both.
+    """
+
+    COUNTERS = ("nodes", "qnodes", "tt_probes", "tt_hits", "tt_cutoffs", "null_tries", "null_cutoffs",
+                "lmr_searches", "lmr_researches", "beta_cutoffs", "first_move_cutoffs")
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        # Searcher.nodes spent on each completed iteration
+        self.iteration_nodes = []
+        self.result = {}
+
+    def effective_branching_factors(self):
+        """Node ratio of every completed iteration to the previous one."""
+        nodes = self.iteration_nodes
+        return [round(nodes[i] / nodes[i - 1], 2) if nodes[i - 1] else None for i in range(1, len(nodes))]
+
+    def to_dict(self):
+        def rate(part, whole):
+            return round(part / whole, 4) if whole else None
+
+        stats = {name: getattr(self, name) for name in self.COUNTERS}
+        stats.update({
+            "tt_hit_rate": rate(self.tt_hits, self.tt_probes),
+            "tt_cutoff_rate": rate(self.tt_cutoffs, self.tt_probes),
+            "null_success_rate": rate(self.null_cutoffs, self.null_tries),
+            "lmr_research_rate": rate(self.lmr_researches, self.lmr_searches),
+            "first_move_cutoff_rate": rate(self.first_move_cutoffs, self.beta_cutoffs),
+            "qnode_share": rate(self.qnodes, self.nodes + self.qnodes),
+            "iteration_nodes": self.iteration_nodes,
+            "ebf": self.effective_branching_factors(),
+        })
+        stats.update(self.result)
+        return stats
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def profile(function, *args, path=None, top=25, **kwargs):
+    """Run ``function`` under cProfile. Returns its result and the ``top``
+    functions by cumulative time as text; ``path`` keeps the raw profile
+    for snakeviz or ``pstats``."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args, **kwargs)
+    if path:
+        profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+    return result, out.getvalue()
+
+
+def main():
+    from searcher import Searcher
+    from timeman import TimeManager
+
+    parser = argparse.ArgumentParser(description="Search one position with statistics")
+    parser.add_argument("--fen", default=chess.STARTING_FEN)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--hash", type=int, default=32)
+    parser.add_argument("--json", help="write the statistics to this file")
+    parser.add_argument("--profile", help="run under cProfile and keep the profile in this file")
+    args = parser.parse_args()
+
+    searcher = Searcher(hash_mb=args.hash, verbose=False, stats=True)
+    board = chess.Board(args.fen)
+    search = searcher.iterative_deepening
+    start = time.time()
+    if args.profile:
+        move, report = profile(search, board, max_depth=args.depth, time_manager=TimeManager(), path=args.profile)
+        print(report)
+    else:
+        move = search(board, max_depth=args.depth, time_manager=TimeManager())
+    stats = searcher.stats.to_dict()
+    print(f"[Stats] {move} in {time.time() - start:.2f}s")
+    for name, value in stats.items():
+        print(f"[Stats] {name}: {value}")
+    if args.json:
+        searcher.stats.save(args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import multiprocessing
+import queue
+
+from searcher import Searcher, MAX_DEPTH
+from tablebase import Tablebase
+from timeman import TimeManager
+from transposition import SharedTranspositionTable
+
+RESULT_TIMEOUT = 2.0
+NEW_GAME = "new_game"
+
+
+def _helper_loop(worker_id, tt, tasks, results, stop_event, params=None, syzygy_path=None):
+    """Body of a helper process: search every root it is given until stopped."""
+    # Open tablebase files cannot be sent to a process; each helper opens its own.
+    tablebase = Tablebase(syzygy_path) if syzygy_path else None
+    # Helpers share the owner's stdout; only the main search reports.
+    searcher = Searcher(tt=tt, params=params, tablebase=tablebase, verbose=False)
+    # Helpers on odd ids start one ply deeper so that they do not walk the
+    # tree in lockstep with the main search.
+    start_depth = 1 + worker_id % 2
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        if task == NEW_GAME:
+            # The owner clears the shared table; only local state is reset here.
+            searcher = Searcher(tt=tt, params=params, tablebase=tablebase, verbose=False)
+            continue
+        search_id, board, max_depth, max_nodes = task
+        searcher.new_move(board)
+        move = searcher.iterative_deepening(
+            board, max_depth=max_depth, start_depth=min(start_depth, max_depth),
+            time_manager=TimeManager(stop_event=stop_event, nodes=max_nodes))
+        results.put((search_id, searcher.completed_depth, searcher.best_eval,
+                     move.uci() if move else None, searcher.nodes))
+    tt.close()
+
+
+class ParallelSearcher:
+    """Lazy SMP: the main search runs in this process and ``threads - 1``
+    helper processes search the same root, sharing one transposition table
+    in shared memory. The move from the deepest completed iteration wins.
+    A node budget is split evenly between the threads, so together they
+    search at most that many nodes.
+    """
+
+    def __init__(self, threads=2, hash_mb=64, params=None, tablebase=None, verbose=True):
+        ctx = multiprocessing.get_context("spawn")
+        self.verbose = verbose
+        self.tt = SharedTranspositionTable(hash_mb)
+        self.searcher = Searcher(tt=self.tt, params=params, tablebase=tablebase, verbose=verbose)
+        syzygy_path = tablebase.path if tablebase is not None else None
+        self.stop_event = ctx.Event()
+        self.results = ctx.Queue()
+        self.tasks = []
+        self.workers = []
+        for worker_id in range(1, threads):
+            tasks = ctx.Queue()
+            worker = ctx.Process(target=_helper_loop,
+                                 args=(worker_id, self.tt, tasks, self.results, self.stop_event, params,
+                                       syzygy_path),
+                                 daemon=True)
+            worker.start()
+            self.tasks.append(tasks)
+            self.workers.append(worker)
+        self.search_id = 0
+        # Answers still owed by helpers, including ones that missed RESULT_TIMEOUT
+        self.outstanding = 0
+        self.nodes = 0
+        self.best_eval = 0
+        self.completed_depth = 0
+        self.principal_variation = []
+
+    def subscribe(self, listener):
+        # Iteration info comes from the main search only.
+        self.searcher.subscribe(listener)
+
+    def new_game(self):
+        self.searcher.new_game()
+        for tasks in self.tasks:
+            tasks.put(NEW_GAME)
+
+    def new_move(self, board):
+        # Helpers shift their own killers and history when their task arrives.
+        self.searcher.new_move(board)
+
+    def iterative_deepening(self, board, max_depth=MAX_DEPTH, time_limit=9.5, time_manager=None):
+        # A tablebase root is answered by the main searcher alone; deeper
+        # helper iterations must not override the DTZ move.
+        tablebase = self.searcher.tablebase
+        if tablebase is not None and tablebase.root_moves(board):
+            move = self.searcher.iterative_deepening(board, max_depth=max_depth, time_limit=time_limit,
+                                                     time_manager=time_manager)
+            self.completed_depth, self.best_eval = self.searcher.completed_depth, self.searcher.best_eval
+            self.nodes = self.searcher.nodes
+            self.principal_variation = self.searcher.principal_variation
+            return move
+
+        self.drain()
+        self.search_id += 1
+        self.stop_event.clear()
+        # The generation is shared; advance it before any helper stores
+        self.tt.new_search()
+        helper_nodes = None
+        if time_manager is not None and time_manager.max_nodes is not None:
+            helper_nodes = max(1, time_manager.max_nodes // (len(self.tasks) + 1))
+            time_manager.max_nodes = max(1, time_manager.max_nodes - helper_nodes * len(self.tasks))
+        for tasks in self.tasks:
+            tasks.put((self.search_id, board.copy(), max_depth, helper_nodes))
+        self.outstanding += len(self.tasks)
+
+        move = self.searcher.iterative_deepening(board, max_depth=max_depth, time_limit=time_limit,
+                                                 time_manager=time_manager, age_table=False)
+        self.stop_event.set()
+
+        best = (self.searcher.completed_depth, move, self.searcher.best_eval)
+        self.nodes = self.searcher.nodes
+        pending = len(self.workers)
+        while pending:
+            try:
+                search_id, depth, score, uci, nodes = self.results.get(timeout=RESULT_TIMEOUT)
+            except queue.Empty:
+                break
+            self.outstanding -= 1
+            if search_id != self.search_id:
+                continue  # late answer from an earlier search
+            pending -= 1
+            self.nodes += nodes
+            if uci and depth > best[0]:
+                best = (depth, board.parse_uci(uci), score)
+
+        self.completed_depth, move, self.best_eval = best
+        pv = self.searcher.principal_variation
+        self.principal_variation = pv if pv and pv[0] == move else [move] if move else []
+        if self.verbose:
+            print(f"[SMP] {len(self.workers) + 1} threads - Depth {self.completed_depth} - "
+                  f"Move: {move} - Nodes: {self.nodes:,}")
+        return move
+
+    def drain(self):
+        """Wait for the answers of helpers that missed RESULT_TIMEOUT.
+
+        The stop event is still set, so they finish their old search
+        quickly; clearing it first would leave them searching it without a
+        limit, and their late results would compete with the next search.
+        """
+        while self.outstanding:
+            try:
+                self.results.get(timeout=RESULT_TIMEOUT)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in self.workers):
+                    self.outstanding = 0
+                continue
+            self.outstanding -= 1
+
+    def close(self):
+        for tasks in self.tasks:
+            tasks.put(None)
+        for worker in self.workers:
+            worker.join(timeout=RESULT_TIMEOUT)
+        self.workers = []
+        self.tasks = []
+        self.tt.close()
@@ -0,0 +1,131 @@
+"""SPSA tuning of the search constants in SearchParams through self-play.
+
+Each iteration perturbs every tunable parameter by +/- c_k at random, plays
+pairs of fixed-node games (colours swapped) between the "plus" and "minus"
+settings in a process pool, and moves the parameters toward the side that
+scored better. The current estimate is written after every iteration as a
+JSON config that ``SearchParams.load`` reads back.
+
+    python spsa.py --iterations 200 --pairs 4 --nodes 3000 --workers 8 \\
+        --output tuned_params.json
+"""
+import argparse
+import multiprocessing
+import random
+
+import chess
+
+from searcher import Searcher, SearchParams, MAX_DEPTH
+from timeman import TimeManager
+
+# name: (min, max, c) where c is the initial perturbation size
+TUNABLES = {
+    "lmr_base": (0.0, 2.0, 0.15),
+    "lmr_divisor": (1.0, 4.0, 0.25),
+    "lmr_refutation": (0, 4, 1),
+    "lmr_history_divisor": (1000, 16000, 1000),
+    "null_move_r": (1, 4, 1),
+    "null_move_deep_r": (2, 5, 1),
+    "null_move_deep_depth": (3, 10, 1),
+    "history_bonus": (1, 4, 1),
+    "aspiration_delta": (10, 200, 10),
+}
+
+OPENINGS = [
+    ["e2e4", "e7e5", "g1f3", "b8c6"],
+    ["e2e4", "c7c5", "g1f3", "d7d6"],
+    ["e2e4", "e7e6", "d2d4", "d7d5"],
+    ["e2e4", "c7c6", "d2d4", "d7d5"],
+    ["d2d4", "d7d5", "c2c4", "e7e6"],
+    ["d2d4", "g8f6", "c2c4", "g7g6"],
+    ["d2d4", "g8f6", "c2c4", "e7e6"],
+    ["c2c4", "e7e5", "b1c3", "g8f6"],
+    ["g1f3", "d7d5", "g2g3", "g8f6"],
+    ["e2e4", "d7d5", "e4d5", "d8d5"],
+]
+
+MAX_PLIES = 200
+HASH_MB = 4
+
+
+def build_params(theta):
+    values = {}
+    for name, value in theta.items():
+        default = SearchParams.DEFAULTS[name]
+        values[name] = round(value) if isinstance(default, int) else value
+    return SearchParams(**values)
+
+
+def clamp(name, value):
+    low, high, _ = TUNABLES[name]
+    return min(high, max(low, value))
+
+
+def play_game(white, black, opening, nodes, max_plies=MAX_PLIES):
+    """Play one fixed-node game and return the score from white's point of view."""
+    board = chess.Board()
+    for uci in opening:
+        board.push_uci(uci)
+    players = {
+        chess.WHITE: Searcher(hash_mb=HASH_MB, params=build_params(white), verbose=False),
+        chess.BLACK: Searcher(hash_mb=HASH_MB, params=build_params(black), verbose=False),
+    }
+    while not board.is_game_over(claim_draw=True) and board.ply() < max_plies:
+        move = players[board.turn].iterative_deepening(
+            board, max_depth=MAX_DEPTH, time_manager=TimeManager(nodes=nodes))
+        board.push(move or next(iter(board.legal_moves)))
+    return {"1-0": 1.0, "0-1": 0.0}.get(board.result(claim_draw=True), 0.5)
+
+
+def tune(iterations, pairs, nodes, workers, output, start=None, seed=0,
+         a=1.0, big_a=None, alpha=0.602, gamma=0.101):
+    rng = random.Random(seed)
+    start = start or SearchParams()
+    theta = {name: float(getattr(start, name)) for name in TUNABLES}
+    big_a = iterations / 10 if big_a is None else big_a
+
+    with multiprocessing.Pool(workers) as pool:
+        for k in range(iterations):
+            a_k = a / (big_a + k + 1) ** alpha
+            c_k = {name: c / (k + 1) ** gamma for name, (_, _, c) in TUNABLES.items()}
+            delta = {name: rng.choice((-1, 1)) for name in TUNABLES}
+            plus = {name: clamp(name, theta[name] + c_k[name] * delta[name]) for name in TUNABLES}
+            minus = {name: clamp(name, theta[name] - c_k[name] * delta[name]) for name in TUNABLES}
+
+            games = []
+            for _ in range(pairs):
+                opening = rng.choice(OPENINGS)
+                games.append((plus, minus, opening, nodes))
+                games.append((minus, plus, opening, nodes))
+            results = pool.starmap(play_game, games)
+
+            plus_score = sum(results[0::2]) + sum(1 - r for r in results[1::2])
+            result = (2 * plus_score - len(games)) / len(games)  # in [-1, 1]
+            for name in TUNABLES:
+                theta[name] = clamp(name, theta[name] + a_k * c_k[name] * result * delta[name])
+
+            params = build_params(theta)
+            params.save(output)
+            print(f"[SPSA] Iteration {k + 1}/{iterations} - plus scored "
+                  f"{plus_score}/{len(games)} - {params.to_dict()}")
+    return build_params(theta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SPSA self-play tuning of search parameters")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--pairs", type=int, default=4, help="game pairs per iteration")
+    parser.add_argument("--nodes", type=int, default=3000, help="node budget per move")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--params", help="JSON config to start from")
+    parser.add_argument("--output", default="tuned_params.json")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = SearchParams.load(args.params) if args.params else None
+    tune(args.iterations, args.pairs, args.nodes, args.workers, args.output,
+         start=start, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
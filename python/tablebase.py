@@ -0,0 +1,106 @@
+from collections import OrderedDict
+
+import chess
+import chess.polyglot
+import chess.syzygy
+
+# Score of a tablebase win, below the mate scores of the search
+# (IMMEDIATE_MATE_SCORE - ply) so that a found mate is still preferred.
+TB_WIN_SCORE = 90000
+
+
+class Tablebase:
+    """Syzygy WDL/DTZ probing through ``chess.syzygy`` with an LRU cache.
+
+    ``path`` is a directory of ``.rtbw`` / ``.rtbz`` files. Probes return
+    None instead of raising when a position is not covered: too many
+    pieces, castling rights or a missing table. Results are cached by
+    Zobrist key, least recently used first out.
+    """
+
+    def __init__(self, path, cache_size=1 << 16):
+        self.path = path
+        self.tables = chess.syzygy.open_tablebase(path)
+        # Table names look like "KRPvKR": pieces plus the "v"
+        self.max_pieces = max((len(name) - 1 for name in self.tables.wdl), default=0)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+
+    def covers(self, board):
+        return (not board.castling_rights
+                and chess.popcount(board.occupied) <= self.max_pieces)
+
+    def probe_wdl(self, board, key=None):
+        """Win (2), cursed win (1), draw (0), blessed loss (-1) or loss (-2)
+        for the side to move, assuming a fresh 50-move counter."""
+        if not self.covers(board):
+            return None
+        key = key if key is not None else chess.polyglot.zobrist_hash(board)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key]
+        wdl = self.tables.get_wdl(board)
+        self.cache[key] = wdl
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return wdl
+
+    def probe_dtz(self, board):
+        if not self.covers(board):
+            return None
+        return self.tables.get_dtz(board)
+
+    def root_moves(self, board):
+        """Legal moves ranked by their DTZ result, best first, as
+        (move, wdl) pairs; None if the root is not covered.
+
+        Winning moves are ordered by the distance to the next zeroing
+        move, so the win progresses under the 50-move rule; losing moves
+        prefer the longest resistance. A win or loss that cannot reach its
+        zeroing move before the root's halfmove clock hits 100 counts as
+        cursed or blessed, i.e. a draw.
+        """
+        if not self.covers(board):
+            return None
+        ranked = []
+        for move in board.legal_moves:
+            zeroing = board.is_zeroing(move)
+            board.push(move)
+            mate = board.is_checkmate()
+            dtz = self.probe_dtz(board)
+            board.pop()
+            if dtz is None:
+                return None
+            # From our side: wdl of the move and plies until the counter resets
+            wdl = 2 if mate else -dtz_to_wdl(dtz)
+            plies = 0 if mate else 1 if zeroing else abs(dtz) + 1
+            # DTZ50: the clock after the move plus the plies to zeroing
+            clock = 0 if zeroing else board.halfmove_clock + 1
+            if not mate and abs(wdl) == 2 and clock + abs(dtz) > 100:
+                wdl //= 2
+            ranked.append((move, wdl, plies))
+        ranked.sort(key=lambda item: (item[1], -item[2] if item[1] > 0 else item[2]), reverse=True)
+        return [(move, wdl) for move, wdl, _ in ranked]
+
+    def score(self, wdl, ply):
+        """Search score of a WDL result ``ply`` plies from the root; the
+        50-move rule turns cursed wins and blessed losses into draws."""
+        if wdl >= 2:
+            return TB_WIN_SCORE - ply
+        if wdl <= -2:
+            return -TB_WIN_SCORE + ply
+        return 0
+
+    def close(self):
+        self.tables.close()
+
+
+def dtz_to_wdl(dtz):
+    """WDL of a position from its DTZ50'' value, see chess.syzygy.probe_dtz."""
+    if dtz == 0:
+        return 0
+    if dtz > 0:
+        return 2 if dtz <= 100 else 1
+    return -2 if dtz >= -100 else -1
@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
 import unittest
 import chess
+import chess.polyglot
 import pygame
 import copy
+import json
+import os
+import pickle
+import queue
+import random
+import tempfile
+import time
 from io import StringIO
+from threading import Event
 from unittest.mock import patch, MagicMock
 
 #  IMPORT MODULES (MOCK IF MISSING)
@@ -67,6 +76,32 @@ except:
         print("readyok")
         print("bestmove e2e4")
 
+from transposition import TranspositionTable, SharedTranspositionTable
+from smp import ParallelSearcher
+from movepick import MovePicker
+from searcher import Searcher, SearchParams, SearchInfo, NEG_INF, POS_INF, IMMEDIATE_MATE_SCORE, MAX_DEPTH
+from spsa import play_game
+from searchboard import SearchBoard
+from timeman import TimeManager, CHECK_INTERVAL
+from engine import EngineSession
+from book import OpeningBook, default_book
+from bookgen import build_book, polyglot_move
+from tablebase import Tablebase, TB_WIN_SCORE
+from evalcache import EvalCache
+from bench import bench, divide, perft, perft_report, write_json
+from position import Position, to_chess_move
+from searchstats import profile
+
+# numpy là phụ thuộc tùy chọn: chỉ batch_eval, nnue và texel cần đến
+try:
+    import numpy as np
+    from batch_eval import evaluate_boards, board_masks, unpack_planes
+    from nnue import NNUE
+    from texel import Dataset, initial_parameters, read_epd, tune, write_tables
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
 
 #  TEST EVALUATE MODULE
 
@@ -141,6 +176,158 @@ class TestEvaluate(unittest.TestCase):
         """Kiểm tra PST trong endgame"""
         self.assertGreater(evaluate_piece_square(self.board, chess.WHITE, 1), 0)
 
+    def test_bitboard_matches_terms(self):
+        """Đánh giá bitboard (bảng nguyên trộn sẵn theo phase) khớp tổng các thành phần"""
+        from evaluate import evaluate_terms, side_terms, evaluate_piece_square as eps
+        for fen in [chess.STARTING_FEN,
+                    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 2 3",
+                    "8/5k2/8/3P4/8/8/5K2/8 w - - 0 1",
+                    "4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1",
+                    "QQQQ1k2/8/8/8/8/8/8/QQQ1K3 w - - 0 1"]:
+            b = chess.Board(fen)
+            expected = evaluate_terms(side_terms(b, chess.WHITE), side_terms(b, chess.BLACK), b.turn)
+            self.assertEqual(evaluate_board(b), expected)
+            white, t_white, _ = get_material_info(b, chess.WHITE)
+            black, t_black, _ = get_material_info(b, chess.BLACK)
+            legacy = (white + eps(b, chess.WHITE, t_white)) - (black + eps(b, chess.BLACK, t_black))
+            self.assertAlmostEqual(evaluate_board(b), legacy if b.turn else -legacy, places=6)
+
+
+#  TEST BATCH EVAL MODULE
+
+@unittest.skipUnless(HAS_NUMPY, "cần numpy")
+class TestBatchEval(unittest.TestCase):
+
+    def test_matches_evaluate_board(self):
+        """Đánh giá hàng loạt khớp chính xác evaluate_board, kể cả chiếu hết"""
+        fens = [
+            chess.STARTING_FEN,
+            "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1",
+            "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+            "8/5k2/8/3P4/8/8/5K2/8 w - - 0 1",
+            "R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1",
+            "k7/8/8/8/8/8/8/K7 w - - 0 1",
+        ]
+        boards = [chess.Board(fen) for fen in fens]
+        expected = [evaluate_board(b) for b in boards]
+        self.assertEqual(list(evaluate_boards(boards)), expected)
+
+    def test_planes_shape(self):
+        """Bitboard được mở thành mảng (N, 12, 64)"""
+        masks, turns = board_masks([chess.Board()])
+        planes = unpack_planes(masks)
+        self.assertEqual(planes.shape, (1, 12, 64))
+        self.assertEqual(planes[0, 0].sum(), 8)  # tốt trắng
+        self.assertEqual(planes[0, 11, chess.E8], 1)  # vua đen
+        self.assertTrue(turns[0])
+
+
+#  TEST NNUE MODULE
+
+@unittest.skipUnless(HAS_NUMPY, "cần numpy")
+class TestNNUE(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.net = NNUE.random(hidden=32, seed=1)
+
+    def test_float_weights_not_modified(self):
+        """Tạo mạng từ trọng số float không ghi đè dict của người gọi"""
+        rng = np.random.default_rng(3)
+        weights = {name: rng.normal(0, 0.1, array.shape).astype(np.float32)
+                   for name, array in self.net.weights.items()}
+        first = NNUE(weights)
+        self.assertTrue(all(array.dtype == np.float32 for array in weights.values()))
+        second = NNUE(weights)
+        board = chess.Board()
+        self.assertEqual(first.evaluate(board), second.evaluate(board))
+
+    def test_save_load_roundtrip(self):
+        """Lưu rồi nạp lại file .npz cho cùng kết quả"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "net.npz")
+            self.net.save(path)
+            net = NNUE.load(path)
+        board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        self.assertEqual(net.evaluate(board), self.net.evaluate(board))
+
+    def test_bad_shape_rejected(self):
+        """Trọng số sai kích thước bị từ chối"""
+        weights = dict(self.net.weights)
+        weights["l2_weight"] = np.zeros((8, 8), dtype=np.int8)
+        with self.assertRaises(ValueError):
+            NNUE(weights)
+
+    def test_accumulator_matches_full_evaluation(self):
+        """Accumulator cập nhật tăng dần khớp với tính lại từ đầu (cả nhập thành, ăn qua đường, phong cấp)"""
+        board = SearchBoard("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        board.use_nnue(self.net)
+        rng = random.Random(7)
+        for _ in range(60):
+            board.push(rng.choice(list(board.legal_moves)))
+            if board.is_game_over():
+                break
+            self.assertEqual(board.evaluate(), self.net.evaluate(chess.Board(board.fen())))
+        board = SearchBoard("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        board.use_nnue(self.net)
+        for uci in ["e1g1", "h3g2", "a2a4", "b4a3", "d5e6", "a3b2", "e6f7", "e8d8", "f7f8n", "b2a1q"]:
+            board.push_uci(uci)
+            self.assertEqual(board.evaluate(), self.net.evaluate(chess.Board(board.fen())))
+        while board.move_stack:
+            board.pop()
+        self.assertEqual(board.evaluate(), self.net.evaluate(chess.Board(board.fen())))
+
+    def test_search_with_nnue(self):
+        """Searcher dùng NNUE vẫn trả về nước đi hợp lệ"""
+        board = chess.Board()
+        searcher = Searcher(hash_mb=1, verbose=False, nnue=self.net)
+        move = searcher.iterative_deepening(board, max_depth=2, time_limit=60)
+        self.assertIn(move, board.legal_moves)
+
+
+#  TEST TEXEL MODULE
+
+@unittest.skipUnless(HAS_NUMPY, "cần numpy")
+class TestTexel(unittest.TestCase):
+
+    FENS = [
+        chess.STARTING_FEN,
+        "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b KQkq - 0 1",
+        "8/5k2/8/3P4/8/8/5K2/8 w - - 0 1",
+    ]
+
+    def test_features_match_evaluate_board(self):
+        """Đặc trưng thưa + tham số hiện tại cho đúng điểm evaluate_board (góc nhìn bên trắng)"""
+        boards = [chess.Board(fen) for fen in self.FENS]
+        dataset = Dataset.from_positions((board.board_fen(), 0.5) for board in boards)
+        scores = dataset.batch(0, len(dataset)).scores(initial_parameters())
+        for board, score in zip(boards, scores):
+            expected = evaluate_board(board) if board.turn == chess.WHITE else -evaluate_board(board)
+            self.assertAlmostEqual(score, expected, places=6)
+
+    def test_tune_and_write_tables(self):
+        """Đọc EPD, tinh chỉnh giảm loss và ghi ra module bảng nạp được"""
+        with tempfile.TemporaryDirectory() as tmp:
+            epd = os.path.join(tmp, "train.epd")
+            with open(epd, "w") as f:
+                for fen, result in zip(self.FENS * 8, ["1/2-1/2", "1-0", "0-1", "1-0"] * 8):
+                    f.write(f'{chess.Board(fen).epd()} c9 "{result}";\n')
+            dataset = Dataset.from_positions(read_epd(epd))
+            self.assertEqual(len(dataset), 32)
+            _, _, start_loss = tune(dataset, k=0.01, epochs=0)
+            theta, _, loss = tune(dataset, k=0.01, epochs=20, batch_size=8)
+            self.assertLess(loss, start_loss)
+
+            path = os.path.join(tmp, "tuned_tables.py")
+            write_tables(theta, path)
+            namespace = {}
+            with open(path) as f:
+                exec(f.read(), namespace)
+        self.assertEqual(len(namespace["KING_END"]), 64)
+        self.assertEqual(namespace["piece_values"][chess.KING], 0)
+        self.assertEqual(namespace["PHASE_TOTAL"], 152)
+
 
 #  TEST UI MODULE
 
@@ -289,10 +476,19 @@ class TestAI(unittest.TestCase):
 
     def test_update_ai_move_no_book(self):
         """Test AI xử lý khi sách khai cuộc lỗi"""
-        with patch('chess.polyglot.open_reader', side_effect=IndexError):
-            g = MagicMock()
+        move = chess.Move.from_uci("e2e4")
+        # Không chạy tìm kiếm thật: phiên engine trả ngay một nước
+        with patch.object(self.ai, 'book', None), \
+                patch.object(self.ai.session, 'search', return_value=move) as search:
+            g = MagicMock(spec=["board", "check_game_end"])  # không có root Tk
             g.board = self.board
             self.ai.update_ai_move(g, self.board)
+            for _ in range(100):
+                if self.board.move_stack:
+                    break
+                time.sleep(0.02)
+        search.assert_called_once()
+        self.assertEqual(self.board.move_stack, [move])
 
     def test_run_search_process_starts_thread(self):
         """Kiểm tra AI tạo thread tìm kiếm"""
@@ -301,6 +497,854 @@ class TestAI(unittest.TestCase):
             t.assert_called()
 
 
+#  TEST BOOK MODULE
+
+class TestOpeningBook(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.book = OpeningBook()
+
+    def test_path_relative_to_package(self):
+        """Tìm được baron30.bin kể cả khi thư mục làm việc khác"""
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                book = OpeningBook("baron30.bin")
+            finally:
+                os.chdir(cwd)
+        self.assertTrue(os.path.isabs(book.path))
+        book.close()
+
+    def test_lookup_matches_polyglot_reader(self):
+        """Tra cứu bằng chỉ mục trong bộ nhớ giống chess.polyglot"""
+        board = chess.Board()
+        board.push_uci("e2e4")
+        with chess.polyglot.open_reader(self.book.path) as reader:
+            expected = [(e.move, e.weight) for e in reader.find_all(board)]
+        self.assertEqual([(e.move, e.weight) for e in self.book.find_all(board)], expected)
+        self.assertEqual(self.book.move(board), expected[0][0])
+        self.assertIn(self.book.move(board, weighted=True, rng=random.Random(1)), [m for m, _ in expected])
+
+    def test_out_of_book(self):
+        """Ngoài sách trả về None"""
+        self.assertIsNone(self.book.move(chess.Board("8/8/8/8/8/2k5/8/K7 w - - 0 1")))
+
+    def test_picklable(self):
+        """Sách khai cuộc pickle được để chia sẻ sang tiến trình khác"""
+        book = pickle.loads(pickle.dumps(self.book))
+        self.assertEqual(book.move(chess.Board()), self.book.move(chess.Board()))
+        book.close()
+
+    def test_missing_book_reported_once(self):
+        """Thiếu file sách chỉ thử mở và báo một lần cho cả tiến trình"""
+        with patch("book._default_book", None), patch.dict(os.environ, {"CHESS_BOOK": "/nonexistent/book.bin"}), \
+                patch("sys.stdout", new_callable=StringIO) as out:
+            self.assertIsNone(default_book())
+            self.assertIsNone(default_book())
+        self.assertEqual(out.getvalue().count("Không tìm thấy"), 1)
+
+
+#  TEST BOOKGEN MODULE
+
+class TestBookGen(unittest.TestCase):
+
+    GAMES = [
+        ("1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 1-0", "1-0"),
+        ("1. e4 e5 2. Nf3 Nf6 1/2-1/2", "1/2-1/2"),
+        ("1. e4 c5 2. Nf3 d6 0-1", "0-1"),
+        ("1. d4 d5 2. c4 e6 1-0", "1-0"),
+        ("1. a4 a5 *", "*"),
+    ]
+
+    def test_polyglot_castling_encoding(self):
+        """Nhập thành được mã hoá là vua ăn xe theo chuẩn Polyglot"""
+        board = chess.Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        self.assertEqual(polyglot_move(board, chess.Move.from_uci("e1g1")), chess.H1 | chess.E1 << 6)
+        self.assertEqual(polyglot_move(board, chess.Move.from_uci("e1c1")), chess.A1 | chess.E1 << 6)
+
+    def test_build_book_from_pgn(self):
+        """Dựng sách .bin từ PGN: trọng số thắng 2 / hoà 1, lọc theo số ván, đọc được bằng OpeningBook"""
+        with tempfile.TemporaryDirectory() as tmp:
+            pgn = os.path.join(tmp, "games.pgn")
+            with open(pgn, "w") as f:
+                for moves, result in self.GAMES:
+                    f.write(f'[Event "?"]\n[Result "{result}"]\n\n{moves}\n\n')
+            output = os.path.join(tmp, "book.bin")
+            build_book([pgn], output, max_ply=4, min_games=1, workers=2, games_per_chunk=2, spill_entries=4)
+            book = OpeningBook(output)
+            start = {e.move.uci(): e.weight for e in book.find_all(chess.Board())}
+            # 1. a4 thuộc ván chưa kết thúc nên bị bỏ
+            self.assertEqual(start, {"e2e4": 3, "d2d4": 2})
+            board = chess.Board()
+            board.push_uci("e2e4")
+            self.assertEqual({e.move.uci(): e.weight for e in book.find_all(board)}, {"e7e5": 1, "c7c5": 2})
+            book.close()
+
+            build_book([pgn], output, max_ply=4, min_games=2, workers=1)
+            with chess.polyglot.open_reader(output) as reader:
+                self.assertEqual([e.move.uci() for e in reader.find_all(chess.Board())], ["e2e4"])
+
+
+#  TEST TRANSPOSITION MODULE
+
+class TestTranspositionTable(unittest.TestCase):
+
+    def setUp(self):
+        self.tt = TranspositionTable(size_mb=1)
+        self.key = chess.polyglot.zobrist_hash(chess.Board())
+
+    def test_static_eval_stored(self):
+        """Lưu điểm tĩnh trong ô TT; ghi đè không kèm điểm tĩnh thì giữ điểm cũ"""
+        self.tt.store(self.key, 10, 3, TranspositionTable.EXACT, None, 12.625)
+        self.assertEqual(self.tt.get(self.key).static_eval, 12.625)
+        self.tt.store(self.key, 20, 4, TranspositionTable.EXACT, None)
+        self.assertEqual(self.tt.get(self.key).static_eval, 12.625)
+        self.tt.store(self.key ^ 1, 0, 1, TranspositionTable.EXACT, None)
+        self.assertIsNone(self.tt.get(self.key ^ 1).static_eval)
+
+    def test_store_and_get(self):
+        """Lưu rồi đọc lại đúng giá trị, độ sâu, cờ và nước đi"""
+        move = chess.Move.from_uci("e7e8q")
+        self.tt.store(self.key, -123, 5, TranspositionTable.LOWER, move)
+        entry = self.tt.get(self.key)
+        self.assertEqual((entry.value, entry.depth, entry.flag, entry.move),
+                         (-123, 5, TranspositionTable.LOWER, move))
+
+    def test_get_missing(self):
+        """Khóa chưa lưu → None"""
+        self.assertIsNone(self.tt.get(self.key))
+
+    def test_full_bucket_keeps_deep_entry(self):
+        """Bucket đầy: giữ lại thế cờ sâu, thay thế thế cờ nông"""
+        stride = self.tt.bucket_mask + 1
+        self.tt.store(self.key, 1, 20, TranspositionTable.EXACT, None)
+        for i in range(1, 8):
+            self.tt.store(self.key + i * stride, 0, 1, TranspositionTable.EXACT, None)
+        self.assertEqual(self.tt.get(self.key).depth, 20)
+
+    def test_hashfull(self):
+        """hashfull tăng khi ghi và về 0 ở lượt tìm kiếm mới"""
+        for i in range(4000):
+            self.tt.store(i, 0, 1, TranspositionTable.EXACT, None)
+        self.assertGreater(self.tt.hashfull(), 0)
+        self.tt.new_search()
+        self.assertEqual(self.tt.hashfull(), 0)
+
+
+class TestSharedTranspositionTable(unittest.TestCase):
+
+    def test_attached_copy_sees_writes(self):
+        """Bản gắn qua pickle dùng chung bộ nhớ với bảng gốc"""
+        tt = SharedTranspositionTable(size_mb=1)
+        try:
+            other = pickle.loads(pickle.dumps(tt))
+            tt.store(12345, 77, 3, TranspositionTable.EXACT, chess.Move.from_uci("g1f3"))
+            self.assertEqual(other.get(12345).value, 77)
+            other.close()
+        finally:
+            tt.close()
+
+    def test_generation_shared(self):
+        """Thế hệ TT nằm trong bộ nhớ chung: chỉ bảng gốc tăng, clear về 0 cho mọi tiến trình"""
+        tt = SharedTranspositionTable(size_mb=1)
+        try:
+            other = pickle.loads(pickle.dumps(tt))
+            tt.new_search()
+            tt.new_search()
+            self.assertEqual(other.generation, 2)
+            other.new_search()
+            self.assertEqual(tt.generation, 2)
+            tt.clear()
+            self.assertEqual(other.generation, 0)
+            other.close()
+        finally:
+            tt.close()
+
+
+#  TEST EVALCACHE MODULE
+
+class TestEvalCache(unittest.TestCase):
+
+    def test_hit_rate(self):
+        """Bộ nhớ đệm đánh giá: lần đầu trượt, lần sau trúng"""
+        cache = EvalCache(size_mb=1)
+        self.assertIsNone(cache.get(12345))
+        cache.store(12345, 42.5)
+        self.assertEqual(cache.get(12345), 42.5)
+        self.assertEqual(cache.hit_rate(), 0.5)
+
+    def test_direct_mapped_overwrite(self):
+        """Hai khoá cùng ô → khoá sau ghi đè khoá trước"""
+        cache = EvalCache(size_mb=1)
+        other = 7 + cache.mask + 1
+        cache.store(7, 1.0)
+        cache.store(other, 2.0)
+        self.assertIsNone(cache.get(7))
+        self.assertEqual(cache.get(other), 2.0)
+
+    def test_searcher_reuses_static_eval(self):
+        """Tìm kiếm lại cùng thế cờ dùng điểm tĩnh đã biết"""
+        searcher = Searcher(hash_mb=1, verbose=False)
+        board = SearchBoard("4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1")
+        searcher.quiescence(board, NEG_INF, POS_INF)
+        self.assertEqual(searcher.tt.get(board.zobrist_key).static_eval, board.evaluate())
+        self.assertEqual(searcher.static_eval(board), board.evaluate())
+        self.assertGreater(searcher.eval_cache.hits, 0)
+
+
+#  TEST SMP MODULE
+
+class TestParallelSearcher(unittest.TestCase):
+
+    def test_parallel_search_returns_legal_move(self):
+        """Lazy SMP với 2 tiến trình trả về nước đi hợp lệ"""
+        board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        searcher = ParallelSearcher(threads=2, hash_mb=1)
+        try:
+            move = searcher.iterative_deepening(board, max_depth=2, time_limit=30)
+        finally:
+            searcher.close()
+        self.assertIn(move, board.legal_moves)
+        self.assertEqual(searcher.completed_depth, 2)
+
+    def test_node_limit_shared_by_helpers(self):
+        """Giới hạn nút được chia cho các helper, tổng số nút không vượt quá"""
+        board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        searcher = ParallelSearcher(threads=3, hash_mb=1, verbose=False)
+        try:
+            # Lần đầu chờ các helper khởi động xong
+            searcher.iterative_deepening(board, max_depth=1, time_limit=30)
+            move = searcher.iterative_deepening(board, time_manager=TimeManager(nodes=900))
+        finally:
+            searcher.close()
+        self.assertIn(move, board.legal_moves)
+        self.assertLessEqual(searcher.nodes, 900)
+
+    def test_drain_late_results(self):
+        """Kết quả trễ của helper được thu hết trước khi xoá cờ dừng"""
+        searcher = ParallelSearcher(threads=1, hash_mb=1)
+        try:
+            searcher.outstanding = 1
+            searcher.results.put((0, 3, 10, "e2e4", 100))
+            searcher.drain()
+            self.assertEqual(searcher.outstanding, 0)
+            self.assertRaises(queue.Empty, searcher.results.get, timeout=0.1)
+        finally:
+            searcher.close()
+
+
+#  TEST SEARCHBOARD MODULE
+
+class TestSearchBoard(unittest.TestCase):
+
+    def assertKeyMatches(self, board):
+        self.assertEqual(board.zobrist_key, chess.polyglot.zobrist_hash(board))
+
+    def test_key_follows_moves(self):
+        """Khóa Zobrist tăng dần khớp polyglot qua ăn quân, bắt tốt qua đường, nhập thành"""
+        b = SearchBoard("r3k2r/pppq1ppp/8/3Pp3/8/8/PPP2PPP/R3K2R w KQkq e6 0 1")
+        for uci in ["d5e6", "d7e6", "e1c1", "e8g8", "h1g1"]:
+            b.push(chess.Move.from_uci(uci))
+            self.assertKeyMatches(b)
+        for _ in range(5):
+            b.pop()
+            self.assertKeyMatches(b)
+
+    def test_null_move(self):
+        """Nước đi rỗng cũng cập nhật khóa"""
+        b = SearchBoard("rnbqkbnr/ppp1pppp/8/8/3pP3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1")
+        b.push(chess.Move.null())
+        self.assertKeyMatches(b)
+        b.pop()
+        self.assertKeyMatches(b)
+
+    def test_from_board_keeps_history(self):
+        """from_board giữ lại lịch sử ván đấu trong ngăn xếp khóa"""
+        board = chess.Board()
+        for uci in ["e2e4", "e7e5", "g1f3"]:
+            board.push(chess.Move.from_uci(uci))
+        b = SearchBoard.from_board(board)
+        self.assertEqual(len(b.keys), 4)
+        self.assertKeyMatches(b)
+
+    def shuffle_knights(self, b):
+        for uci in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+            b.push(chess.Move.from_uci(uci))
+
+    def test_repetition_in_search_tree(self):
+        """Lặp lại hai lần trong cây tìm kiếm → hòa"""
+        b = SearchBoard()
+        self.shuffle_knights(b)
+        self.assertTrue(b.is_repetition_draw(ply=5))
+        self.assertFalse(b.is_repetition_draw(ply=0))
+
+    def test_repetition_in_game_history(self):
+        """Lịch sử ván đấu cần lặp ba lần"""
+        b = SearchBoard()
+        self.shuffle_knights(b)
+        self.shuffle_knights(b)
+        self.assertTrue(b.is_repetition_draw(ply=0))
+
+    def test_repetition_stops_at_irreversible_move(self):
+        """Không tìm quá nước đi không thể đảo ngược"""
+        b = SearchBoard()
+        self.shuffle_knights(b)
+        b.push(chess.Move.from_uci("e2e4"))
+        b.push(chess.Move.from_uci("e7e5"))
+        self.shuffle_knights(b)
+        self.assertFalse(b.is_repetition_draw(ply=0))
+        self.assertEqual(b.reversible[-1], 4)
+
+    def test_incremental_eval_matches_full(self):
+        """Đánh giá cập nhật dần khi push/pop khớp evaluate_board"""
+        board = SearchBoard()
+        moves = ["e2e4", "d7d5", "e4d5", "g8f6", "f1b5", "c7c6", "d5c6", "d8d2",
+                 "b1d2", "b7b6", "c6c7", "c8d7", "c7b8q", "a8b8", "g1f3", "e7e5",
+                 "e1g1", "f8c5", "f1e1", "e8g8"]
+        for uci in moves:
+            board.push_uci(uci)
+            self.assertEqual(board.evaluate(), evaluate_board(board))
+        board.push(chess.Move.null())
+        self.assertEqual(board.evaluate(), evaluate_board(board))
+        while board.move_stack:
+            board.pop()
+            self.assertEqual(board.evaluate(), evaluate_board(board))
+
+    def test_en_passant_eval(self):
+        """Bắt tốt qua đường cập nhật đúng điểm"""
+        board = SearchBoard("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1")
+        board.push_uci("e5d6")
+        self.assertEqual(board.evaluate(), evaluate_board(board))
+
+
+#  TEST TIMEMAN MODULE
+
+class TestTimeManager(unittest.TestCase):
+
+    def test_clock_deadlines(self):
+        """Có đồng hồ → hạn mềm nhỏ hơn hạn cứng và nhỏ hơn thời gian còn lại"""
+        tm = TimeManager(time_left=60, increment=1)
+        self.assertLess(tm.soft_limit, tm.hard_limit)
+        self.assertLess(tm.hard_limit, 60)
+
+    def test_infinite(self):
+        """Không giới hạn → không bao giờ dừng"""
+        tm = TimeManager()
+        self.assertFalse(tm.should_stop())
+        self.assertFalse(tm.check(0))
+
+    def test_check_polls_every_interval(self):
+        """Chỉ đọc đồng hồ mỗi CHECK_INTERVAL node"""
+        tm = TimeManager(movetime=0)
+        tm.start_time -= 1
+        self.assertFalse(tm.check(CHECK_INTERVAL - 1))
+        self.assertTrue(tm.check(CHECK_INTERVAL))
+
+    def test_stable_best_move_shortens_search(self):
+        """Nước đi tốt nhất ổn định → rút ngắn, điểm tụt → kéo dài"""
+        tm = TimeManager(time_left=60)
+        move = chess.Move.from_uci("e2e4")
+        for depth in range(1, 6):
+            tm.update(depth, move, 20)
+        self.assertLess(tm.scale, 1)
+        tm.update(6, move, -200)
+        self.assertGreater(tm.scale, 1)
+
+    def test_node_limit(self):
+        """Giới hạn số node → dừng khi vượt ngân sách"""
+        tm = TimeManager(nodes=1000)
+        self.assertFalse(tm.should_stop(999))
+        self.assertTrue(tm.should_stop(1000))
+        self.assertTrue(tm.check(CHECK_INTERVAL * 2))
+
+    def test_node_limit_exact(self):
+        """Ngân sách node được kiểm tra mỗi node → go nodes 300 không tìm quá 300 node"""
+        tm = TimeManager(nodes=300)
+        self.assertTrue(tm.check(300))
+        searcher = Searcher(hash_mb=1, verbose=False)
+        searcher.iterative_deepening(chess.Board(), max_depth=MAX_DEPTH, time_manager=tm)
+        self.assertEqual(searcher.nodes, 300)
+
+    def test_ponder_ignores_clock_until_ponderhit(self):
+        """Đang ponder → bỏ qua đồng hồ; ponderhit → tính giờ từ lúc đó"""
+        tm = TimeManager(movetime=0.1, ponder=True)
+        tm.start_time -= 10
+        self.assertFalse(tm.should_stop())
+        self.assertFalse(tm.check(CHECK_INTERVAL))
+        tm.ponderhit(TimeManager(movetime=5))
+        self.assertFalse(tm.should_stop())
+        tm.start_time -= 10
+        self.assertTrue(tm.should_stop())
+
+
+#  TEST MOVEPICK MODULE
+
+class TestMovePicker(unittest.TestCase):
+
+    def setUp(self):
+        self.board = chess.Board("r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4")
+
+    def test_public_legality_fallback(self):
+        """Không có hàm riêng của python-chess → dùng board.is_legal, cùng tập nước"""
+        board = chess.Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        with patch('movepick.FAST_LEGALITY', False):
+            moves = list(MovePicker(board))
+        self.assertEqual(len(moves), len(set(moves)))
+        self.assertEqual(set(moves), set(board.legal_moves))
+
+    def test_yields_every_legal_move_once(self):
+        """Sinh đủ mọi nước hợp lệ, mỗi nước một lần"""
+        killers = [chess.Move.from_uci("d2d3"), chess.Move.from_uci("a7a6")]
+        moves = list(MovePicker(self.board, chess.Move.from_uci("e1g1"), killers))
+        self.assertEqual(len(moves), len(set(moves)))
+        self.assertEqual(set(moves), set(self.board.legal_moves))
+
+    def test_stage_order(self):
+        """Nước TT trước, rồi ăn quân, rồi killer, rồi nước yên tĩnh"""
+        tt_move = chess.Move.from_uci("e1g1")
+        killer = chess.Move.from_uci("d2d3")
+        moves = list(MovePicker(self.board, tt_move, [killer]))
+        self.assertEqual(moves[0], tt_move)
+        self.assertEqual(moves[1:3], [chess.Move.from_uci("f3e5"), chess.Move.from_uci("c4f7")])
+        self.assertEqual(moves[3], killer)
+
+    def test_cutoff_skips_quiet_generation(self):
+        """Dừng sau nước TT thì không sinh nước yên tĩnh"""
+        picker = MovePicker(self.board, chess.Move.from_uci("e1g1"))
+        next(iter(picker))
+        self.assertEqual(picker.stage, MovePicker.TT_MOVE)
+
+    def test_captures_only(self):
+        """Chế độ tĩnh lặng: chỉ ăn quân và phong cấp"""
+        board = chess.Board("4k3/1P6/8/3p4/8/2N5/8/4K3 w - - 0 1")
+        moves = list(MovePicker(board, chess.Move.from_uci("e1e2"), captures_only=True))
+        self.assertEqual(set(m.uci() for m in moves),
+                         {"c3d5", "b7b8q", "b7b8r", "b7b8b", "b7b8n"})
+        self.assertEqual(moves[0], chess.Move.from_uci("b7b8q"))
+
+    def test_in_check_evasions(self):
+        """Đang bị chiếu → chỉ sinh nước thoát chiếu"""
+        board = chess.Board("rnb1kbnr/pppp1ppp/8/4p3/5PPq/8/PPPPP2P/RNBQKBNR w KQkq - 1 3")
+        self.assertEqual(list(MovePicker(board)), [])
+
+
+#  TEST SEARCHER MODULE
+
+class TestSearchParams(unittest.TestCase):
+
+    def test_save_and_load(self):
+        """Lưu bộ tham số ra JSON rồi nạp lại"""
+        params = SearchParams(lmr_base=1.1, null_move_r=3)
+        path = os.path.join(tempfile.mkdtemp(), "params.json")
+        params.save(path)
+        self.assertEqual(SearchParams.load(path).to_dict(), params.to_dict())
+
+    def test_unknown_parameter(self):
+        """Tham số lạ → ValueError"""
+        with self.assertRaises(ValueError):
+            SearchParams(foo=1)
+
+    def test_fixed_node_search(self):
+        """Tìm kiếm theo số node cố định trả về nước hợp lệ"""
+        board = chess.Board()
+        searcher = Searcher(hash_mb=1, params=SearchParams(null_move_r=4), verbose=False)
+        move = searcher.iterative_deepening(board, max_depth=64, time_manager=TimeManager(nodes=1500))
+        self.assertIn(move, board.legal_moves)
+
+
+class TestNullMoveMaterial(unittest.TestCase):
+
+    def test_has_non_pawn_material(self):
+        """Chỉ còn vua và tốt → không có quân lớn (vua không được tính)"""
+        searcher = Searcher(hash_mb=1, verbose=False)
+        self.assertFalse(searcher.has_non_pawn_material(chess.Board("4k3/pp6/8/8/8/8/PP6/4K3 w - - 0 1")))
+        self.assertTrue(searcher.has_non_pawn_material(chess.Board("4k3/pp6/8/8/8/8/PP6/4KN2 w - - 0 1")))
+        # Chỉ xét bên đang đi
+        self.assertFalse(searcher.has_non_pawn_material(chess.Board("4k3/pp6/8/8/8/8/PP6/4KN2 b - - 0 1")))
+
+
+class TestQuiescence(unittest.TestCase):
+
+    def setUp(self):
+        self.searcher = Searcher(hash_mb=1, verbose=False)
+
+    def test_wins_hanging_queen(self):
+        """Tĩnh lặng thấy ăn được hậu treo"""
+        board = SearchBoard("4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1")
+        score = self.searcher.quiescence(board, NEG_INF, POS_INF)
+        self.assertGreater(score, 300)
+
+    def test_in_check_mate(self):
+        """Bị chiếu hết trong tĩnh lặng → điểm chiếu hết"""
+        board = SearchBoard("R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1")
+        score = self.searcher.quiescence(board, NEG_INF, POS_INF, ply=3)
+        self.assertEqual(score, -IMMEDIATE_MATE_SCORE + 3)
+
+    def test_stores_tt_entry(self):
+        """Kết quả tĩnh lặng được lưu vào bảng băm"""
+        board = SearchBoard("4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1")
+        self.searcher.quiescence(board, NEG_INF, POS_INF)
+        self.assertIsNotNone(self.searcher.tt.get(board.zobrist_key))
+
+
+class TestRootSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        self.searcher = Searcher(hash_mb=1, verbose=False)
+
+    def test_root_moves_ordered_by_previous_iteration(self):
+        """Sau mỗi vòng lặp, nước tốt nhất đứng đầu danh sách gốc"""
+        move = self.searcher.iterative_deepening(self.board, max_depth=3, time_limit=60)
+        self.assertEqual(self.searcher.root_moves[0], move)
+        self.assertEqual(set(self.searcher.root_moves), set(self.board.legal_moves))
+        self.assertTrue(all(n > 0 for n in self.searcher.root_nodes.values()))
+
+    def test_aspiration_matches_full_window(self):
+        """Cửa sổ aspiration (kể cả khi phải mở rộng) cho cùng điểm với cửa sổ đầy đủ"""
+        self.searcher.iterative_deepening(self.board, max_depth=2, time_limit=60)
+        board = SearchBoard.from_board(self.board)
+        full = self.searcher.search(board, 3, 0, NEG_INF, POS_INF)
+        self.assertAlmostEqual(self.searcher.aspiration_search(board, 3, full - 300), full, delta=1)
+
+    def test_pv_is_legal_line_from_best_move(self):
+        """PV bắt đầu bằng nước tốt nhất và là chuỗi nước hợp lệ"""
+        move = self.searcher.iterative_deepening(self.board, max_depth=4, time_limit=60)
+        pv = self.searcher.principal_variation
+        self.assertEqual(pv[0], move)
+        self.assertGreater(len(pv), 1)
+        board = self.board.copy()
+        for m in pv:
+            self.assertIn(m, board.legal_moves)
+            board.push(m)
+
+    def test_info_events_per_iteration(self):
+        """Mỗi vòng lặp gửi một SearchInfo cho callback và queue"""
+        events, q = [], queue.Queue()
+        self.searcher.subscribe(events.append)
+        self.searcher.subscribe(q)
+        self.searcher.iterative_deepening(self.board, max_depth=3, time_limit=60)
+        self.assertEqual([info.depth for info in events], [1, 2, 3])
+        self.assertEqual(q.qsize(), 3)
+        info = events[-1]
+        self.assertIsInstance(info, SearchInfo)
+        self.assertGreaterEqual(info.seldepth, info.depth)
+        self.assertEqual(info.nodes, self.searcher.nodes)
+        self.assertEqual(info.to_dict()["pv"][0], info.pv[0].uci())
+
+
+#  TEST SEARCHSTATS MODULE
+
+class TestSearchStats(unittest.TestCase):
+
+    def test_stats_off_by_default(self):
+        """Không bật stats thì searcher.stats là None, số nút không đổi"""
+        board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        plain = Searcher(hash_mb=1, verbose=False)
+        plain.iterative_deepening(board, max_depth=3, time_manager=TimeManager())
+        counted = Searcher(hash_mb=1, verbose=False, stats=True)
+        counted.iterative_deepening(board, max_depth=3, time_manager=TimeManager())
+        self.assertIsNone(plain.stats)
+        self.assertEqual(plain.nodes, counted.nodes)
+
+    def test_counters_consistent(self):
+        """Mỗi nút chỉ được xếp một loại (nút biên tính là tĩnh lặng); tỉ lệ cắt nước đầu và EBF theo từng độ sâu"""
+        searcher = Searcher(hash_mb=1, verbose=False, stats=True)
+        # searcher.nodes đếm nút biên hai lần: một lần ở search, một lần ở quiescence
+        horizon = []
+        search = searcher.search
+
+        def counting_search(board, depth, ply, alpha, beta):
+            if depth <= 0:
+                horizon.append(ply)
+            return search(board, depth, ply, alpha, beta)
+
+        searcher.search = counting_search
+        searcher.iterative_deepening(chess.Board(), max_depth=4, time_manager=TimeManager())
+        stats = searcher.stats.to_dict()
+        self.assertGreater(len(horizon), 0)
+        self.assertEqual(stats["nodes"] + stats["qnodes"] + len(horizon), searcher.nodes)
+        self.assertEqual(stats["tt_probes"], searcher.nodes)
+        self.assertLessEqual(stats["tt_cutoffs"], stats["tt_hits"])
+        self.assertLessEqual(stats["first_move_cutoffs"], stats["beta_cutoffs"])
+        self.assertLessEqual(stats["null_cutoffs"], stats["null_tries"])
+        self.assertEqual(len(stats["iteration_nodes"]), 4)
+        self.assertEqual(sum(stats["iteration_nodes"]), searcher.nodes)
+        self.assertEqual(len(stats["ebf"]), 3)
+        self.assertEqual(stats["depth"], 4)
+
+    def test_profile_and_json(self):
+        """profile bọc một lần tìm kiếm; thống kê ghi ra JSON"""
+        searcher = Searcher(hash_mb=1, verbose=False, stats=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            move, report = profile(searcher.iterative_deepening, chess.Board(), max_depth=2,
+                                   time_manager=TimeManager(), path=os.path.join(tmp, "search.prof"))
+            self.assertIn("search", report)
+            self.assertTrue(os.path.exists(os.path.join(tmp, "search.prof")))
+            path = os.path.join(tmp, "stats.json")
+            searcher.stats.save(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["bestmove"], move.uci())
+
+
+#  TEST TABLEBASE MODULE
+
+def fake_syzygy():
+    """Bảng giả KQvK / KvK: bên có hậu thắng, mất hậu thì hoà"""
+    def dtz(board):
+        if not board.queens:
+            return 0
+        return 3 if board.queens & board.occupied_co[board.turn] else -3
+
+    tables = MagicMock()
+    tables.wdl = {"KQvK": None, "KvK": None}
+    tables.get_dtz.side_effect = dtz
+    tables.get_wdl.side_effect = lambda board: (dtz(board) > 0) * 2 - (dtz(board) < 0) * 2
+    return tables
+
+
+class TestTablebase(unittest.TestCase):
+
+    def setUp(self):
+        self.tables = fake_syzygy()
+        patcher = patch("chess.syzygy.open_tablebase", return_value=self.tables)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_wdl_lru_cache(self):
+        """Kết quả WDL được cache LRU; thế cờ ngoài phạm vi trả về None"""
+        tablebase = Tablebase("syzygy", cache_size=1)
+        self.assertEqual(tablebase.max_pieces, 3)
+        board = chess.Board("k7/8/1K6/8/8/8/8/6Q1 b - - 0 1")
+        self.assertEqual(tablebase.probe_wdl(board), -2)
+        self.assertEqual(tablebase.probe_wdl(board), -2)
+        self.assertEqual((tablebase.hits, self.tables.get_wdl.call_count), (1, 1))
+        tablebase.probe_wdl(chess.Board("k7/8/1K6/8/8/8/8/6Q1 w - - 0 1"))
+        self.assertEqual(len(tablebase.cache), 1)
+        self.assertIsNone(tablebase.probe_wdl(chess.Board()))
+
+    def test_root_plays_tablebase_move(self):
+        """Ở gốc, nước theo DTZ được chọn ngay, không cần tìm kiếm"""
+        board = chess.Board("k7/8/1K6/8/8/8/8/6Q1 w - - 0 1")
+        searcher = Searcher(hash_mb=1, verbose=False, tablebase=Tablebase("syzygy"))
+        move = searcher.iterative_deepening(board, max_depth=10, time_limit=60)
+        self.assertEqual(move, chess.Move.from_uci("g1g8"))  # chiếu hết
+        self.assertEqual(searcher.nodes, 0)
+        self.assertEqual(searcher.best_eval, TB_WIN_SCORE)
+
+    def test_root_moves_respect_halfmove_clock(self):
+        """DTZ cộng đồng hồ 50 nước vượt 100 → thắng thành thắng "bị nguyền" (hoà)"""
+        tablebase = Tablebase("syzygy")
+        fresh = tablebase.root_moves(chess.Board("k7/8/2K5/8/8/8/8/6Q1 w - - 0 1"))
+        self.assertEqual({wdl for move, wdl in fresh if move.from_square == chess.C6}, {2})
+        self.tables.get_dtz.side_effect = lambda board: 0 if not board.queens else (
+            10 if board.queens & board.occupied_co[board.turn] else -10)
+        late = tablebase.root_moves(chess.Board("k7/8/2K5/8/8/8/8/6Q1 w - - 95 100"))
+        self.assertEqual({wdl for move, wdl in late if move.from_square == chess.C6}, {1})
+        self.assertEqual(tablebase.score(1, 0), 0)
+
+    def test_search_cutoff_after_capture(self):
+        """Trong tìm kiếm, thế cờ sau nước ăn quân được tra bảng thay vì tìm tiếp"""
+        board = chess.Board("k7/8/1K6/8/8/8/1r6/Q7 w - - 5 40")
+        searcher = Searcher(hash_mb=1, verbose=False, tablebase=Tablebase("syzygy"))
+        move = searcher.iterative_deepening(board, max_depth=3, time_limit=60)
+        self.assertGreater(searcher.tb_hits, 0)
+        self.assertEqual(move, chess.Move.from_uci("a1b2"))
+        self.assertGreaterEqual(searcher.best_eval, TB_WIN_SCORE - 1)
+
+
+#  TEST ENGINE MODULE
+
+class TestEngineSession(unittest.TestCase):
+
+    def setUp(self):
+        self.session = EngineSession(hash_mb=1, verbose=False)
+        self.searcher = self.session.searcher
+        self.board = chess.Board()
+
+    def test_state_kept_between_moves(self):
+        """Nước tiếp theo dùng lại bảng TT của lần tìm trước"""
+        move = self.session.search(self.board, TimeManager(nodes=3000), max_depth=4)
+        self.board.push(move)
+        reply = next(iter(self.board.legal_moves))
+        self.board.push(reply)
+        self.assertIsNotNone(self.searcher.tt.get(chess.polyglot.zobrist_hash(self.board)))
+        self.assertIs(self.session.searcher, self.searcher)
+
+    def test_history_aged_and_killers_shifted(self):
+        """History giảm một nửa, killer dịch theo số nửa nước đã đi"""
+        killer = chess.Move.from_uci("g1f3")
+        self.searcher.history = {1: 100, 2: 1}
+        self.searcher.killer_moves[2] = [killer]
+        self.searcher.new_move(self.board)
+        self.board.push_uci("e2e4")
+        self.board.push_uci("e7e5")
+        self.searcher.new_move(self.board)
+        self.assertEqual(self.searcher.history, {1: 25})
+        self.assertEqual(self.searcher.killer_moves[0], [killer])
+        self.assertEqual(self.searcher.killer_moves[2], [])
+
+    def test_new_game_resets(self):
+        """Ván mới xoá TT, history và killer"""
+        self.session.search(self.board, TimeManager(nodes=1000), max_depth=3)
+        self.session.new_game()
+        self.assertIsNone(self.searcher.tt.get(chess.polyglot.zobrist_hash(self.board)))
+        self.assertEqual(self.searcher.history, {})
+        self.assertTrue(all(not k for k in self.searcher.killer_moves.values()))
+
+    def test_ponder_search_is_quiet(self):
+        """Tìm kiếm ponder không in log; dừng ponder thì trả lại verbose"""
+        session = EngineSession(hash_mb=1)
+        session.set_verbose(False)
+        move = session.search(self.board, TimeManager(nodes=3000), max_depth=3)
+        session.set_verbose(True)
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            self.assertIsNotNone(session.start_ponder(self.board, move, TimeManager(movetime=0.2)))
+            time.sleep(0.3)
+            session.stop_ponder()
+        self.assertNotIn("[Search]", out.getvalue())
+        self.assertTrue(session.searcher.verbose)
+
+    def _ponder_after_search(self):
+        move = self.session.search(self.board, TimeManager(nodes=3000), max_depth=4)
+        reply = self.session.start_ponder(self.board, move, TimeManager(movetime=0.2))
+        self.assertIsNotNone(reply)
+        self.assertTrue(self.session.ponder_thread.is_alive())
+        self.board.push(move)
+        return reply
+
+    def test_ponderhit_continues_search(self):
+        """Đối thủ đi đúng nước dự đoán → tiếp tục tìm kiếm đang chạy"""
+        reply = self._ponder_after_search()
+        self.board.push(reply)
+        move = self.session.search(self.board, TimeManager(movetime=0.2))
+        self.assertIn(move, self.board.legal_moves)
+        self.assertIsNone(self.session.ponder_thread)
+
+    def test_ponder_miss_is_cancelled(self):
+        """Đối thủ đi nước khác → dừng ponder và tìm lại từ đầu"""
+        reply = self._ponder_after_search()
+        other = next(m for m in self.board.legal_moves if m != reply)
+        self.board.push(other)
+        move = self.session.search(self.board, TimeManager(nodes=2000))
+        self.assertIn(move, self.board.legal_moves)
+        self.assertIsNone(self.session.ponder_thread)
+
+    def test_ai_owns_session(self):
+        """AI dùng chung một phiên engine qua các nước đi"""
+        ai = AI(session=self.session)
+        self.assertIs(ai.session, self.session)
+
+
+#  TEST BENCH MODULE
+
+class TestBench(unittest.TestCase):
+
+    KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+    def test_perft_known_counts(self):
+        """perft khớp số nút chuẩn, kể cả nhập thành, bắt tốt qua đường, phong cấp"""
+        self.assertEqual(perft(SearchBoard(), 3), 8902)
+        self.assertEqual(perft(SearchBoard(self.KIWIPETE), 2), 2039)
+        self.assertEqual(perft(SearchBoard("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"), 3), 2812)
+
+    def test_divide_sums_to_perft(self):
+        """Tổng divide bằng perft; bàn cờ trở lại như cũ"""
+        board = SearchBoard(self.KIWIPETE)
+        counts = divide(board, 2)
+        self.assertEqual(len(counts), 48)
+        self.assertEqual(sum(counts.values()), 2039)
+        self.assertEqual(board.fen(), self.KIWIPETE)
+
+    def test_bench_deterministic_json(self):
+        """Số nút bench giống nhau giữa hai lần chạy; báo cáo ghi ra JSON"""
+        fens = [chess.STARTING_FEN, self.KIWIPETE]
+        first = bench(2, fens=fens, hash_mb=1)
+        second = bench(2, fens=fens, hash_mb=1)
+        self.assertEqual(first["nodes"], second["nodes"])
+        self.assertEqual(first["nodes"], sum(position["nodes"] for position in first["positions"]))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "perft.json")
+            write_json(perft_report(chess.STARTING_FEN, 2), path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["nodes"], 400)
+
+    @patch('sys.stdin.readline', side_effect=["position startpos moves e2e4\n", "go perft 2\n", "quit\n"])
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_uci_go_perft(self, mock_stdout, mock_stdin):
+        """go perft in divide và tổng số nút, không có bestmove"""
+        uci_loop()
+        out = mock_stdout.getvalue()
+        self.assertIn("e7e5: 29", out)
+        self.assertIn("Nodes searched: 600", out)
+        self.assertNotIn("bestmove", out)
+
+
+#  TEST POSITION MODULE
+
+class TestPosition(unittest.TestCase):
+
+    def test_perft_suite(self):
+        """perft của Position khớp số nút chuẩn (nhập thành, en passant, phong cấp, ghim)"""
+        cases = [
+            (chess.STARTING_FEN, 3, 8902),
+            ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 2, 2039),
+            ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 4, 43238),
+            ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 3, 9467),
+            ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 2, 1486),
+        ]
+        for fen, depth, nodes in cases:
+            self.assertEqual(Position(fen).perft(depth), nodes, fen)
+
+    def test_matches_chess_board(self):
+        """Nước hợp lệ, khoá Zobrist và FEN khớp chess.Board; pop trả lại thế cờ gốc"""
+        rng = random.Random(7)
+        board = chess.Board()
+        position = Position()
+        for _ in range(80):
+            moves = position.legal_moves()
+            self.assertEqual({to_chess_move(move) for move in moves}, set(board.legal_moves))
+            self.assertEqual(position.key, chess.polyglot.zobrist_hash(board))
+            if not moves:
+                break
+            move = rng.choice(moves)
+            position.push(move)
+            board.push(to_chess_move(move))
+            self.assertEqual(position.to_board().fen(), board.fen())
+        while position.stack:
+            position.pop()
+        self.assertEqual(position.fen(), chess.STARTING_FEN)
+
+    def test_from_board_history(self):
+        """from_board phát lại lịch sử ván; en passant và nước null"""
+        board = chess.Board()
+        for uci in ("e2e4", "a7a6", "e4e5", "d7d5"):
+            board.push_uci(uci)
+        position = Position.from_board(board)
+        self.assertEqual(len(position.stack), 4)
+        ep = position.from_chess_move(chess.Move.from_uci("e5d6"))
+        self.assertIn(ep, position.legal_moves())
+        position.push(ep)
+        self.assertEqual(position.to_board().fen(), "rnbqkbnr/1pp1pppp/p2P4/8/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 3")
+        position.push(0)
+        self.assertTrue(position.turn)
+        position.pop()
+        position.pop()
+        self.assertEqual(position.key, chess.polyglot.zobrist_hash(board))
+
+
+#  TEST SPSA MODULE
+
+class TestSPSA(unittest.TestCase):
+
+    def test_play_game_short(self):
+        """Ván tự chơi bị cắt theo số nước → hòa"""
+        params = SearchParams().to_dict()
+        self.assertEqual(play_game(params, params, ["e2e4"], nodes=300, max_plies=3), 0.5)
+
+
 #  TEST UCI MODULE
 
 class TestUCI(unittest.TestCase):
@@ -322,6 +1366,46 @@ class TestUCI(unittest.TestCase):
         out = mock_stdout.getvalue()
         self.assertIn("bestmove", out)
 
+    @patch('sys.stdin.readline', side_effect=["position startpos moves e2e4 e7e5\n", "go depth 2\n",
+                                              "isready\n", "quit\n"])
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_uci_go_depth_info(self, mock_stdout, mock_stdin):
+        """go depth in ra dòng info cho từng độ sâu rồi bestmove hợp lệ"""
+        uci_loop()
+        lines = mock_stdout.getvalue().splitlines()
+        self.assertTrue(any(line.startswith("info depth 2 ") and " pv " in line for line in lines))
+        bestmove = [line for line in lines if line.startswith("bestmove")]
+        self.assertEqual(len(bestmove), 1)
+        board = chess.Board()
+        board.push_uci("e2e4")
+        board.push_uci("e7e5")
+        self.assertIn(chess.Move.from_uci(bestmove[0].split()[1]), board.legal_moves)
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_uci_infinite_waits_for_stop(self, mock_stdout):
+        """go infinite chỉ trả bestmove sau lệnh stop; lệnh sai không làm dừng vòng lặp"""
+        stopped = Event()
+
+        def commands():
+            yield "setoption name Hash value 8\n"
+            yield "position fen 8/8/8/8/8/2k5/8/K1q5 w - - 0 1 moves h7h8\n"
+            yield "position fen k7/8/1K6/8/8/8/8/6Q1 w - - 0 1\n"
+            yield "go infinite\n"
+            time.sleep(0.3)
+            # Mate in one is found at once, but bestmove must wait for stop
+            self.assertNotIn("bestmove", mock_stdout.getvalue())
+            stopped.set()
+            yield "stop\n"
+            yield "quit\n"
+
+        with patch('sys.stdin.readline', side_effect=commands()):
+            uci_loop()
+        out = mock_stdout.getvalue()
+        self.assertTrue(stopped.is_set())
+        self.assertIn("info string error", out)
+        self.assertIn("score mate 1", out)
+        self.assertIn("bestmove g1g8", out)
+
 
 if __name__ == "__main__":
     result = unittest.main(verbosity=2, exit=False)
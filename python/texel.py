@@ -0,0 +1,367 @@
+"""Texel tuning of the evaluation tables in evaluate.py.
+
+Labelled positions (EPD lines with a game result, or every position of PGN
+games labelled with the game's result) are streamed from disk into a
+compact sparse matrix: one int16 feature per piece,
+``color * 384 + (piece_type - 1) * 64 + square``, in CSR rows. Given the
+parameters (piece values, midgame and endgame tables, phase weights) the
+score of a row is computed exactly like ``evaluate_board`` from white's
+view, so tuned values drop straight back into the engine.
+
+The logistic loss of ``sigmoid(K * score)`` against the result is
+minimized with mini-batch Adam; every step is a handful of ``bincount``
+calls over the batch's features. K is fitted once to the starting tables.
+
+    python texel.py --epd quiet-labeled.epd --epochs 20 \\
+        --cache positions.npz --output tuned_tables.py
+
+The output is a module with the same names as the tables in evaluate.py.
+"""
+import argparse
+import re
+import time
+from array import array
+
+import chess
+import chess.pgn
+import numpy as np
+
+from evaluate import piece_square_tables, piece_values, phase_weights, PHASE_TOTAL
+
+PIECE_FEATURES = 6 * 64
+FEATURES = 2 * PIECE_FEATURES  # white pieces, then black pieces
+
+# Parameter vector layout
+MATERIAL = slice(0, 6)
+PST_MG = slice(6, 6 + PIECE_FEATURES)
+PST_EG = slice(PST_MG.stop, PST_MG.stop + PIECE_FEATURES)
+PHASE = slice(PST_EG.stop, PST_EG.stop + 6)
+PARAMETERS = PHASE.stop
+
+# Values that stay put: the king's material and the pawn and king phase
+# weights, which evaluate.py keeps at zero.
+FROZEN = np.zeros(PARAMETERS, dtype=bool)
+FROZEN[MATERIAL.start + chess.KING - 1] = True
+FROZEN[PHASE.start + chess.PAWN - 1] = True
+FROZEN[PHASE.start + chess.KING - 1] = True
+
+# Adam step size per parameter group, in the units of each group
+LEARNING_RATES = ((MATERIAL, 1.0), (PST_MG, 1.0), (PST_EG, 1.0), (PHASE, 0.1))
+
+FEN_FEATURES = {symbol: (symbol.islower() * PIECE_FEATURES
+                         + (chess.PIECE_SYMBOLS.index(symbol.lower()) - 1) * 64)
+                for symbol in "PNBRQKpnbrqk"}
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+RESULT_PATTERN = re.compile(r'1/2-1/2|1-0|0-1|[\["](?:1\.0|0\.5|0\.0)[\]"]')
+TABLE_NAMES = {
+    chess.PAWN: ("PAWN_TABLE", "PAWN_ENDGAME_TABLE"),
+    chess.KNIGHT: ("KNIGHT_TABLE", "KNIGHT_ENDGAME_TABLE"),
+    chess.BISHOP: ("BISHOP_TABLE", "BISHOP_ENDGAME_TABLE"),
+    chess.ROOK: ("ROOK_TABLE", "ROOK_ENDGAME_TABLE"),
+    chess.QUEEN: ("QUEEN_TABLE", "QUEEN_ENDGAME_TABLE"),
+    chess.KING: ("KING_START", "KING_END"),
+}
+
+
+def fen_features(board_fen, out):
+    """Append the features of the piece placement field of a FEN to ``out``.
+    Squares are indexed like chess.SQUARES, a1 = 0."""
+    square = 56
+    for char in board_fen:
+        if char == "/":
+            square -= 16
+        elif char <= "8":
+            square += ord(char) - 48
+        else:
+            out.append(FEN_FEATURES[char] + square)
+            square += 1
+
+
+def parse_result(text):
+    """Game result from white's view in an EPD line's operations:
+    ``c9 "1-0";``, ``"0.5"`` or ``[0.5]``."""
+    match = RESULT_PATTERN.search(text)
+    if match is None:
+        return None
+    token = match.group().strip('[]"')
+    return RESULTS[token] if token in RESULTS else float(token)
+
+
+def read_epd(path):
+    """(board_fen, result) for every labelled line of an EPD file."""
+    with open(path) as f:
+        for line in f:
+            fields = line.split(maxsplit=4)
+            if len(fields) < 5:
+                continue
+            result = parse_result(fields[4])
+            if result is not None:
+                yield fields[0], result
+
+
+def read_pgn(path, skip_plies=8):
+    """(board_fen, result) for the positions of every decided or drawn
+    game, without the first ``skip_plies`` (book moves) and positions in
+    check (not quiet)."""
+    with open(path) as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                return
+            result = RESULTS.get(game.headers.get("Result"))
+            if result is None:
+                continue
+            board = game.board()
+            for ply, move in enumerate(game.mainline_moves()):
+                board.push(move)
+                if ply + 1 >= skip_plies and not board.is_check():
+                    yield board.board_fen(), result
+
+
+class Dataset:
+    """Labelled positions as CSR rows of piece features."""
+
+    def __init__(self, features, indptr, results):
+        self.features = features
+        self.indptr = indptr
+        self.results = results
+
+    def __len__(self):
+        return len(self.results)
+
+    @classmethod
+    def from_positions(cls, positions, limit=None):
+        features = array("h")
+        indptr = array("q", [0])
+        results = array("f")
+        for board_fen, result in positions:
+            fen_features(board_fen, features)
+            indptr.append(len(features))
+            results.append(result)
+            if limit and len(results) >= limit:
+                break
+        return cls(np.frombuffer(features, dtype=np.int16), np.frombuffer(indptr, dtype=np.int64),
+                   np.frombuffer(results, dtype=np.float32))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["features"], data["indptr"], data["results"])
+
+    def save(self, path):
+        np.savez(path, features=self.features, indptr=self.indptr, results=self.results)
+
+    def batch(self, start, stop):
+        return Batch(self.features[self.indptr[start]:self.indptr[stop]],
+                     np.diff(self.indptr[start:stop + 1]), self.results[start:stop])
+
+
+class Batch:
+    """Feature indices of a slice of rows, split once for the passes."""
+
+    def __init__(self, features, lengths, results):
+        features = features.astype(np.int64)
+        self.size = len(results)
+        self.results = results.astype(np.float64)
+        self.rows = np.repeat(np.arange(self.size), lengths)
+        color = features >= PIECE_FEATURES
+        self.sign = np.where(color, -1.0, 1.0)
+        self.piece = features % PIECE_FEATURES  # (piece_type - 1) * 64 + square
+        self.piece_type = self.piece >> 6
+        self.side = self.rows * 2 + color  # one phase per row and colour
+
+    def phases(self, theta):
+        phase = np.bincount(self.side, weights=theta[PHASE][self.piece_type], minlength=2 * self.size)
+        return phase, np.minimum(phase, PHASE_TOTAL) / PHASE_TOTAL
+
+    def scores(self, theta, phases=None):
+        """``evaluate_board`` from white's view for every row."""
+        _, blend = phases or self.phases(theta)
+        weight = blend[self.side]
+        values = (theta[MATERIAL][self.piece_type] + weight * theta[PST_MG][self.piece]
+                  + (1 - weight) * theta[PST_EG][self.piece])
+        return np.bincount(self.rows, weights=self.sign * values, minlength=self.size)
+
+    def loss_and_gradient(self, theta, k):
+        phase, blend = self.phases(theta)
+        scores = self.scores(theta, (phase, blend))
+        predicted = sigmoid(k * scores)
+        loss = cross_entropy(predicted, self.results)
+
+        # dL/dscore of every row, spread to the features of the row
+        row_gradient = k * (predicted - self.results) / self.size
+        gradient = np.zeros(PARAMETERS)
+        signed = self.sign * row_gradient[self.rows]
+        weight = blend[self.side]
+        gradient[MATERIAL] = np.bincount(self.piece_type, weights=signed, minlength=6)
+        gradient[PST_MG] = np.bincount(self.piece, weights=signed * weight, minlength=PIECE_FEATURES)
+        gradient[PST_EG] = np.bincount(self.piece, weights=signed * (1 - weight), minlength=PIECE_FEATURES)
+
+        # A phase weight moves the blend of every side that has such a piece,
+        # unless that side's phase is clamped at PHASE_TOTAL.
+        spread = np.bincount(self.side, weights=self.sign * (theta[PST_MG][self.piece] - theta[PST_EG][self.piece]),
+                             minlength=2 * self.size)
+        side_gradient = spread * (phase < PHASE_TOTAL) / PHASE_TOTAL * np.repeat(row_gradient, 2)
+        gradient[PHASE] = np.bincount(self.piece_type, weights=side_gradient[self.side], minlength=6)
+        return loss, gradient
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def cross_entropy(predicted, results):
+    predicted = np.clip(predicted, 1e-12, 1 - 1e-12)
+    return float(-np.mean(results * np.log(predicted) + (1 - results) * np.log(1 - predicted)))
+
+
+def initial_parameters():
+    """The parameters of the current evaluate.py."""
+    theta = np.zeros(PARAMETERS)
+    for piece_type, (mg, eg) in piece_square_tables.items():
+        offset = (piece_type - 1) * 64
+        theta[MATERIAL][piece_type - 1] = piece_values[piece_type]
+        theta[PST_MG][offset:offset + 64] = mg
+        theta[PST_EG][offset:offset + 64] = eg
+        theta[PHASE][piece_type - 1] = phase_weights[piece_type]
+    return theta
+
+
+def fit_k(batch, theta, low=1e-4, high=0.05, steps=40):
+    """Scale K of sigmoid(K * score) that best fits the results, by
+    golden-section search."""
+    scores = batch.scores(theta)
+
+    def loss(k):
+        return cross_entropy(sigmoid(k * scores), batch.results)
+
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = low, high
+    for _ in range(steps):
+        c, d = b - ratio * (b - a), a + ratio * (b - a)
+        if loss(c) < loss(d):
+            b = d
+        else:
+            a = c
+    return (a + b) / 2
+
+
+def tune(dataset, theta=None, k=None, epochs=10, batch_size=16384, seed=0,
+         beta1=0.9, beta2=0.999, epsilon=1e-8):
+    """Mini-batch Adam over ``dataset``; returns (theta, k, loss)."""
+    rng = np.random.default_rng(seed)
+    theta = initial_parameters() if theta is None else theta.copy()
+    if k is None:
+        k = fit_k(dataset.batch(0, min(len(dataset), 1 << 18)), theta)
+        print(f"[TEXEL] K = {k:.6f}")
+
+    rates = np.zeros(PARAMETERS)
+    for group, rate in LEARNING_RATES:
+        rates[group] = rate
+    rates[FROZEN] = 0
+    m = np.zeros(PARAMETERS)
+    v = np.zeros(PARAMETERS)
+    step = 0
+    starts = np.arange(0, len(dataset), batch_size)
+
+    for epoch in range(epochs):
+        start_time = time.time()
+        total = 0.0
+        for start in rng.permutation(starts):
+            batch = dataset.batch(start, min(start + batch_size, len(dataset)))
+            loss, gradient = batch.loss_and_gradient(theta, k)
+            total += loss * batch.size
+            step += 1
+            m = beta1 * m + (1 - beta1) * gradient
+            v = beta2 * v + (1 - beta2) * gradient * gradient
+            theta -= rates * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + epsilon)
+            theta[PHASE] = np.maximum(theta[PHASE], 0)
+        print(f"[TEXEL] Epoch {epoch + 1}/{epochs} - loss {total / len(dataset):.6f} "
+              f"- {time.time() - start_time:.1f}s")
+    return theta, k, evaluate_loss(dataset, np.round(theta), k, batch_size)
+
+
+def evaluate_loss(dataset, theta, k, batch_size=1 << 16):
+    total = 0.0
+    for start in range(0, len(dataset), batch_size):
+        batch = dataset.batch(start, min(start + batch_size, len(dataset)))
+        total += cross_entropy(sigmoid(k * batch.scores(theta)), batch.results) * batch.size
+    return total / max(1, len(dataset))
+
+
+def format_table(name, values):
+    rows = [", ".join(f"{int(value):4d}" for value in values[rank * 8:rank * 8 + 8]) for rank in range(8)]
+    return f"{name} = [\n    " + ",\n    ".join(rows) + "\n]\n"
+
+
+def write_tables(theta, path, comment=""):
+    """Write the rounded parameters as a module with the table, value and
+    phase names of evaluate.py."""
+    theta = np.round(theta).astype(int)
+    lines = [f'"""Evaluation tables regenerated by texel.py.{" " + comment if comment else ""}"""\n',
+             "import chess\n"]
+    for piece_type, names in TABLE_NAMES.items():
+        offset = (piece_type - 1) * 64
+        lines.append(format_table(names[0], theta[PST_MG][offset:offset + 64]))
+        lines.append(format_table(names[1], theta[PST_EG][offset:offset + 64]))
+
+    def mapping(name, values):
+        items = "".join(f"    chess.{chess.piece_name(pt).upper()}: {values(pt)},\n" for pt in chess.PIECE_TYPES)
+        return f"{name} = {{\n{items}}}\n"
+
+    lines.append(mapping("piece_square_tables", lambda pt: f"({TABLE_NAMES[pt][0]}, {TABLE_NAMES[pt][1]})"))
+    lines.append(mapping("piece_values", lambda pt: theta[MATERIAL][pt - 1]))
+    lines.append(mapping("phase_weights", lambda pt: theta[PHASE][pt - 1]))
+    lines.append(f"PHASE_TOTAL = {PHASE_TOTAL}\n")
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+
+def load_dataset(args):
+    if args.cache:
+        try:
+            dataset = Dataset.load(args.cache)
+            print(f"[TEXEL] Loaded {len(dataset):,} positions from {args.cache}")
+            return dataset
+        except FileNotFoundError:
+            pass
+
+    def positions():
+        for path in args.epd:
+            yield from read_epd(path)
+        for path in args.pgn:
+            yield from read_pgn(path, skip_plies=args.skip_plies)
+
+    start_time = time.time()
+    dataset = Dataset.from_positions(positions(), limit=args.limit)
+    print(f"[TEXEL] Read {len(dataset):,} positions in {time.time() - start_time:.1f}s")
+    if args.cache:
+        dataset.save(args.cache)
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Texel tuning of the evaluation tables")
+    parser.add_argument("--epd", action="append", default=[], help="EPD file with results, may repeat")
+    parser.add_argument("--pgn", action="append", default=[], help="PGN file, may repeat")
+    parser.add_argument("--skip-plies", type=int, default=8, help="opening plies skipped in PGN games")
+    parser.add_argument("--limit", type=int, help="stop after this many positions")
+    parser.add_argument("--cache", help=".npz file the parsed positions are saved to and reloaded from")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=16384)
+    parser.add_argument("--k", type=float, help="sigmoid scale (default: fitted)")
+    parser.add_argument("--output", default="tuned_tables.py")
+    args = parser.parse_args()
+
+    dataset = load_dataset(args)
+    if not len(dataset):
+        parser.error("no labelled positions, give --epd or --pgn")
+    k = args.k or fit_k(dataset.batch(0, min(len(dataset), 1 << 18)), initial_parameters())
+    print(f"[TEXEL] K = {k:.6f} - loss of evaluate.py {evaluate_loss(dataset, initial_parameters(), k):.6f}")
+    theta, k, loss = tune(dataset, k=k, epochs=args.epochs, batch_size=args.batch_size)
+    write_tables(theta, args.output, comment=f"{len(dataset):,} positions, K = {k:.6f}, loss {loss:.6f}.")
+    print(f"[TEXEL] Wrote {args.output} - loss {loss:.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import time
+
+# The clock and the stop event are only read once every CHECK_INTERVAL
+# nodes; the node budget is tested on every node.
+CHECK_INTERVAL = 512
+CHECK_MASK = CHECK_INTERVAL - 1
+
+DEFAULT_MOVES_TO_GO = 40
+MOVE_OVERHEAD = 0.05
+
+
+class TimeManager:
+    """Decides how long a single search may run.
+
+    With a clock (``time_left``/``increment``/``moves_to_go``) a soft deadline
+    is derived from the per-move share of the remaining time and a hard
+    deadline caps the worst case. Iterative deepening stops at the soft
+    deadline, which shrinks while the best move stays the same and grows
+    when the score drops. The search itself is aborted only at the hard
+    deadline. ``movetime`` searches for a fixed time and ``None`` everywhere
+    means an infinite search that has to be stopped from outside, by setting
+    ``stop_event`` (a threading or multiprocessing Event). ``nodes`` adds a
+    node budget on top of any time limit.
+
+    With ``ponder`` the limits are ignored until ``ponderhit`` is called:
+    the search runs on the opponent's time and only the clock from the hit
+    onwards counts.
+    """
+
+    def __init__(self, time_left=None, increment=0, moves_to_go=None, movetime=None,
+                 stop_event=None, nodes=None, ponder=False):
+        self.stop_event = stop_event
+        self.max_nodes = nodes
+        self.pondering = ponder
+        if movetime is not None:
+            self.soft_limit = self.hard_limit = max(0.01, movetime - MOVE_OVERHEAD)
+        elif time_left is not None:
+            moves_to_go = moves_to_go or DEFAULT_MOVES_TO_GO
+            available = max(0.01, time_left - MOVE_OVERHEAD)
+            self.soft_limit = min(available / moves_to_go + increment * 0.8, available * 0.5)
+            self.hard_limit = min(self.soft_limit * 4, available * 0.5 + increment * 0.8,
+                                  available)
+        else:
+            self.soft_limit = self.hard_limit = None
+        self.fixed = movetime is not None
+        self.start()
+
+    def start(self):
+        self.start_time = time.time()
+        self.scale = 1.0
+        self.stable_iterations = 0
+        self.last_best_move = None
+        self.last_score = None
+
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    def stopped(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def ponderhit(self, time_manager=None):
+        """The predicted move was played: start the clock, optionally with the
+        limits of ``time_manager`` (the clock as it is now)."""
+        if time_manager is not None:
+            self.soft_limit = time_manager.soft_limit
+            self.hard_limit = time_manager.hard_limit
+            self.fixed = time_manager.fixed
+            self.max_nodes = time_manager.max_nodes
+        self.start_time = time.time()
+        self.pondering = False
+
+    def hard_expired(self):
+        if self.stopped():
+            return True
+        if self.pondering:
+            return False
+        return self.hard_limit is not None and self.elapsed() >= self.hard_limit
+
+    def out_of_nodes(self, nodes):
+        return self.max_nodes is not None and nodes >= self.max_nodes
+
+    def check(self, nodes):
+        """Cheap per-node poll: the node budget is an int compare on every
+        call, the clock and stop event are read every CHECK_INTERVAL nodes."""
+        if self.max_nodes is not None and nodes >= self.max_nodes:
+            return True
+        if nodes & CHECK_MASK:
+            return False
+        return self.hard_expired()
+
+    def update(self, depth, best_move, score):
+        """Feed the result of a completed iteration into the soft deadline."""
+        dropped = self.last_score is not None and score < self.last_score - 30
+        if best_move == self.last_best_move and not dropped:
+            self.stable_iterations += 1
+        else:
+            self.stable_iterations = 0
+        scale = max(0.4, 1.2 - 0.15 * self.stable_iterations)
+        if dropped:
+            scale *= 1.5 if score > self.last_score - 100 else 2.0
+        self.scale = scale
+        self.last_best_move = best_move
+        self.last_score = score
+
+    def should_stop(self, nodes=0):
+        """Whether iterative deepening should not start another iteration."""
+        if self.stopped() or self.out_of_nodes(nodes):
+            return True
+        if self.pondering or self.soft_limit is None:
+            return False
+        if self.fixed:
+            return self.hard_expired()
+        return self.elapsed() >= min(self.soft_limit * self.scale, self.hard_limit)
@@ -0,0 +1,238 @@
+from array import array
+from multiprocessing import shared_memory
+
+import chess
+
+# Each slot is three 64-bit words: the data word, the static evaluation as
+# a raw double, and (key ^ data ^ eval). A probe is only accepted when the
+# XOR of all three reproduces the full Zobrist key, so torn writes and index
+# collisions read as misses instead of bad entries.
+SLOT_WORDS = 3
+BUCKET_SLOTS = 4
+BUCKET_BYTES = BUCKET_SLOTS * SLOT_WORDS * 8
+
+GENERATION_CYCLE = 64
+DEPTH_OFFSET = 16  # quiescence entries are stored with depth <= 0
+VALUE_OFFSET = 1 << 31
+MASK64 = (1 << 64) - 1
+NO_EVAL = float("nan")  # static eval not known; NaN never equals itself
+
+# Data word layout (low to high bits):
+#   flag 2 | generation 6 | depth 8 | move 16 | value 32
+FLAG_SHIFT, GEN_SHIFT, DEPTH_SHIFT, MOVE_SHIFT, VALUE_SHIFT = 0, 2, 8, 16, 32
+
+
+def encode_move(move):
+    if not move:
+        return 0
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code):
+    if not code:
+        return None
+    return chess.Move(code & 63, (code >> 6) & 63, (code >> 12) or None)
+
+
+class TranspositionEntry:
+    __slots__ = ("zobrist", "value", "depth", "flag", "move", "static_eval")
+
+    def __init__(self, zobrist, value, depth, flag, move, static_eval=None):
+        self.zobrist = zobrist
+        self.value = value
+        self.depth = depth
+        self.flag = flag
+        self.move = move
+        self.static_eval = static_eval
+
+
+class TranspositionTable:
+    """Preallocated, bucketed hash table sized in megabytes.
+
+    Entries are packed into a flat array of unsigned 64-bit words. When a
+    bucket is full, the slot with the lowest ``depth - age`` is replaced, so
+    deep results survive while stale entries from earlier searches are
+    recycled first.
+    """
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    def __init__(self, size_mb=32):
+        self.generation = 0
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        buckets = 1
+        while buckets * 2 * BUCKET_BYTES <= size_mb * 1024 * 1024:
+            buckets *= 2
+        self.size_mb = size_mb
+        self.bucket_mask = buckets - 1
+        self.slots = buckets * BUCKET_SLOTS
+        self.words = self._allocate(self.slots * SLOT_WORDS)
+        self._view_evals()
+
+    def _view_evals(self):
+        # The same memory seen as doubles, for the eval word of each slot.
+        self.evals = memoryview(self.words).cast("B").cast("d")
+
+    def _allocate(self, n_words):
+        return array("Q", bytes(n_words * 8))
+
+    def clear(self):
+        self.words = self._allocate(self.slots * SLOT_WORDS)
+        self._view_evals()
+        self.generation = 0
+
+    def new_search(self):
+        self.generation = (self.generation + 1) % GENERATION_CYCLE
+
+    def _age(self, data):
+        return (self.generation - (data >> GEN_SHIFT)) % GENERATION_CYCLE
+
+    def get(self, key):
+        words = self.words
+        base = (key & self.bucket_mask) * BUCKET_SLOTS * SLOT_WORDS
+        for i in range(base, base + BUCKET_SLOTS * SLOT_WORDS, SLOT_WORDS):
+            data = words[i]
+            if data and words[i + 2] ^ data ^ words[i + 1] == key:
+                static_eval = self.evals[i + 1]
+                return TranspositionEntry(
+                    key,
+                    (data >> VALUE_SHIFT) - VALUE_OFFSET,
+                    ((data >> DEPTH_SHIFT) & 0xFF) - DEPTH_OFFSET,
+                    data & 3,
+                    decode_move((data >> MOVE_SHIFT) & 0xFFFF),
+                    static_eval if static_eval == static_eval else None,
+                )
+        return None
+
+    def store(self, key, value, depth, flag, move, static_eval=None):
+        words = self.words
+        base = (key & self.bucket_mask) * BUCKET_SLOTS * SLOT_WORDS
+        move_code = encode_move(move)
+        if static_eval is None:
+            static_eval = NO_EVAL
+
+        target = base
+        worst = None
+        for i in range(base, base + BUCKET_SLOTS * SLOT_WORDS, SLOT_WORDS):
+            data = words[i]
+            if not data:
+                target = i
+                break
+            if words[i + 2] ^ data ^ words[i + 1] == key:
+                # Same position: keep a deeper result from this search unless
+                # the new one is exact, and never lose a known best move or
+                # static evaluation.
+                old_depth = ((data >> DEPTH_SHIFT) & 0xFF) - DEPTH_OFFSET
+                if (flag != self.EXACT and old_depth > depth
+                        and self._age(data) == 0):
+                    return
+                if not move_code:
+                    move_code = (data >> MOVE_SHIFT) & 0xFFFF
+                if static_eval != static_eval:
+                    static_eval = self.evals[i + 1]
+                target = i
+                break
+            priority = ((data >> DEPTH_SHIFT) & 0xFF) - 8 * self._age(data)
+            if worst is None or priority < worst:
+                worst = priority
+                target = i
+
+        depth = min(255, max(0, depth + DEPTH_OFFSET))
+        value = min(MASK64 >> 32, max(0, int(round(value)) + VALUE_OFFSET))
+        data = (flag
+                | (self.generation << GEN_SHIFT)
+                | (depth << DEPTH_SHIFT)
+                | (move_code << MOVE_SHIFT)
+                | (value << VALUE_SHIFT))
+        words[target] = data
+        self.evals[target + 1] = static_eval
+        words[target + 2] = (key ^ data ^ words[target + 1]) & MASK64
+
+    def hashfull(self):
+        """Per-mille of the first thousand slots written during this search."""
+        words = self.words
+        sample = min(1000, self.slots)
+        used = 0
+        for i in range(0, sample * SLOT_WORDS, SLOT_WORDS):
+            data = words[i]
+            if data and self._age(data) == 0:
+                used += 1
+        return used * 1000 // sample
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """TranspositionTable whose slots live in ``multiprocessing.shared_memory``.
+
+    Pickling only sends the segment name, so worker processes attach to the
+    same table. Writes are not locked: a slot torn by two concurrent writers
+    fails the key check and is simply read as a miss.
+
+    The generation lives in a header word in front of the slots, so every
+    process ages entries alike. Only the owner advances it; ``new_search``
+    in an attached copy does nothing.
+    """
+
+    def __init__(self, size_mb=32):
+        self.shm = None
+        self.header = None
+        self.owner = True
+        super().__init__(size_mb)
+
+    @property
+    def generation(self):
+        return self.header[0] if self.header is not None else 0
+
+    @generation.setter
+    def generation(self, value):
+        if self.header is not None:
+            self.header[0] = value
+
+    def _allocate(self, n_words):
+        self.close()
+        self.shm = shared_memory.SharedMemory(create=True, size=(n_words + 1) * 8)
+        self.owner = True
+        self._attach(n_words)
+        return self.words
+
+    def _attach(self, n_words):
+        self.header = self.shm.buf[:8].cast("Q")
+        self.words = self.shm.buf[8:(n_words + 1) * 8].cast("Q")
+
+    def clear(self):
+        size = self.slots * SLOT_WORDS * 8
+        self.shm.buf[8:size + 8] = bytes(size)
+        self.generation = 0
+
+    def new_search(self):
+        if self.owner:
+            super().new_search()
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.evals.release()
+        self.words.release()
+        self.header.release()
+        self.header = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+    def __getstate__(self):
+        return {
+            "name": self.shm.name,
+            "size_mb": self.size_mb,
+            "bucket_mask": self.bucket_mask,
+            "slots": self.slots,
+        }
+
+    def __setstate__(self, state):
+        self.size_mb = state["size_mb"]
+        self.bucket_mask = state["bucket_mask"]
+        self.slots = state["slots"]
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        self.owner = False
+        self._attach(self.slots * SLOT_WORDS)
+        self._view_evals()
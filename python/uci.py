@@ -0,0 +1,269 @@
+"""Headless UCI front end: ``python uci.py``.
+
+Commands are read from stdin, the search runs in a background thread on
+an ``EngineSession``, and ``info`` lines are printed after every completed
+iteration. ``stop`` (and ``quit``) set the search's stop event, which the
+search polls every few hundred nodes. Nothing here imports pygame.
+"""
+import sys
+from threading import Event, Lock, Thread
+
+import chess
+
+import bench
+from book import default_book
+from engine import EngineSession
+from searcher import MAX_DEPTH, IMMEDIATE_MATE_SCORE
+from tablebase import Tablebase
+from timeman import TimeManager
+
+ENGINE_NAME = "Tuturu"
+ENGINE_AUTHOR = "tdong1302"
+
+# name: (UCI declaration, default)
+OPTIONS = {
+    "Hash": ("type spin default 32 min 1 max 4096", 32),
+    "Threads": ("type spin default 1 min 1 max 64", 1),
+    "Ponder": ("type check default false", False),
+    "OwnBook": ("type check default false", False),
+    "SyzygyPath": ("type string default <empty>", ""),
+}
+
+GO_INT_ARGS = ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "depth", "nodes", "perft")
+
+
+def format_score(score):
+    """``cp x`` or ``mate n`` (moves, negative when getting mated)."""
+    if abs(score) > IMMEDIATE_MATE_SCORE - 1000:
+        plies = IMMEDIATE_MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {int(score)}"
+
+
+def format_info(info):
+    return (f"info depth {info.depth} seldepth {info.seldepth} score {format_score(info.score)} "
+            f"nodes {info.nodes} nps {info.nps} hashfull {info.hashfull} tbhits {info.tbhits} "
+            f"time {int(info.time * 1000)} pv {' '.join(move.uci() for move in info.pv)}")
+
+
+def parse_position(tokens):
+    """``startpos | fen <fen>`` followed by optional ``moves ...``."""
+    if not tokens:
+        return chess.Board()
+    if "moves" in tokens:
+        index = tokens.index("moves")
+        tokens, moves = tokens[:index], tokens[index + 1:]
+    else:
+        moves = []
+    board = chess.Board(" ".join(tokens[1:])) if tokens[0] == "fen" else chess.Board()
+    for uci in moves:
+        board.push_uci(uci)
+    return board
+
+
+def parse_go(tokens):
+    args = {}
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in GO_INT_ARGS and i + 1 < len(tokens):
+            args[token] = int(tokens[i + 1])
+            i += 2
+        else:
+            args[token] = True  # infinite, ponder
+            i += 1
+    return args
+
+
+class UCIEngine:
+    """State of one UCI conversation."""
+
+    def __init__(self, output=None):
+        self.output = output
+        self.lock = Lock()
+        self.options = {name: default for name, (_, default) in OPTIONS.items()}
+        self.board = chess.Board()
+        self.session = None
+        self.thread = None
+        self.time_manager = None
+
+    def send(self, line):
+        with self.lock:
+            print(line, file=self.output or sys.stdout, flush=True)
+
+    def ensure_session(self):
+        if self.session is None:
+            path = self.options["SyzygyPath"]
+            self.session = EngineSession(hash_mb=self.options["Hash"], threads=self.options["Threads"],
+                                         tablebase=Tablebase(path) if path else None, verbose=False)
+            self.session.subscribe(lambda info: self.send(format_info(info)))
+        return self.session
+
+    def handle(self, line):
+        """Run one command; returns False on ``quit``."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            for name, (declaration, _) in OPTIONS.items():
+                self.send(f"option name {name} {declaration}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.stop()
+            self.ensure_session().new_game()
+        elif command == "position":
+            self.stop()
+            self.board = parse_position(args)
+        elif command == "go":
+            go_args = parse_go(args)
+            if "perft" in go_args:
+                self.perft(go_args["perft"])
+            else:
+                self.go(go_args)
+        elif command == "stop":
+            self.stop()
+        elif command == "ponderhit":
+            if self.time_manager is not None:
+                self.time_manager.ponderhit()
+        elif command == "bench":
+            self.bench(int(args[0]) if args else bench.BENCH_DEPTH)
+        elif command == "quit":
+            self.stop()
+            if self.session is not None:
+                self.session.close()
+            return False
+        return True
+
+    def set_option(self, args):
+        """``name <name...> [value <value...>]``; Hash, Threads and
+        SyzygyPath take effect with a new session at the next search."""
+        if "name" not in args:
+            return
+        value_index = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:value_index])
+        value = " ".join(args[value_index + 1:])
+        option = next((key for key in OPTIONS if key.lower() == name.lower()), None)
+        if option is None:
+            self.send(f"info string unknown option {name}")
+            return
+        default = OPTIONS[option][1]
+        if isinstance(default, bool):
+            value = value.lower() == "true"
+        elif isinstance(default, int):
+            value = int(value)
+        elif value == "<empty>":
+            value = ""
+        self.options[option] = value
+        if option in ("Hash", "Threads", "SyzygyPath") and self.session is not None:
+            self.stop()
+            self.session.close()
+            self.session = None
+
+    def time_manager_for(self, args):
+        us, inc = ("wtime", "winc") if self.board.turn == chess.WHITE else ("btime", "binc")
+        if "movetime" in args:
+            time_manager = TimeManager(movetime=args["movetime"] / 1000)
+        elif us in args and "infinite" not in args:
+            time_manager = TimeManager(time_left=args[us] / 1000, increment=args.get(inc, 0) / 1000,
+                                       moves_to_go=args.get("movestogo"))
+        else:
+            time_manager = TimeManager()
+        time_manager.max_nodes = args.get("nodes")
+        time_manager.pondering = bool(args.get("ponder"))
+        time_manager.stop_event = Event()
+        return time_manager
+
+    def go(self, args):
+        self.stop()
+        session = self.ensure_session()
+        board = self.board.copy()
+
+        if self.options["OwnBook"] and not args.get("ponder") and not args.get("infinite"):
+            book = default_book()
+            move = book.move(board) if book is not None else None
+            if move is not None:
+                self.send(f"bestmove {move.uci()}")
+                return
+
+        time_manager = self.time_manager_for(args)
+        max_depth = min(args.get("depth", MAX_DEPTH), MAX_DEPTH)
+        # Under "go infinite" and "go ponder" bestmove must wait for stop/ponderhit
+        wait = bool(args.get("infinite") or args.get("ponder"))
+        self.time_manager = time_manager
+
+        def search():
+            move = session.search(board, time_manager=time_manager, max_depth=max_depth)
+            while wait and time_manager.pondering and not time_manager.stopped():
+                time_manager.stop_event.wait(0.01)
+            if wait and args.get("infinite"):
+                time_manager.stop_event.wait()
+            self.send(self.bestmove(board, move))
+
+        self.thread = Thread(target=search, daemon=True)
+        self.thread.start()
+
+    def perft(self, depth):
+        """Divide output of the current position, like ``go perft`` in
+        Stockfish."""
+        self.stop()
+        report = bench.perft_report(self.board.fen(), depth)
+        for move, count in report["divide"].items():
+            self.send(f"{move}: {count}")
+        self.send("")
+        self.send(f"Nodes searched: {report['nodes']}")
+
+    def bench(self, depth):
+        self.stop()
+        report = bench.bench(depth, listener=lambda result: self.send(
+            f"info string {result['fen']} nodes {result['nodes']} bestmove {result['bestmove']}"))
+        self.send(f"Total time (ms) : {int(report['time'] * 1000)}")
+        self.send(f"Nodes searched  : {report['nodes']}")
+        self.send(f"Nodes/second    : {report['nps']}")
+
+    def bestmove(self, board, move):
+        if move is None or move not in board.legal_moves:
+            # Stopped before the first move was searched
+            move = next(iter(board.legal_moves), None)
+        if move is None:
+            return "bestmove 0000"
+        line = f"bestmove {move.uci()}"
+        if self.options["Ponder"]:
+            reply = self.session.expected_reply(board, move)
+            if reply is not None:
+                line += f" ponder {reply.uci()}"
+        return line
+
+    def stop(self):
+        """Stop a running search and wait for its bestmove."""
+        if self.thread is None:
+            return
+        self.time_manager.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        self.time_manager = None
+
+
+def uci_loop():
+    engine = UCIEngine()
+    while True:
+        line = sys.stdin.readline()
+        if not line:  # end of input
+            engine.handle("quit")
+            break
+        try:
+            if not engine.handle(line):
+                break
+        except ValueError as error:  # illegal move or FEN, bad number
+            engine.send(f"info string error: {error}")
+
+
+if __name__ == "__main__":
+    uci_loop()